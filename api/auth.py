@@ -1,17 +1,23 @@
 from flask import Flask, request, jsonify
-import sqlite3
-import hashlib
-import secrets
 import os
+import sys
 from datetime import datetime, timedelta
 import jwt
 
+# Same database, schema and password format as the app (moodly_app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import moodly_db
+from moodly_auth import hash_password, verify_password
+
 app = Flask(__name__)
 
-def get_db_connection():
-    conn = sqlite3.connect('moodly.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+_schema_checked = False
+
+def ensure_schema():
+    global _schema_checked
+    if not _schema_checked:
+        moodly_db.init_schema()
+        _schema_checked = True
 
 def handler(request):
     if request.method == 'POST':
@@ -26,29 +32,17 @@ def handler(request):
             if not username or not email or not password:
                 return jsonify({'error': 'Missing required fields'}), 400
             
-            conn = get_db_connection()
+            ensure_schema()
             
             # Check if user already exists
-            existing_user = conn.execute(
-                'SELECT id FROM users WHERE username = ? OR email = ?',
-                (username, email)
-            ).fetchone()
-            
-            if existing_user:
-                conn.close()
+            if moodly_db.user_exists(username, email):
                 return jsonify({'error': 'User already exists'}), 400
             
             # Hash password
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
+            password_hash = hash_password(password)
             
             # Create user
-            cursor = conn.execute(
-                'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
-                (username, email, password_hash)
-            )
-            user_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            user_id = moodly_db.create_user(username, email, password_hash)
             
             return jsonify({
                 'message': 'User created successfully',
@@ -63,18 +57,13 @@ def handler(request):
             if not username or not password:
                 return jsonify({'error': 'Missing credentials'}), 400
             
-            conn = get_db_connection()
-            user = conn.execute(
-                'SELECT * FROM users WHERE username = ? OR email = ?',
-                (username, username)
-            ).fetchone()
-            conn.close()
+            ensure_schema()
+            user = moodly_db.find_user(username)
             
             if not user:
                 return jsonify({'error': 'Invalid credentials'}), 401
             
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            if user['password_hash'] != password_hash:
+            if not verify_password(password, user['password_hash']):
                 return jsonify({'error': 'Invalid credentials'}), 401
             
             # Create JWT token
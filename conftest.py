@@ -0,0 +1,45 @@
+"""
+Pytest setup for Moodly App
+The combined app on a throwaway SQLite database, with SQL budgets per route (pytest_query_budget)
+"""
+import os
+import itertools
+
+import pytest
+
+pytest_plugins = ['pytest_query_budget']
+
+# Empty rather than unset, so moodly's load_dotenv() does not bring a key back from .env
+os.environ['OPENAI_API_KEY'] = ''
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+_usernames = (f'tester{n}' for n in itertools.count(1))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """moodly_app with pages and API, its database (moodly.db) in a temporary directory"""
+    workdir = tmp_path_factory.mktemp('moodly')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import moodly_app
+        flask_app = moodly_app.create_app({'TESTING': True})
+        # The first request creates the schema; do it here so no test's budget pays for it
+        flask_app.test_client().get('/health')
+        yield flask_app
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app):
+    """A test client signed in as a new user"""
+    client = app.test_client()
+    username = next(_usernames)
+    credentials = {'username': username, 'password': 'secret123'}
+    response = client.post('/api/auth/register', json=dict(credentials, email=f'{username}@example.com'))
+    assert response.status_code == 201, response.get_data(as_text=True)
+    response = client.post('/api/auth/login', json=credentials)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return client
@@ -0,0 +1,63 @@
+"""
+Gunicorn settings for Moodly (picked up automatically from the working directory)
+
+Every value can be overridden by environment variable, by gunicorn flags or GUNICORN_CMD_ARGS.
+Graceful restarts: `kill -HUP <master>` replaces workers one by one without dropping
+requests. With preload (the default) HUP keeps the already-imported code; to deploy new
+code send USR2 (starts a new master alongside) and then QUIT to the old master, or set
+GUNICORN_PRELOAD=false so HUP re-imports the app.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from moodly_server import worker_count
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+
+# 2 x cores + 1 processes (or WEB_CONCURRENCY), each with a few threads so requests
+# waiting on OpenAI or the database do not hold a whole process
+workers = worker_count()
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Import the app once in the master and fork it: workers share its memory pages and boot
+# in milliseconds. OpenAI/storage clients and metrics are re-created in each child by the
+# modules' os.register_at_fork hooks; SQLite connections are opened per request.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Reuse client connections for a few seconds; keep this below the idle timeout of the
+# load balancer in front (Render/Heroku/Railway are all 60s or more)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# AI insights are requested inline, so allow more than gunicorn's default 30s
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+
+# Recycle workers to bound slow leaks; jitter keeps them from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# Heartbeat files in memory rather than on a possibly slow container disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Requests are already logged (with ids and timings) by the app; opt in with GUNICORN_ACCESS_LOG=-
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+
+
+def on_starting(server):
+    # The openai package takes most of a second to import: pay it once in the master, so
+    # forked workers have it already rather than on their first AI request
+    from moodly_clients import preload_openai
+    preload_openai()
+
+
+def post_worker_init(worker):
+    # Compile templates in each worker at boot so the first requests skip parsing;
+    # with the bytecode cache this mostly loads already-compiled code from disk
+    app = worker.wsgi
+    if hasattr(app, 'jinja_env'):
+        from moodly_templates import preload_templates
+        preload_templates(app)
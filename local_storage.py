@@ -0,0 +1,255 @@
+"""
+Local Disk Storage Implementation for Moodly App
+Content-addressed profile picture store that mirrors CloudinaryStorage
+"""
+import os
+import re
+import hashlib
+import tempfile
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: the in-process lock alone
+    fcntl = None
+
+from storage_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+BLOB_PATTERN = re.compile(r'^[0-9a-f]{64}\.(jpg|png|gif|webp)$')
+
+# Leading bytes -> extension, for images stored as uploaded when they cannot be re-encoded
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def image_extension(data):
+    """File extension for the image type of `data`, or None if it is not a supported image"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class LocalStorage(StorageBackend):
+    """Store profile pictures on local disk, named by the SHA-256 of their content.
+
+    Layout under the storage root:
+        objects/ab/cd/<sha256>.jpg   image blobs, sharded by the first two hash bytes (.png,
+                                     .gif or .webp for an image stored as uploaded)
+        objects/ab/cd/<blob>.refs    how many users' refs name the blob
+        refs/profile_<user_id>       the blob name of a user's current picture
+        .lock                        held while refs and counts change
+
+    Identical images are stored once, and blob names never change, so they can be
+    served with far-future cache headers. A blob is removed when its count drops to zero;
+    the lock keeps an upload from linking to a blob a delete is removing.
+    """
+
+    name = 'local'
+    display_name = 'Local Disk'
+
+    def __init__(self, root=None, base_url=None):
+        self.root = os.path.abspath(root or os.environ.get('LOCAL_STORAGE_ROOT', os.path.join('instance', 'uploads')))
+        self.base_url = (base_url or os.environ.get('LOCAL_STORAGE_URL', '/static/uploads/profiles')).rstrip('/')
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.refs_dir = os.path.join(self.root, 'refs')
+        self._lock = threading.Lock()
+
+    def is_enabled(self):
+        """Local storage only needs a writable root, which is created on first write"""
+        return True
+
+    def upload_profile_picture(self, file_data, user_id, file_extension):
+        """Store a profile picture on disk"""
+        try:
+            processed_data = self._resize_image(self._read_file_data(file_data))
+            # A JPEG once re-encoded; the upload's own bytes if that failed
+            extension = image_extension(processed_data)
+            if extension is None:
+                return {'success': False, 'error': 'Unsupported image type'}
+            name = f"{hashlib.sha256(processed_data).hexdigest()}.{extension}"
+            relative_path = self._relative_path(name)
+            blob_path = os.path.join(self.objects_dir, relative_path)
+
+            with self._locked():
+                previous = self._read_ref(user_id)
+                if previous != name:
+                    # Read before the refs change: a blob stored without a count is counted from them
+                    count = self._count(name)
+                    previous_count = self._count(previous) if previous else 0
+                    # Content addressing makes an existing blob identical, so skip the write
+                    if not os.path.exists(blob_path):
+                        self._atomic_write(blob_path, processed_data)
+                    self._set_count(name, count + 1)
+                    self._atomic_write(self._ref_path(user_id), name.encode('ascii'))
+                    if previous:
+                        self._set_count(previous, previous_count - 1)
+
+            public_url = self.get_url(relative_path)
+            return {
+                'success': True,
+                'filename': relative_path,
+                'public_url': public_url,
+                'file_url': public_url,
+                'avatar_url': public_url,
+                'storage_id': relative_path,
+                'version': name
+            }
+
+        except Exception as e:
+            logger.error("❌ Local upload exception: %s", e)
+            return {'success': False, 'error': str(e)}
+
+    def get_profile_picture_url(self, user_id, width=500, height=500, version=None):
+        """Get the URL of a user's profile picture (only one size is stored locally).
+
+        The version of an upload is its blob name, so that upload's URL needs no lookup;
+        without one the user's current ref is read.
+        """
+        name = (version and self._blob_name(str(version))) or self._read_ref(user_id)
+        if not name:
+            return None
+        return self.get_url(self._relative_path(name))
+
+    def delete_profile_picture(self, user_id):
+        """Delete a user's profile picture, removing the blob once nothing references it"""
+        try:
+            with self._locked():
+                name = self._read_ref(user_id)
+                if not name:
+                    return {'success': False, 'error': 'No profile picture found'}
+                count = self._count(name)
+                os.remove(self._ref_path(user_id))
+                self._set_count(name, count - 1)
+            return {'success': True}
+
+        except Exception as e:
+            logger.error("❌ Local delete error: %s", e)
+            return {'success': False, 'error': str(e)}
+
+    def get_url(self, relative_path):
+        """Build the public URL for a blob"""
+        return f"{self.base_url}/{relative_path}"
+
+    def resolve(self, relative_path):
+        """Return (directory, filename) for a blob path, or None if it is not a valid blob name.
+
+        Used by the serving route so send_from_directory can stream (or sendfile) the blob.
+        """
+        parts = relative_path.split('/')
+        if len(parts) != 3 or not BLOB_PATTERN.match(parts[2]) or self._relative_path(parts[2]) != relative_path:
+            return None
+        return self.objects_dir, relative_path
+
+    def get_storage_stats(self):
+        """Get disk usage statistics"""
+        total_bytes = 0
+        total_files = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                if not BLOB_PATTERN.match(filename):
+                    continue
+                total_files += 1
+                total_bytes += os.path.getsize(os.path.join(dirpath, filename))
+
+        return {
+            'files': total_files,
+            'storage_used_mb': total_bytes / (1024 * 1024),
+            'root': self.root,
+            'connection_status': 'local'
+        }
+
+    def _relative_path(self, name):
+        return f"{name[:2]}/{name[2:4]}/{name}"
+
+    def _ref_path(self, user_id):
+        return os.path.join(self.refs_dir, f"profile_{int(user_id)}")
+
+    def _count_path(self, name):
+        return os.path.join(self.objects_dir, self._relative_path(name) + '.refs')
+
+    @staticmethod
+    def _blob_name(value):
+        """A blob name, from a ref or version; a bare hash is a JPEG stored before types were kept"""
+        if HASH_PATTERN.match(value):
+            return f"{value}.jpg"
+        return value if BLOB_PATTERN.match(value) else None
+
+    def _read_ref(self, user_id):
+        try:
+            with open(self._ref_path(user_id), 'rb') as f:
+                return self._blob_name(f.read().decode('ascii').strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @contextmanager
+    def _locked(self):
+        """Hold the store's lock: a thread lock, plus flock on .lock against other processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, '.lock'), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _count(self, name):
+        """Refs naming a blob (under the lock)"""
+        try:
+            with open(self._count_path(name), 'rb') as f:
+                return int(f.read())
+        except FileNotFoundError:
+            pass
+        if not os.path.exists(os.path.join(self.objects_dir, self._relative_path(name))):
+            return 0
+        # A blob stored before counts were kept: count its refs once
+        count = 0
+        if os.path.isdir(self.refs_dir):
+            for entry in os.scandir(self.refs_dir):
+                with open(entry.path, 'rb') as f:
+                    count += self._blob_name(f.read().decode('ascii').strip()) == name
+        return count
+
+    def _set_count(self, name, count):
+        """Record a blob's ref count, removing the blob once it is zero (under the lock)"""
+        if count > 0:
+            self._atomic_write(self._count_path(name), str(count).encode('ascii'))
+            return
+        for path in (os.path.join(self.objects_dir, self._relative_path(name)), self._count_path(name)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _atomic_write(self, path, data):
+        """Write to a temp file in the target directory, then rename it into place"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
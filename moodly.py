@@ -1,163 +1,48 @@
-# NUCLEAR PROTECTION - MUST BE FIRST LINE
 import os
-import sys
+import time
+import logging
 from dotenv import load_dotenv
-import psycopg2
-from urllib.parse import urlparse
 
 # Load environment variables from .env file
 load_dotenv()
 
-print("☁️ Loading Cloudinary configuration from environment...")
-print(f"✅ CLOUDINARY_CLOUD_NAME: {os.environ.get('CLOUDINARY_CLOUD_NAME', 'Not set')}")
-print(f"✅ CLOUDINARY_API_KEY: {os.environ.get('CLOUDINARY_API_KEY', 'Not set')[:10]}...")
-
-# FORCE SET ENVIRONMENT VARIABLES BEFORE ANY OTHER IMPORTS
-print("☁️ FORCING CLOUDINARY ENVIRONMENT VARIABLES...")
-# ✅ SECURE VERSION:
-# Verify Cloudinary credentials are loaded from .env
-cloudinary_cloud_name = os.getenv('CLOUDINARY_CLOUD_NAME')
-cloudinary_api_key = os.getenv('CLOUDINARY_API_KEY')
-cloudinary_api_secret = os.getenv('CLOUDINARY_API_SECRET')
-
-if not all([cloudinary_cloud_name, cloudinary_api_key, cloudinary_api_secret]):
-    print("⚠️ WARNING: Cloudinary credentials missing from .env file")
-    print("Add CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, and CLOUDINARY_API_SECRET to your .env file")
-else:
-    print("✅ Cloudinary credentials loaded from environment")  # Replace with your actual API secret
-os.environ['FORCE_CLOUDINARY_ONLY'] = 'true'
-os.environ['DISABLE_LOCAL_STORAGE'] = 'true'
-os.environ['NUCLEAR_MODE'] = 'true'
-
-# Verify they're set
-print(f"✅ CLOUDINARY_CLOUD_NAME set: {os.environ.get('CLOUDINARY_CLOUD_NAME')}")
-print(f"✅ CLOUDINARY_API_KEY set: {os.environ.get('CLOUDINARY_API_KEY')[:10]}...")
-
-# FORCE RELOAD CLOUDINARY STORAGE MODULE
-print("🔄 FORCING CLOUDINARY STORAGE MODULE RELOAD...")
-import importlib
-if 'cloudinary_storage' in sys.modules:
-    print("🔄 Reloading existing cloudinary_storage module...")
-    importlib.reload(sys.modules['cloudinary_storage'])
-else:
-    print("📦 Loading cloudinary_storage module for first time...")
-
-# Import Cloudinary storage
-from cloudinary_storage import cloudinary_storage
-print(f"🔍 Cloudinary storage after reload: {cloudinary_storage.is_enabled() if cloudinary_storage else 'None'}")
-
-# NUCLEAR FILE SYSTEM PROTECTION
-print("🚨 NUCLEAR FILE SYSTEM PROTECTION ACTIVE")
-original_makedirs = os.makedirs
-def nuclear_makedirs(path, *args, **kwargs):
-    print(f"🚫 NUCLEAR: Blocked makedirs('{path}',)")
-    return True
-
-os.makedirs = nuclear_makedirs
-
-# Continue with Flask imports
-from flask import Flask, request, render_template, redirect, url_for, session, flash, jsonify
+# Profile picture storage is selected with STORAGE_BACKEND (cloudinary or local)
+from moodly_clients import get_openai_client, get_storage, openai_api_key
+from moodly_auth import hash_password, verify_password
+from moodly_db import DATABASE_TYPE, DATABASE_CONFIG, DATABASE_PATH, bump_data_version
+from moodly_logging import configure_logging, init_request_ids
+from moodly_metrics import init_metrics, record_ai_call
+from moodly_querylog import init_query_log
+from moodly_maintenance import init_maintenance
+from moodly_cache import cached_page, init_response_cache
+from moodly_content import catalog, init_content
+from moodly_templates import init_templates
+import moodly_db
+import moodly_prompts
+import moodly_sentiment
+import moodly_series
+import moodly_timezones
+
+from flask import Flask, Response, request, render_template, redirect, url_for, session, flash, jsonify, g
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import sqlite3
 import hashlib
 import secrets
 import json
-import re
-from werkzeug.security import generate_password_hash, check_password_hash
-import openai
-from pathlib import Path
 from flask import send_from_directory
 
-# Vercel compatibility
-import os
-import sys
-
-# Detect Vercel environment
-def is_vercel():
-    return os.environ.get('VERCEL') == '1'
-
-# Modify database path for Vercel
-if is_vercel():
-    # Use /tmp for SQLite database in serverless environment
-    DATABASE_PATH = '/tmp/moodly.db'
-    # Disable local file operations in serverless
-    os.environ['DISABLE_LOCAL_STORAGE'] = 'true'
-    os.environ['FORCE_CLOUDINARY_ONLY'] = 'true'
-else:
-    DATABASE_PATH = 'moodly.db'
-
-# Detect Render environment
-def is_render():
-    return os.environ.get('RENDER') is not None
-
-# Database configuration for Render
-def get_database_url():
-    """Get database URL for different environments"""
-    database_url = os.environ.get('DATABASE_URL')
-    
-    if database_url:
-        # Parse PostgreSQL URL for Render
-        url = urlparse(database_url)
-        return {
-            'host': url.hostname,
-            'port': url.port,
-            'database': url.path[1:],
-            'user': url.username,
-            'password': url.password
-        }
-    else:
-        # Use SQLite for local development
-        return {'sqlite': 'moodly.db'}
-
-# Update database path for Render
-if is_render():
-    # Use PostgreSQL on Render
-    db_config = get_database_url()
-    if 'sqlite' not in db_config:
-        DATABASE_TYPE = 'postgresql'
-        DATABASE_CONFIG = db_config
-    else:
-        DATABASE_TYPE = 'sqlite'
-        DATABASE_PATH = '/opt/render/project/src/moodly.db'
-else:
-    DATABASE_TYPE = 'sqlite'
-    DATABASE_PATH = 'moodly.db'
-
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
-
-# File upload configuration for Cloudinary
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+logger = logging.getLogger('moodly')
+
+# Heavy or network-backed clients (OpenAI, psycopg2, Cloudinary) are created on
+# first use, so importing this module does no network I/O and prints nothing.
+# Where the database lives (DATABASE_TYPE/CONFIG/PATH) is decided in moodly_db.
+
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Initialize upload directory (for temporary processing only)
-UPLOAD_FOLDER = 'static/uploads/profiles'
-try:
-    Path(UPLOAD_FOLDER).mkdir(parents=True, exist_ok=True)
-    print(f"✅ Created local upload directory: {UPLOAD_FOLDER}")
-except Exception as e:
-    print(f"⚠️ Could not create upload directory: {e}")
-
-print(f"📂 LOCAL STORAGE: {UPLOAD_FOLDER}")
-print(f"📂 FINAL upload folder: {UPLOAD_FOLDER}")
-
-# Cloud storage initialization
-print("☁️ INITIALIZING CLOUDINARY STORAGE...")
-if cloudinary_storage and cloudinary_storage.is_enabled():
-    print("✅ Cloudinary cloud storage active")
-    STORAGE_TYPE = "Cloudinary"
-    USE_CLOUD_STORAGE = True
-else:
-    print("⚠️ WARNING: Cloudinary not configured!")
-    print("📋 Please add CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, and CLOUDINARY_API_SECRET to environment")
-    STORAGE_TYPE = "DISABLED"
-    USE_CLOUD_STORAGE = False
-
 # Environment detection
 def is_production():
     """Detect if running in production environment"""
@@ -182,59 +67,73 @@ def is_serverless():
     ]
     return any(serverless_indicators)
 
-# Print environment info
-print(f"🔍 Environment: {'Production' if is_production() else 'Development'}")
-print(f"📦 Storage: {STORAGE_TYPE}")
-print(f"📁 Upload folder: {UPLOAD_FOLDER if not USE_CLOUD_STORAGE else 'Cloudinary Cloud'}")
-
-# Initialize OpenAI
-openai_api_key = os.environ.get('OPENAI_API_KEY')
-if openai_api_key:
-    openai.api_key = openai_api_key
-    print("✅ OpenAI client initialized successfully!")
-else:
-    print("⚠️ OpenAI API key not found in environment variables")
-
-# Storage configuration
-print(f"📁 Using cloud storage: {USE_CLOUD_STORAGE}")
-print(f"🚨 Production mode: {is_production()} | Serverless: {is_serverless()}")
-print(f"✅ File uploads enabled: {USE_CLOUD_STORAGE}")
-print(f"📦 Storage type: {'Cloudinary Cloud' if USE_CLOUD_STORAGE else 'Local/Temp'}")
+# OpenAI and the storage backend come from moodly_clients, shared with the API
+def uploads_enabled():
+    """Check if the storage backend can accept uploads"""
+    storage = get_storage()
+    return bool(storage and storage.is_enabled())
+
+def storage_type():
+    """Display name of the active storage backend"""
+    return get_storage().display_name if uploads_enabled() else "DISABLED"
+
+def get_db_connection(read_only=False):
+    """Open a SQLite connection whose queries are counted in the request metrics.
+    
+    read_only connections may go to a read replica (DATABASE_REPLICA_URLS).
+    """
+    return moodly_db.connect(DATABASE_PATH, read_only=read_only)
+
+def get_postgres_connection():
+    """Open a PostgreSQL connection, importing psycopg2 on first use"""
+    import psycopg2
+    return psycopg2.connect(
+        host=DATABASE_CONFIG['host'],
+        port=DATABASE_CONFIG['port'],
+        database=DATABASE_CONFIG['database'],
+        user=DATABASE_CONFIG['user'],
+        password=DATABASE_CONFIG['password']
+    )
+
+# Routes and error handlers are collected here and bound to an app in create_app()
+ROUTES = []
+ERROR_HANDLERS = []
+
+def route(rule, **options):
+    """Register a view for create_app() (mirrors Flask.route)"""
+    def decorator(view):
+        ROUTES.append((rule, options, view))
+        return view
+    return decorator
+
+def errorhandler(code):
+    """Register an error handler for create_app() (mirrors Flask.errorhandler)"""
+    def decorator(handler):
+        ERROR_HANDLERS.append((code, handler))
+        return handler
+    return decorator
+
+_schema_checked = False
+
+def ensure_database_schema():
+    """Run the schema migration once per process, on the first request"""
+    global _schema_checked
+    if not _schema_checked:
+        _schema_checked = True
+        if DATABASE_TYPE == 'sqlite':
+            update_database_schema()
 
 # Database setup
-# Add this to your database setup section in moodly_app.py
 def update_database_schema():
-    """Update database schema to add missing columns"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    try:
-        # Add bio column to users table if it doesn't exist
-        cursor.execute("ALTER TABLE users ADD COLUMN bio TEXT")
-        print("Added bio column to users table")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e).lower():
-            print("Bio column already exists")
-        else:
-            print(f"Error updating schema: {e}")
-    
-    conn.commit()
-    conn.close()
+    """Bring an existing database (from this app, the API or app.py) up to the shared schema"""
+    moodly_db.init_schema(backfill=True)
 
-# Call this function in your app initialization
-update_database_schema()
 def init_db():
     """Initialize the SQLite database with all required tables"""
     if DATABASE_TYPE == 'postgresql':
         try:
             # PostgreSQL connection for Render
-            conn = psycopg2.connect(
-                host=DATABASE_CONFIG['host'],
-                port=DATABASE_CONFIG['port'],
-                database=DATABASE_CONFIG['database'],
-                user=DATABASE_CONFIG['user'],
-                password=DATABASE_CONFIG['password']
-            )
+            conn = get_postgres_connection()
             cursor = conn.cursor()
             
             # Create tables with PostgreSQL syntax
@@ -249,9 +148,17 @@ def init_db():
                     cloudinary_id TEXT,
                     bio TEXT,
                     mood_streak INTEGER DEFAULT 0,
-                    last_mood_date DATE
+                    last_mood_date DATE,
+                    avatar_url TEXT,
+                    avatar_version TEXT,
+                    data_version INTEGER DEFAULT 0,
+                    timezone TEXT
                 )
             ''')
+            cursor.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar_url TEXT')
+            cursor.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar_version TEXT')
+            cursor.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version INTEGER DEFAULT 0')
+            cursor.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone TEXT')
             
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS mood_entries (
@@ -263,9 +170,15 @@ def init_db():
                     ai_insights TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     tags TEXT,
+                    local_date DATE,
                     FOREIGN KEY (user_id) REFERENCES users (id)
                 )
             ''')
+            cursor.execute('ALTER TABLE mood_entries ADD COLUMN IF NOT EXISTS local_date DATE')
+            cursor.execute('ALTER TABLE mood_entries ADD COLUMN IF NOT EXISTS text_sentiment REAL')
+            cursor.execute('ALTER TABLE mood_entries ADD COLUMN IF NOT EXISTS text_emotion TEXT')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_mood_entries_user_local_date '
+                           'ON mood_entries (user_id, local_date)')
             
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS goals (
@@ -289,64 +202,15 @@ def init_db():
             print(f"❌ PostgreSQL database initialization failed: {e}")
             print("📋 Please check your DATABASE_URL environment variable")
     else:
-        # SQLite initialization (existing code)
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Users table with profile picture support
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                profile_picture TEXT,
-                cloudinary_id TEXT,
-                bio TEXT,
-                mood_streak INTEGER DEFAULT 0,
-                last_mood_date DATE
-            )
-        ''')
-        
-        # Mood entries table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS mood_entries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                mood_score INTEGER NOT NULL,
-                mood_description TEXT,
-                entry_text TEXT,
-                ai_insights TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                tags TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Goals table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS goals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                target_date DATE,
-                completed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        # SQLite: the schema shared with the API (and the shards, if any) lives in moodly_db
+        moodly_db.init_schema()
         print("✅ SQLite database initialized successfully")
 
-# File upload helpers for Cloudinary
+# File upload helpers for the configured storage backend
 def upload_profile_picture(file, user_id):
-    """Upload profile picture to Cloudinary"""
-    if not USE_CLOUD_STORAGE:
-        return {'success': False, 'error': 'Cloud storage not available'}
+    """Upload profile picture to the storage backend"""
+    if not uploads_enabled():
+        return {'success': False, 'error': 'Storage not available'}
     
     if file and allowed_file(file.filename):
         try:
@@ -354,70 +218,93 @@ def upload_profile_picture(file, user_id):
             filename = secure_filename(file.filename)
             file_extension = filename.rsplit('.', 1)[1].lower()
             
-            # Upload to Cloudinary
-            result = cloudinary_storage.upload_profile_picture(
+            result = get_storage().upload_profile_picture(
                 file_data=file,
                 user_id=user_id,
                 file_extension=file_extension
             )
             
             if result['success']:
-                print(f"✅ Profile picture uploaded to Cloudinary: {result['public_url']}")
+                logger.info("Profile picture uploaded", extra={'user_id': user_id, 'storage': storage_type()})
                 return result
             else:
-                print(f"❌ Cloudinary upload failed: {result['error']}")
+                logger.warning("Profile picture upload failed: %s", result['error'],
+                               extra={'user_id': user_id, 'storage': storage_type()})
                 return result
                 
         except Exception as e:
-            print(f"❌ Upload error: {e}")
+            logger.exception("Profile picture upload error", extra={'user_id': user_id})
             return {'success': False, 'error': str(e)}
     
     return {'success': False, 'error': 'Invalid file type'}
 
-def get_profile_picture_url(user_id):
-    """Get profile picture URL from Cloudinary"""
-    if USE_CLOUD_STORAGE and cloudinary_storage:
-        return cloudinary_storage.get_profile_picture_url(user_id)
+def get_profile_picture_url(user, width=500, height=500):
+    """Get a profile picture URL variant from the storage backend, for the upload stored on the user"""
+    if uploads_enabled():
+        return get_storage().get_profile_picture_url(user['id'], width=width, height=height,
+                                                     version=user.get('avatar_version'))
     return None
 
+def get_avatar_url(user):
+    """Get the avatar URL stored at upload time, without calling the storage backend"""
+    return user.get('avatar_url') or user.get('profile_picture')
+
 def delete_profile_picture(user_id):
-    """Delete profile picture from Cloudinary"""
-    if USE_CLOUD_STORAGE and cloudinary_storage:
-        return cloudinary_storage.delete_profile_picture(user_id)
-    return {'success': False, 'error': 'Cloud storage not available'}
+    """Delete profile picture from the storage backend"""
+    if uploads_enabled():
+        return get_storage().delete_profile_picture(user_id)
+    return {'success': False, 'error': 'Storage not available'}
 
 # Authentication helpers
-def hash_password(password):
-    """Hash password using werkzeug security"""
-    return generate_password_hash(password)
-
-def verify_password(password, password_hash):
-    """Verify password against hash"""
-    return check_password_hash(password_hash, password)
-
 def get_current_user():
-    """Get current user info from session"""
+    """Get current user info from session, loaded at most once per request"""
+    cached = g.get('current_user')
+    if cached is not None and cached[0] == session.get('user_id'):
+        return cached[1]
+    user = load_current_user()
+    g.current_user = (session.get('user_id'), user)
+    return user
+
+def load_current_user():
     if 'user_id' in session:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],))
         user = cursor.fetchone()
         conn.close()
         
         if user:
+            user = dict(user)
             return {
-                'id': user[0],
-                'username': user[1],
-                'email': user[2],
-                'created_at': user[4],
-                'profile_picture': user[5],
-                'cloudinary_id': user[6],
-                'bio': user[7],
-                'mood_streak': user[8],
-                'last_mood_date': user[9]
+                'id': user['id'],
+                'username': user['username'],
+                'email': user['email'],
+                'created_at': user['created_at'],
+                'profile_picture': user.get('profile_picture'),
+                'cloudinary_id': user.get('cloudinary_id'),
+                'avatar_url': user.get('avatar_url'),
+                'avatar_version': user.get('avatar_version'),
+                'bio': user.get('bio'),
+                'mood_streak': user.get('mood_streak'),
+                'last_mood_date': user.get('last_mood_date'),
+                'timezone': user.get('timezone') or moodly_timezones.DEFAULT_TIMEZONE,
+                'data_version': user.get('data_version') or 0
             }
     return None
 
+def page_cache_version():
+    """(user_id, data_version) keying the response cache"""
+    user = get_current_user()
+    if not user:
+        return None, 0
+    return user['id'], user['data_version']
+
+def page_cache_today():
+    """The current user's local date, keying date-relative cached pages"""
+    user = get_current_user()
+    return moodly_timezones.local_today(user['timezone']) if user else None
+
 def get_mood_options():
     """Get standard mood options for templates"""
     return {
@@ -472,7 +359,7 @@ def get_mood_options():
     }
 def get_recent_moods(user_id):
     """Get recent mood entries for a user"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db_connection(read_only=True)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT mood_score, mood_description, entry_text, created_at
@@ -492,17 +379,20 @@ def get_recent_moods(user_id):
         'created_at': mood[3]
     } for mood in recent_moods]
 # Mood analysis with OpenAI
-def analyze_mood_with_ai(mood_text, mood_score):
-    """Analyze mood entry using OpenAI GPT"""
-    if not openai_api_key:
+def analyze_mood_with_ai(mood_text, mood_score, user_id=None):
+    """Analyze mood entry using OpenAI GPT; with `user_id`, in light of their recent entries"""
+    client = get_openai_client()
+    if not client:
+        record_ai_call('fallback')
         return "AI analysis not available - OpenAI API key not configured."
     
+    start = time.perf_counter()
     try:
         prompt = f"""
         Analyze this mood entry and provide supportive insights:
         
         Mood Score: {mood_score}/10
-        Entry: {mood_text}
+        Entry: {moodly_prompts.truncate(mood_text, moodly_prompts.ENTRY_NOTE_TOKENS)}
         
         Please provide:
         1. A brief, empathetic reflection on their mood
@@ -512,36 +402,29 @@ def analyze_mood_with_ai(mood_text, mood_score):
         Keep the response under 150 words and maintain a supportive, professional tone.
         """
         
-        response = openai.ChatCompletion.create(
+        history = moodly_prompts.recent_history(user_id) if user_id is not None else None
+        response = client.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a compassionate AI wellness assistant helping people understand their emotions and improve their mental health."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=moodly_prompts.build_messages(
+                "You are a compassionate AI wellness assistant helping people understand their emotions and improve their mental health.",
+                prompt, history),
             max_tokens=200,
             temperature=0.7
         )
         
+        record_ai_call('openai', time.perf_counter() - start)
+        moodly_prompts.record_usage(response)
         return response.choices[0].message.content.strip()
         
     except Exception as e:
-        print(f"❌ OpenAI analysis error: {e}")
+        record_ai_call('fallback', time.perf_counter() - start)
+        logger.warning("OpenAI analysis error: %s", e)
         return f"AI analysis temporarily unavailable. Your mood entry has been saved successfully."
 
 # Routes
 # Add these routes before the "if __name__ == '__main__':" section
 
-@app.route('/profile')
-def profile():
-    """User profile page"""
-    user = get_current_user()
-    if not user:
-        flash('Please log in to view your profile', 'warning')
-        return redirect(url_for('login'))
-    
-    return render_template('profile.html', user=user)
-
-@app.route('/edit_profile', methods=['GET', 'POST'])
+@route('/edit_profile', methods=['GET', 'POST'])
 def edit_profile():
     """Edit user profile"""
     user = get_current_user()
@@ -553,31 +436,30 @@ def edit_profile():
         # Handle profile updates here
         username = request.form.get('username', user['username'])
         email = request.form.get('email', user['email'])
+        # Applies to entries from now on; existing entries keep the day they were logged on
+        user_timezone = request.form.get('timezone', user['timezone'])
+        if not moodly_timezones.is_valid_timezone(user_timezone):
+            flash('Unknown timezone', 'error')
+            return redirect(url_for('edit_profile'))
         
         # Update user in database
-        conn = sqlite3.connect(DATABASE_PATH)
+        moodly_db.update_login(user['id'], username, email)
+        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE users 
-            SET username = ?, email = ? 
+            SET username = ?, email = ?, timezone = ?, data_version = COALESCE(data_version, 0) + 1
             WHERE id = ?
-        ''', (username, email, user['id']))
+        ''', (username, email, user_timezone, user['id']))
         conn.commit()
         conn.close()
         
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('profile'))
     
-    return render_template('edit_profile.html', user=user)
-
-@app.route('/terms')
-def terms():
-    """Terms of service page"""
-    return render_template('terms.html')
-
+    return render_template('edit_profile.html', user=user, timezones=moodly_timezones.timezone_choices())
 
-
-@app.route('/log_mood', methods=['GET', 'POST'])
+@route('/log_mood', methods=['GET', 'POST'])
 def log_mood():
     """Log mood entry page"""
     user = get_current_user()
@@ -590,13 +472,20 @@ def log_mood():
         mood_description = request.form.get('mood_description')
         entry_text = request.form.get('entry_text')
         
-        # Save mood entry to database
-        conn = sqlite3.connect(DATABASE_PATH)
+        # Save mood entry to database (UTC, as datetime('now') stored it)
+        created_at = moodly_timezones.utc_timestamp()
+        text_sentiment, text_emotion = moodly_sentiment.score_fields(entry_text)
+        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO mood_entries (user_id, mood_score, mood_description, entry_text, created_at)
-            VALUES (?, ?, ?, ?, datetime('now'))
-        ''', (user['id'], mood_score, mood_description, entry_text))
+            INSERT INTO mood_entries (user_id, mood_score, mood_description, entry_text, created_at, local_date,
+                                      text_sentiment, text_emotion)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user['id'], mood_score, mood_description, entry_text, created_at,
+              moodly_timezones.local_date(created_at, user['timezone']), text_sentiment, text_emotion))
+        if moodly_series.enabled():
+            moodly_series.append(cursor, user['id'], created_at, mood_score)
+        bump_data_version(cursor, user['id'])
         conn.commit()
         conn.close()
         
@@ -609,12 +498,7 @@ def log_mood():
     
     return render_template('log_mood.html', user=user, moods=moods, selected_mood=selected_mood)
 
-@app.route('/mood_entry', methods=['GET', 'POST'])
-def mood_entry():
-    """Alias for log_mood (alternative route name)"""
-    return log_mood()
-
-@app.route('/mood_analytics')
+@route('/mood_analytics')
 def mood_analytics():
     """Mood analytics page"""
     user = get_current_user()
@@ -623,7 +507,7 @@ def mood_analytics():
         return redirect(url_for('login'))
     
     # Get mood data for charts
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db_connection(read_only=True)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT mood_score, COUNT(*) as count
@@ -638,40 +522,14 @@ def mood_analytics():
 
 
 
-@app.route('/mood_tracker')
-def mood_tracker():
-    """Mood tracking analytics page"""
-    user = get_current_user()
-    if not user:
-        flash('Please log in to view your mood tracker', 'warning')
-        return redirect(url_for('login'))
-    
-    # Get mood data for charts
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT mood_score, mood_description, created_at
-        FROM mood_entries 
-        WHERE user_id = ? 
-        ORDER BY created_at DESC 
-        LIMIT 30
-    ''', (user['id'],))
-    mood_data = cursor.fetchall()
-    conn.close()
-    
-    return render_template('mood_tracker.html', user=user, mood_data=mood_data)
-@app.route('/privacy')
-def privacy():
-    """Privacy policy page"""
-    return render_template('privacy.html')
-@app.route('/')
+@route('/')
 def index():
     """Home page"""
     user = get_current_user()
     moods = get_mood_options()
     return render_template('index.html', user=user, moods=moods)
 
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 def register():
     """User registration"""
     if request.method == 'POST':
@@ -685,24 +543,13 @@ def register():
             return render_template('register.html')
         
         # Check if user exists
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM users WHERE username = ? OR email = ?', (username, email))
-        if cursor.fetchone():
+        if moodly_db.user_exists(username, email):
             flash('Username or email already exists', 'error')
-            conn.close()
             return render_template('auth/signup.html')
 
         # Create user
         password_hash = hash_password(password)
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash)
-            VALUES (?, ?, ?)
-        ''', (username, email, password_hash))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        user_id = moodly_db.create_user(username, email, password_hash)
         
         # Log user in
         session['user_id'] = user_id
@@ -711,21 +558,17 @@ def register():
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     """User login"""
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, password_hash FROM users WHERE username = ? OR email = ?', (username, username))
-        user = cursor.fetchone()
-        conn.close()
+        user = moodly_db.find_user(username)
         
-        if user and verify_password(password, user[1]):
-            session['user_id'] = user[0]
+        if user and verify_password(password, user['password_hash']):
+            session['user_id'] = user['id']
             flash('Login successful!', 'success')
             return redirect(url_for('dashboard'))
         else:
@@ -733,14 +576,14 @@ def login():
 
     return render_template('auth/login.html')
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     """User logout"""
     session.clear()
     flash('You have been logged out', 'info')
     return redirect(url_for('index'))
 
-@app.route('/dashboard')
+@route('/dashboard')
 def dashboard():
     """Dashboard page"""
     user = get_current_user()
@@ -760,7 +603,7 @@ def dashboard():
                          recent_moods=recent_moods)
     
     # Get recent mood entries using raw SQLite queries
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT mood_score, mood_description, entry_text, created_at
@@ -777,7 +620,7 @@ def dashboard():
 
     return render_template('dashboard.html', user=user, moods=moods, recent_moods=recent_moods)
 
-@app.route('/profile', methods=['GET', 'POST'])
+@route('/profile', methods=['GET', 'POST'])
 def profile():
     """User profile management"""
     user = get_current_user()
@@ -791,45 +634,50 @@ def profile():
         # Handle profile picture upload
         profile_picture_url = user.get('profile_picture')
         cloudinary_id = user.get('cloudinary_id')
+        avatar_url = user.get('avatar_url')
+        avatar_version = user.get('avatar_version')
         
         if 'profile_picture' in request.files:
             file = request.files['profile_picture']
             if file and file.filename != '':
-                # Delete old profile picture from Cloudinary
+                # Delete old profile picture from storage
                 if cloudinary_id:
                     delete_result = delete_profile_picture(user['id'])
-                    print(f"🗑️ Delete old profile picture result: {delete_result}")
+                    logger.info("Deleted old profile picture", extra={'user_id': user['id'], 'result': delete_result.get('success')})
                 
-                # Upload new profile picture to Cloudinary
+                # Upload new profile picture to storage
                 upload_result = upload_profile_picture(file, user['id'])
                 if upload_result['success']:
                     profile_picture_url = upload_result['public_url']
-                    cloudinary_id = upload_result.get('cloudinary_id')
+                    cloudinary_id = upload_result.get('storage_id')
+                    avatar_url = upload_result.get('avatar_url', profile_picture_url)
+                    avatar_version = upload_result.get('version')
                     flash('Profile picture updated successfully!', 'success')
                 else:
                     flash(f'Profile picture upload failed: {upload_result["error"]}', 'error')
         
         # Update database
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE users 
-            SET bio = ?, profile_picture = ?, cloudinary_id = ?
+            SET bio = ?, profile_picture = ?, cloudinary_id = ?, avatar_url = ?, avatar_version = ?,
+                data_version = COALESCE(data_version, 0) + 1
             WHERE id = ?
-        ''', (bio, profile_picture_url, cloudinary_id, user['id']))
+        ''', (bio, profile_picture_url, cloudinary_id, avatar_url, avatar_version, user['id']))
         conn.commit()
         conn.close()
         
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('profile'))
     
-    # Get profile picture URL for display
-    profile_picture_url = get_profile_picture_url(user['id'])
-    user['profile_picture_url'] = profile_picture_url
+    # Avatar URL was computed and versioned at upload time
+    user['profile_picture_url'] = get_avatar_url(user)
     
     return render_template('profile.html', user=user)
 
-@app.route('/mood', methods=['GET', 'POST'])
+@route('/mood', methods=['GET', 'POST'])
+@route('/mood_entry', methods=['GET', 'POST'])
 def mood_entry():
     """Mood entry form"""
     user = get_current_user()
@@ -843,24 +691,43 @@ def mood_entry():
         tags = request.form.get('tags', '')
         
         # Get AI insights
-        ai_insights = analyze_mood_with_ai(entry_text, mood_score)
+        ai_insights = analyze_mood_with_ai(entry_text, mood_score, user['id'])
         
-        # Save mood entry
-        conn = sqlite3.connect(DATABASE_PATH)
+        # Save mood entry; created_at is UTC, local_date is the day in the user's timezone
+        created_at = moodly_timezones.utc_timestamp()
+        entry_date = moodly_timezones.local_date(created_at, user['timezone'])
+        text_sentiment, text_emotion = moodly_sentiment.score_fields(entry_text)
+        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO mood_entries (user_id, mood_score, mood_description, entry_text, tags, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user['id'], mood_score, mood_description, entry_text, tags, datetime.now()))
-        
-        # Reset streak
-        cursor.execute('UPDATE users SET mood_streak = 1, last_mood_date = ? WHERE id = ?', 
-                       (today, user['id']))
+            INSERT INTO mood_entries (user_id, mood_score, mood_description, entry_text, tags, ai_insights, created_at,
+                                      local_date, text_sentiment, text_emotion)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user['id'], mood_score, mood_description, entry_text, tags, ai_insights, created_at, entry_date,
+              text_sentiment, text_emotion))
+        if moodly_series.enabled():
+            moodly_series.append(cursor, user['id'], created_at, mood_score)
         
+        # Update mood streak
+        today = datetime.strptime(entry_date, '%Y-%m-%d').date()
+        last_mood_date = user.get('last_mood_date')
+        if last_mood_date:
+            last_date = datetime.strptime(str(last_mood_date), '%Y-%m-%d').date()
+            if last_date == today:
+                streak = user.get('mood_streak') or 1
+            elif last_date == today - timedelta(days=1):
+                streak = (user.get('mood_streak') or 0) + 1
+            else:
+                # Reset streak
+                streak = 1
+            cursor.execute('UPDATE users SET mood_streak = ?, last_mood_date = ?, '
+                           'data_version = COALESCE(data_version, 0) + 1 WHERE id = ?',
+                           (streak, today, user['id']))
         else:
             # First mood entry
- Cursor.execute('UPDATE users SET mood_streak = 1, last_mood_date = ? WHERE id = ?',  # type: ignore
-                         (today, user['id']))
+            cursor.execute('UPDATE users SET mood_streak = 1, last_mood_date = ?, '
+                           'data_version = COALESCE(data_version, 0) + 1 WHERE id = ?',
+                           (today, user['id']))
         
         conn.commit()
         conn.close()
@@ -870,7 +737,7 @@ def mood_entry():
     
     return render_template('mood_entry.html', user=user)
 
-@app.route('/goals', methods=['GET', 'POST'])
+@route('/goals', methods=['GET', 'POST'])
 def goals():
     """Goals management"""
     user = get_current_user()
@@ -882,12 +749,13 @@ def goals():
         description = request.form['description']
         target_date = request.form['target_date']
         
-        conn = sqlite3.connect('moodly.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO goals (user_id, title, description, target_date)
             VALUES (?, ?, ?, ?)
         ''', (user['id'], title, description, target_date))
+        bump_data_version(cursor, user['id'])
         conn.commit()
         conn.close()
         
@@ -895,7 +763,7 @@ def goals():
         return redirect(url_for('goals'))
     
     # Get all goals
-    conn = sqlite3.connect('moodly.db')
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT id, title, description, target_date, completed, created_at
@@ -908,35 +776,44 @@ def goals():
     
     return render_template('goals.html', user=user, goals=user_goals)
 
-@app.route('/complete_goal/<int:goal_id>')
+@route('/complete_goal/<int:goal_id>')
 def complete_goal(goal_id):
     """Mark goal as completed"""
     user = get_current_user()
     if not user:
         return redirect(url_for('login'))
     
-    conn = sqlite3.connect('moodly.db')
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('UPDATE goals SET completed = TRUE WHERE id = ? AND user_id = ?', (goal_id, user['id']))
+    bump_data_version(cursor, user['id'])
     conn.commit()
     conn.close()
     
     flash('Goal marked as completed! 🎉', 'success')
     return redirect(url_for('goals'))
 
-@app.route('/analytics')
+@route('/analytics')
+@cached_page(dated=True)
 def analytics():
     """Mood analytics and insights"""
     user = get_current_user()
     if not user:
         return redirect(url_for('login'))
     
-    conn = sqlite3.connect('moodly.db')
+    conn = get_db_connection(read_only=True)
+    
+    if moodly_series.enabled():
+        mood_data = moodly_series.recent(conn, user['id'], 30, user['timezone'])
+        stats = moodly_series.stats(conn, user['id'])
+        conn.close()
+        return render_template('analytics.html', user=user, mood_data=mood_data, stats=stats)
+    
     cursor = conn.cursor()
     
     # Get mood data for charts
     cursor.execute('''
-        SELECT mood_score, DATE(created_at) as date
+        SELECT mood_score, local_date as date
         FROM mood_entries 
         WHERE user_id = ? 
         ORDER BY created_at DESC 
@@ -963,33 +840,39 @@ def analytics():
                          mood_data=mood_data, 
                          stats=stats)
 
-@app.route('/api/storage-status')
+@route('/api/storage-status')
 def storage_status():
     """API endpoint to check storage status"""
     status = {
-        'storage_type': STORAGE_TYPE,
-        'cloud_enabled': USE_CLOUD_STORAGE,
-        'upload_enabled': USE_CLOUD_STORAGE
+        'storage_type': storage_type(),
+        'storage_backend': get_storage().name if get_storage() else None,
+        'cloud_enabled': uploads_enabled() and get_storage().name == 'cloudinary',
+        'upload_enabled': uploads_enabled()
     }
     
-    if USE_CLOUD_STORAGE and cloudinary_storage:
-        stats = cloudinary_storage.get_storage_stats()
+    if uploads_enabled():
+        stats = get_storage().get_storage_stats()
         if stats:
             status['storage_stats'] = stats
     
     return jsonify(status)
 
-@app.errorhandler(413)
+@errorhandler(413)
 def too_large(e):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'File too large'}), 413
     flash('File too large. Please choose a file smaller than 16MB.', 'error')
     return redirect(request.url)
 
-@app.errorhandler(500)
+@errorhandler(500)
 def internal_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Internal server error'}), 500
     flash('An internal error occurred. Please try again.', 'error')
     return redirect(url_for('dashboard'))
 
-@app.route('/journal_templates')
+@route('/journal_templates')
+@cached_page
 def journal_templates():
     """Journal templates page"""
     user = get_current_user()
@@ -997,126 +880,40 @@ def journal_templates():
         return redirect(url_for('login'))
     
     # Sample journal templates for mood tracking
-    templates = [
-        {
-            'id': 1,
-            'title': 'Daily Reflection',
-            'description': 'Reflect on your day and emotions',
-            'icon': 'fas fa-sun',
-            'prompts': [
-                'How did I feel today overall?',
-                'What was the highlight of my day?',
-                'What challenged me today?',
-                'What am I grateful for right now?',
-                'How can I make tomorrow better?'
-            ]
-        },
-        {
-            'id': 2,
-            'title': 'Mood Tracker',
-            'description': 'Track your mood patterns and triggers',
-            'icon': 'fas fa-heart',
-            'prompts': [
-                'Rate your overall mood (1-10)',
-                'What influenced your mood today?',
-                'What activities made you feel better?',
-                'Any mood triggers to note?',
-                'What patterns do I notice?'
-            ]
-        },
-        {
-            'id': 3,
-            'title': 'Anxiety Check-in',
-            'description': 'Process anxious thoughts and feelings',
-            'icon': 'fas fa-brain',
-            'prompts': [
-                'What am I feeling anxious about?',
-                'Are these worries realistic?',
-                'What can I control vs. what can\'t I control?',
-                'What would help me feel calmer?',
-                'What coping strategies can I use?'
-            ]
-        },
-        {
-            'id': 4,
-            'title': 'Gratitude Journal',
-            'description': 'Focus on positive aspects of life',
-            'icon': 'fas fa-star',
-            'prompts': [
-                'Three things I\'m grateful for today',
-                'Someone who made my day better',
-                'A small joy I experienced',
-                'Something I accomplished',
-                'A positive change I\'ve noticed'
-            ]
-        },
-        {
-            'id': 5,
-            'title': 'Goal Progress',
-            'description': 'Track progress toward your goals',
-            'icon': 'fas fa-target',
-            'prompts': [
-                'What progress did I make today?',
-                'What obstacles did I encounter?',
-                'What will I do differently tomorrow?',
-                'How do I feel about my progress?',
-                'What support do I need?'
-            ]
-        },
-        {
-            'id': 6,
-            'title': 'Stress Release',
-            'description': 'Process and release stress',
-            'icon': 'fas fa-leaf',
-            'prompts': [
-                'What is causing me stress right now?',
-                'How is this stress affecting me?',
-                'What can I do to reduce this stress?',
-                'What relaxation techniques help me?',
-                'How can I prevent this stress in the future?'
-            ]
-        }
-    ]
+    templates = catalog.get('journal_templates')
     
     return render_template('journal_templates.html', user=user, templates=templates)
 
-@app.route('/journal_template/<int:template_id>')
+@route('/journal_template/<int:template_id>')
 def use_journal_template(template_id):
     """Use a specific journal template for mood entry"""
     user = get_current_user()
     if not user:
         return redirect(url_for('login'))
     
-    # Template data for pre-filling the mood entry form
-    template_data = {
-        1: {'title': 'Daily Reflection', 'prompts': 'How did I feel today overall?\nWhat was the highlight of my day?\nWhat challenged me today?\nWhat am I grateful for right now?'},
-        2: {'title': 'Mood Tracker', 'prompts': 'Rate your overall mood (1-10):\nWhat influenced your mood today?\nWhat activities made you feel better?\nAny mood triggers to note?'},
-        3: {'title': 'Anxiety Check-in', 'prompts': 'What am I feeling anxious about?\nAre these worries realistic?\nWhat can I control vs. what can\'t I control?\nWhat would help me feel calmer?'},
-        4: {'title': 'Gratitude Journal', 'prompts': 'Three things I\'m grateful for today:\n1.\n2.\n3.\n\nSomeone who made my day better:\nA small joy I experienced:'},
-        5: {'title': 'Goal Progress', 'prompts': 'What progress did I make today?\nWhat obstacles did I encounter?\nWhat will I do differently tomorrow?\nHow do I feel about my progress?'},
-        6: {'title': 'Stress Release', 'prompts': 'What is causing me stress right now?\nHow is this stress affecting me?\nWhat can I do to reduce this stress?\nWhat relaxation techniques help me?'}
-    }
-    
-    template = template_data.get(template_id)
-    if template:
+    entry = catalog.lookup('journal_templates', template_id)
+    if entry:
+        # The mood entry form takes the prompts pre-filled as one block of text
+        template = {'title': entry['title'], 'prompts': entry['entry_prompts']}
         return render_template('mood_entry.html', user=user, template=template)
     else:
         flash('Template not found', 'error')
         return redirect(url_for('journal_templates'))
 
-@app.route('/mood_tracker')
+@route('/mood_tracker')
+@cached_page(dated=True)
 def mood_tracker():
     """Mood tracking dashboard with charts and analytics"""
     user = get_current_user()
     if not user:
         return redirect(url_for('login'))
     
-    conn = sqlite3.connect('moodly.db')
+    conn = get_db_connection(read_only=True)
     cursor = conn.cursor()
     
     # Get recent mood entries for the tracker
     cursor.execute('''
-        SELECT mood_score, mood_description, DATE(created_at) as date, created_at
+        SELECT mood_score, mood_description, local_date as date, created_at
         FROM mood_entries 
         WHERE user_id = ? 
         ORDER BY created_at DESC 
@@ -1136,18 +933,18 @@ def mood_tracker():
     ''', (user['id'],))
     stats = cursor.fetchone()
     
-    # Get mood trends for the last 7 days
+    # Get mood trends for the last 7 days (of the user's calendar)
     cursor.execute('''
         SELECT 
-            DATE(created_at) as date,
+            local_date as date,
             AVG(CAST(mood_score AS FLOAT)) as avg_score,
             COUNT(*) as entry_count
         FROM mood_entries 
         WHERE user_id = ? 
-        AND created_at >= date('now', '-7 days')
-        GROUP BY DATE(created_at)
-        ORDER BY date DESC
-    ''', (user['id'],))
+        AND local_date >= ?
+        GROUP BY local_date
+        ORDER BY local_date DESC
+    ''', (user['id'], moodly_timezones.local_today(user['timezone'], 7)))
     weekly_trends = cursor.fetchall()
     
     # Get mood distribution
@@ -1171,7 +968,8 @@ def mood_tracker():
                          weekly_trends=weekly_trends,
                          mood_distribution=mood_distribution)
 
-@app.route('/wellness')
+@route('/wellness')
+@cached_page
 def wellness():
     """Wellness resources and tips"""
     user = get_current_user()
@@ -1179,52 +977,11 @@ def wellness():
         return redirect(url_for('login'))
     
     # Wellness resources
-    wellness_tips = [
-        {
-            'category': 'Mindfulness',
-            'icon': 'fas fa-leaf',
-            'tips': [
-                'Practice 5-minute daily meditation',
-                'Try deep breathing exercises',
-                'Focus on the present moment',
-                'Use mindfulness apps for guidance'
-            ]
-        },
-        {
-            'category': 'Physical Health',
-            'icon': 'fas fa-heartbeat',
-            'tips': [
-                'Get 7-9 hours of quality sleep',
-                'Exercise for 30 minutes daily',
-                'Eat nutritious, balanced meals',
-                'Stay hydrated throughout the day'
-            ]
-        },
-        {
-            'category': 'Social Connection',
-            'icon': 'fas fa-users',
-            'tips': [
-                'Reach out to friends and family',
-                'Join community groups or clubs',
-                'Practice active listening',
-                'Express gratitude to others'
-            ]
-        },
-        {
-            'category': 'Stress Management',
-            'icon': 'fas fa-spa',
-            'tips': [
-                'Identify your stress triggers',
-                'Practice relaxation techniques',
-                'Set healthy boundaries',
-                'Take regular breaks from work'
-            ]
-        }
-    ]
+    wellness_tips = catalog.get('wellness_tips')
     
     return render_template('wellness.html', user=user, wellness_tips=wellness_tips)
 
-@app.route('/insights')
+@route('/insights')
 def insights():
     """AI-powered insights page"""
     user = get_current_user()
@@ -1234,7 +991,7 @@ def insights():
     # For now, redirect to analytics
     return redirect(url_for('analytics'))
 
-@app.route('/settings')
+@route('/settings')
 def settings():
     """User settings page"""
     user = get_current_user()
@@ -1244,7 +1001,7 @@ def settings():
     # For now, redirect to profile
     return redirect(url_for('profile'))
 
-@app.route('/resources')
+@route('/resources')
 def resources():
     """Mental health resources"""
     user = get_current_user()
@@ -1254,14 +1011,14 @@ def resources():
     # For now, redirect to wellness
     return redirect(url_for('wellness'))
 
-@app.route('/achievements')
+@route('/achievements')
 def achievements_page():
     """User achievements and milestones page"""
     user = get_current_user()
     if not user:
         return redirect(url_for('login'))
     
-    conn = sqlite3.connect('moodly.db')
+    conn = get_db_connection(read_only=True)
     cursor = conn.cursor()
     
     # Get user statistics for achievements
@@ -1448,7 +1205,8 @@ def achievements_page():
                          goal_stats=goal_stats,
                          current_streak=current_streak)
 
-@app.route('/wellness_hub')
+@route('/wellness_hub')
+@cached_page
 def wellness_hub():
     """Comprehensive wellness hub with resources and tools"""
     user = get_current_user()
@@ -1456,140 +1214,10 @@ def wellness_hub():
         return redirect(url_for('login'))
     
     # Wellness categories with resources
-    wellness_categories = [
-        {
-            'title': 'Mental Health Resources',
-            'icon': 'fas fa-brain',
-            'color': 'primary',
-            'resources': [
-                {
-                    'title': 'Crisis Support',
-                    'description': 'Immediate help when you need it most',
-                    'links': [
-                        {'text': 'National Suicide Prevention Lifeline', 'url': 'tel:988'},
-                        {'text': 'Crisis Text Line', 'url': 'sms:741741'},
-                        {'text': 'SAMHSA National Helpline', 'url': 'tel:1-800-662-4357'}
-                    ]
-                },
-                {
-                    'title': 'Professional Help',
-                    'description': 'Find qualified mental health professionals',
-                    'links': [
-                        {'text': 'Psychology Today Therapist Finder', 'url': 'https://www.psychologytoday.com/us/therapists'},
-                        {'text': 'BetterHelp Online Therapy', 'url': 'https://www.betterhelp.com'},
-                        {'text': 'National Alliance on Mental Illness', 'url': 'https://www.nami.org'}
-                    ]
-                }
-            ]
-        },
-        {
-            'title': 'Mindfulness & Meditation',
-            'icon': 'fas fa-leaf',
-            'color': 'success',
-            'resources': [
-                {
-                    'title': 'Guided Meditation Apps',
-                    'description': 'Apps to help you build a meditation practice',
-                    'links': [
-                        {'text': 'Headspace', 'url': 'https://www.headspace.com'},
-                        {'text': 'Calm', 'url': 'https://www.calm.com'},
-                        {'text': 'Insight Timer', 'url': 'https://insighttimer.com'}
-                    ]
-                },
-                {
-                    'title': 'Breathing Exercises',
-                    'description': 'Simple techniques for immediate calm',
-                    'links': [
-                        {'text': '4-7-8 Breathing Technique', 'url': '#breathing-478'},
-                        {'text': 'Box Breathing Method', 'url': '#breathing-box'},
-                        {'text': 'Progressive Muscle Relaxation', 'url': '#pmr'}
-                    ]
-                }
-            ]
-        },
-        {
-            'title': 'Physical Wellness',
-            'icon': 'fas fa-heartbeat',
-            'color': 'danger',
-            'resources': [
-                {
-                    'title': 'Exercise & Movement',
-                    'description': 'Physical activity for mental health',
-                    'links': [
-                        {'text': 'Yoga for Beginners', 'url': 'https://www.yoga.com/beginners'},
-                        {'text': 'Free Workout Videos', 'url': 'https://www.fitnessblender.com'},
-                        {'text': 'Walking for Mental Health', 'url': '#walking-tips'}
-                    ]
-                },
-                {
-                    'title': 'Sleep Hygiene',
-                    'description': 'Improve your sleep quality',
-                    'links': [
-                        {'text': 'Sleep Foundation Tips', 'url': 'https://www.sleepfoundation.org'},
-                        {'text': 'Sleep Tracking Apps', 'url': '#sleep-apps'},
-                        {'text': 'Bedtime Routine Guide', 'url': '#bedtime-routine'}
-                    ]
-                }
-            ]
-        },
-        {
-            'title': 'Social Support',
-            'icon': 'fas fa-users',
-            'color': 'info',
-            'resources': [
-                {
-                    'title': 'Support Groups',
-                    'description': 'Connect with others who understand',
-                    'links': [
-                        {'text': 'Mental Health America Groups', 'url': 'https://www.mhanational.org'},
-                        {'text': 'NAMI Support Groups', 'url': 'https://www.nami.org/Support-Education'},
-                        {'text': 'Online Communities', 'url': '#online-support'}
-                    ]
-                },
-                {
-                    'title': 'Building Connections',
-                    'description': 'Tips for strengthening relationships',
-                    'links': [
-                        {'text': 'Communication Skills', 'url': '#communication'},
-                        {'text': 'Setting Boundaries', 'url': '#boundaries'},
-                        {'text': 'Social Anxiety Help', 'url': '#social-anxiety'}
-                    ]
-                }
-            ]
-        }
-    ]
+    wellness_categories = catalog.get('wellness_categories')
     
     # Quick wellness tools
-    wellness_tools = [
-        {
-            'title': 'Mood Check-In',
-            'description': 'Quick assessment of your current state',
-            'icon': 'fas fa-clipboard-check',
-            'action': url_for('mood_entry'),
-            'color': 'primary'
-        },
-        {
-            'title': 'Journal Templates',
-            'description': 'Guided prompts for reflection',
-            'icon': 'fas fa-journal-whills',
-            'action': url_for('journal_templates'),
-            'color': 'success'
-        },
-        {
-            'title': 'Goal Setting',
-            'description': 'Set and track wellness goals',
-            'icon': 'fas fa-target',
-            'action': url_for('goals'),
-            'color': 'warning'
-        },
-        {
-            'title': 'Progress Analytics',
-            'description': 'View your wellness journey',
-            'icon': 'fas fa-chart-line',
-            'action': url_for('analytics'),
-            'color': 'info'
-        }
-    ]
+    wellness_tools = catalog.linked('wellness_tools', url_for, request.script_root)
     
     return render_template('wellness_hub.html', 
                          user=user, 
@@ -1598,7 +1226,7 @@ def wellness_hub():
 
 # Add these routes before "if __name__ == '__main__':"
 
-@app.route('/grounding_exercise')
+@route('/grounding_exercise')
 def grounding_exercise():
     """Grounding exercise for anxiety relief"""
     user = get_current_user()
@@ -1607,29 +1235,96 @@ def grounding_exercise():
     
     return render_template('grounding_exercise.html', user=user)
 
-@app.route('/api/mood_data')
+@route('/api/mood_data')
 def api_mood_data():
     """API endpoint for mood data (for charts)"""
     user = get_current_user()
     if not user:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    conn = sqlite3.connect('moodly.db')
+    conn = get_db_connection(read_only=True)
+    if moodly_series.enabled():
+        data = moodly_series.daily_averages(conn, user['id'], 30, user['timezone'])
+        conn.close()
+        return jsonify([{'date': day, 'score': round(score, 1)} for day, score in data])
+    
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT DATE(created_at) as date, AVG(CAST(mood_score AS FLOAT)) as avg_score
+        SELECT local_date as date, AVG(CAST(mood_score AS FLOAT)) as avg_score
         FROM mood_entries 
         WHERE user_id = ? 
-        AND created_at >= date('now', '-30 days')
-        GROUP BY DATE(created_at)
-        ORDER BY date
-    ''', (user['id'],))
+        AND local_date >= ?
+        GROUP BY local_date
+        ORDER BY local_date
+    ''', (user['id'], moodly_timezones.local_today(user['timezone'], 30)))
     data = cursor.fetchall()
     conn.close()
     
     return jsonify([{'date': row[0], 'score': round(row[1], 1)} for row in data])
 
-@app.route('/health')
+DASHBOARD_SQL = '''
+    SELECT
+        u.mood_streak,
+        u.last_mood_date,
+        (SELECT AVG(CAST(mood_score AS FLOAT)) FROM mood_entries
+         WHERE user_id = u.id AND local_date >= :week_start) AS avg_7_days,
+        (SELECT AVG(CAST(mood_score AS FLOAT)) FROM mood_entries
+         WHERE user_id = u.id AND local_date >= :month_start) AS avg_30_days,
+        (SELECT json_group_array(json_object('score', mood_score, 'description', mood_description,
+                                             'text', entry_text, 'date', local_date, 'created_at', created_at))
+         FROM (SELECT * FROM mood_entries WHERE user_id = u.id ORDER BY created_at DESC LIMIT 5)) AS recent_moods,
+        (SELECT COUNT(*) FROM goals WHERE user_id = u.id AND NOT COALESCE(completed, 0)) AS open_goal_count,
+        (SELECT json_group_array(json_object('id', id, 'title', title, 'description', description,
+                                             'target_date', target_date))
+         FROM (SELECT * FROM goals WHERE user_id = u.id AND NOT COALESCE(completed, 0)
+               ORDER BY target_date IS NULL, target_date, created_at DESC LIMIT 5)) AS open_goals,
+        (SELECT ai_insights FROM mood_entries
+         WHERE user_id = u.id AND ai_insights IS NOT NULL AND ai_insights != ''
+         ORDER BY created_at DESC LIMIT 1) AS latest_insight
+    FROM users u
+    WHERE u.id = :user_id
+'''
+
+@route('/api/dashboard')
+def api_dashboard():
+    """Dashboard summary in one query; 304 while the user's data version and day are unchanged"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    today = moodly_timezones.local_today(user['timezone'])
+    # Averages and the streak depend on the date as well as on the user's writes
+    etag = hashlib.blake2b(repr(('dashboard', user['id'], user['data_version'], today)).encode(),
+                           digest_size=12).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        conn = get_db_connection(read_only=True)
+        row = conn.execute(DASHBOARD_SQL, {
+            'user_id': user['id'],
+            'week_start': moodly_timezones.local_today(user['timezone'], 7),
+            'month_start': moodly_timezones.local_today(user['timezone'], 30),
+        }).fetchone()
+        conn.close()
+        streak, last_mood_date, avg_7, avg_30, recent_moods, open_goal_count, open_goals, latest_insight = row
+        # A stored streak is only current if the last entry was today or yesterday
+        if str(last_mood_date) not in (today, moodly_timezones.local_today(user['timezone'], 1)):
+            streak = 0
+        response = jsonify({
+            'recent_moods': json.loads(recent_moods),
+            'streak': streak or 0,
+            'average_7_days': round(avg_7, 1) if avg_7 is not None else None,
+            'average_30_days': round(avg_30, 1) if avg_30 is not None else None,
+            'open_goal_count': open_goal_count,
+            'open_goals': json.loads(open_goals),
+            'latest_insight': latest_insight,
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+@route('/health')
 def health_check():
     """Health check endpoint for deployment"""
     return jsonify({
@@ -1639,18 +1334,23 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
-# Add missing import for send_from_directory if not already imported
-from flask import send_from_directory
-
-@app.route('/static/uploads/profiles/<filename>')
+@route('/static/uploads/profiles/<path:filename>')
 def uploaded_file(filename):
-    """Serve uploaded profile pictures"""
-    return send_from_directory(os.path.join(app.instance_path, 'uploads', 'profiles'), filename)
+    """Serve profile pictures from the local storage backend"""
+    storage = get_storage()
+    resolved = storage.resolve(filename) if getattr(storage, 'name', None) == 'local' else None
+    if not resolved:
+        return jsonify({'error': 'Not found'}), 404
+    
+    # Blob names are content hashes, so they never change and can be cached indefinitely
+    directory, path = resolved
+    return send_from_directory(directory, path, max_age=31536000, conditional=True)
 
 # Add this route before the "if __name__ == '__main__':" section
 
-@app.route('/breathing_exercise')
-@app.route('/breathing_exercise/<mood_key>')
+@route('/breathing_exercise')
+@route('/breathing_exercise/<mood_key>')
+@cached_page
 def breathing_exercise(mood_key=None):
     """Interactive breathing exercises based on mood"""
     user = get_current_user()
@@ -1658,63 +1358,30 @@ def breathing_exercise(mood_key=None):
         return redirect(url_for('login'))
     
     # Define breathing exercises based on mood
-    exercises = {
-        'stressed': {
-            'name': '4-7-8 Calming Breath',
-            'description': 'Perfect for reducing stress and anxiety',
-            'instructions': [
-                'Sit comfortably with your back straight',
-                'Place the tip of your tongue against your upper teeth',
-                'Exhale completely through your mouth',
-                'Close your mouth and inhale through your nose for 4 counts',
-                'Hold your breath for 7 counts',
-                'Exhale through your mouth for 8 counts',
-                'Repeat 3-4 times'
-            ],
-            'pattern': '4-7-8',
-            'duration': 4,
-            'color': 'danger',
-            'icon': 'fas fa-leaf'
-        },
-        'anxious': {
-            'name': 'Box Breathing',
-            'description': 'Helps calm anxiety and racing thoughts',
-            'instructions': [
-                'Sit or lie down comfortably',
-                'Breathe out slowly
-            'icon': 'fas fa-user',
-            'color': 'primary'
-        },
-        {
-            'title': 'Mindful Breathing',
-            'duration': '5 minutes',
-            'description': 'Focus on your breath to center yourself',
-            'difficulty': 'Beginner',
-            'icon': 'fas fa-lungs',
-            'color': 'success'
-        },
-        {
-            'title': 'Loving Kindness',
-            'duration': '15 minutes',
-            'description': 'Send love and compassion to yourself and others',
-            'difficulty': 'Intermediate',
-            'icon': 'fas fa-heart',
-            'color': 'danger'
-        },
-        {
-            'title': 'Anxiety Relief',
-            'duration': '8 minutes',
-            'description': 'Calm your mind and ease worry',
-            'difficulty': 'Beginner',
-            'icon': 'fas fa-leaf',
-            'color': 'info'
-        }
-    ]
+    exercises = catalog.get('breathing_exercises')
+    
+    exercise = exercises.get(mood_key, exercises['default'])
+    
+    return render_template('breathing_exercise.html',
+                         user=user,
+                         exercise=exercise,
+                         mood_key=mood_key,
+                         all_exercises=exercises)
+
+@route('/meditation')
+def meditation():
+    """Guided meditation sessions"""
+    user = get_current_user()
+    if not user:
+        return redirect(url_for('login'))
+    
+    meditations = catalog.get('meditations')
     
     return render_template('meditation.html', user=user, meditations=meditations)
 
-@app.route('/coping_strategies')
-@app.route('/coping_strategies/<mood_key>')
+@route('/coping_strategies')
+@route('/coping_strategies/<mood_key>')
+@cached_page
 def coping_strategies_page(mood_key=None):
     """Coping strategies based on mood"""
     user = get_current_user()
@@ -1722,232 +1389,7 @@ def coping_strategies_page(mood_key=None):
         return redirect(url_for('login'))
     
     # Define coping strategies for different moods
-    coping_strategies = {
-        'anxious': {
-            'mood_title': 'Anxiety Relief',
-            'color': 'warning',
-            'icon': 'fas fa-brain',
-            'description': 'Strategies to help calm anxiety and worry',
-            'strategies': [
-                {
-                    'title': '5-4-3-2-1 Grounding',
-                    'description': 'Name 5 things you see, 4 you can touch, 3 you hear, 2 you smell, 1 you taste',
-                    'icon': 'fas fa-eye',
-                    'steps': [
-                        'Look around and name 5 things you can see',
-                        'Notice 4 things you can touch',
-                        'Listen for 3 things you can hear',
-                        'Identify 2 things you can smell',
-                        'Think of 1 thing you can taste'
-                    ]
-                },
-                {
-                    'title': 'Progressive Muscle Relaxation',
-                    'description': 'Tense and release muscle groups to reduce physical anxiety',
-                    'icon': 'fas fa-user',
-                    'steps': [
-                        'Start with your toes - tense for 5 seconds, then relax',
-                        'Move up to your calves, thighs, abdomen',
-                        'Continue with hands, arms, shoulders',
-                        'Finish with face and scalp muscles',
-                        'Feel the contrast between tension and relaxation'
-                    ]
-                },
-                {
-                    'title': 'Anxiety Breathing',
-                    'description': 'Slow, controlled breathing to calm the nervous system',
-                    'icon': 'fas fa-lungs',
-                    'action': url_for('breathing_exercise', mood_key='anxious'),
-                    'steps': [
-                        'Breathe in for 4 counts',
-                        'Hold for 4 counts',
-                        'Breathe out for 4 counts',
-                        'Hold empty for 4 counts',
-                        'Repeat 5-10 times'
-                    ]
-                }
-            ]
-        },
-        'stressed': {
-            'mood_title': 'Stress Management',
-            'color': 'danger',
-            'icon': 'fas fa-exclamation-triangle',
-            'description': 'Techniques to reduce and manage stress',
-            'strategies': [
-                {
-                    'title': 'Quick Stress Relief',
-                    'description': 'Immediate techniques for stress reduction',
-                    'icon': 'fas fa-clock',
-                    'steps': [
-                        'Take 5 deep breaths',
-                        'Drop your shoulders and relax your jaw',
-                        'Step outside or look out a window',
-                        'Do 10 jumping jacks or stretch',
-                        'Drink a glass of water slowly'
-                    ]
-                },
-                {
-                    'title': 'Time Management',
-                    'description': 'Organize your tasks to reduce overwhelm',
-                    'icon': 'fas fa-calendar',
-                    'steps': [
-                        'Write down all your tasks',
-                        'Prioritize: urgent vs. important',
-                        'Break large tasks into smaller steps',
-                        'Set realistic deadlines',
-                        'Take breaks between tasks'
-                    ]
-                },
-                {
-                    'title': 'Stress-Relief Breathing',
-                    'description': '4-7-8 breathing for immediate calm',
-                    'icon': 'fas fa-leaf',
-                    'action': url_for('breathing_exercise', mood_key='stressed'),
-                    'steps': [
-                        'Exhale completely',
-                        'Inhale through nose for 4 counts',
-                        'Hold breath for 7 counts',
-                        'Exhale through mouth for 8 counts'
-                    ]
-                }
-            ]
-        },
-        'sad': {
-            'mood_title': 'Mood Lifting',
-            'color': 'info',
-            'icon': 'fas fa-smile',
-            'description': 'Techniques to lift your mood',
-            'strategies': [
-                {
-                    'title': 'Grounding Exercise',
-                    'description': 'Reconnect with the present moment',
-                    'icon': 'fas fa-tree',
-                    'action': url_for('grounding_exercise'),
-                    'steps': [
-                        'Count to 10 slowly',
-                        'Take a step back from the situation',
-                        'Splash cold water on your face',
-                        'Go to a quiet space',
-                        'Do some physical exercise'
-                    ]
-                },
-                {
-                    'title': 'Express Safely',
-                    'description': 'Healthy ways to release anger',
-                    'icon': 'fas fa-fist-raised',
-                    'steps': [
-                        'Write in a journal about your feelings',
-                        'Talk to someone you trust',
-                        'Do vigorous exercise (run, punch a pillow)',
-                        'Scream in a private space or car',
-                        'Practice assertive communication'
-                    ]
-                },
-                {
-                    'title': 'Cooling Breath',
-                    'description': 'Breathing technique to cool anger',
-                    'icon': 'fas fa-wind',
-                    'action': url_for('breathing_exercise', mood_key='angry'),
-                    'steps': [
-                        'Curl your tongue or purse lips',
-                        'Inhale slowly for 6 counts',
-                        'Hold for 2 counts',
-                        'Exhale through nose for 8 counts'
-                    ]
-                }
-            ]
-        },
-        'overwhelmed': {
-            'mood_title': 'Overwhelm Relief',
-            'color': 'warning',
-            'icon': 'fas fa-dizzy',
-            'description': 'Strategies to manage feeling overwhelmed',
-            'strategies': [
-                {
-                    'title': 'Brain Dump',
-                    'description': 'Get everything out of your head',
-                    'icon': 'fas fa-brain',
-                    'steps': [
-                        'Write down everything on your mind',
-                        'Don\'t worry about organization',
-                        'Include tasks, worries, thoughts',
-                        'Look at the list objectively',
-                        'Circle the most important items'
-                    ]
-                },
-                {
-                    'title': 'One Thing at a Time',
-                    'description': 'Focus on single tasks',
-                    'icon': 'fas fa-target',
-                    'steps': [
-                        'Choose one small task',
-                        'Set a timer for 15 minutes',
-                        'Focus only on that task',
-                        'Take a 5-minute break',
-                        'Celebrate completing it'
-                    ]
-                },
-                {
-                    'title': 'Calming Breath',
-                    'description': 'Reset your nervous system',
-                    'icon': 'fas fa-lungs',
-                    'action': url_for('breathing_exercise', mood_key='default'),
-                    'steps': [
-                        'Find comfortable position',
-                        'Close eyes or soften gaze',
-                        'Breathe naturally',
-                        'Count breaths 1 to 10',
-                        'Start over when you reach 10'
-                    ]
-                }
-            ]
-        },
-        'calm': {
-            'mood_title': 'Maintaining Calm',
-            'color': 'success',
-            'icon': 'fas fa-leaf',
-            'description': 'Strategies to maintain and deepen your calm state',
-            'strategies': [
-                {
-                    'title': 'Mindful Awareness',
-                    'description': 'Stay present and aware',
-                    'icon': 'fas fa-eye',
-                    'steps': [
-                        'Notice your surroundings without judgment',
-                        'Feel your feet on the ground',
-                        'Observe your breath naturally',
-                        'Appreciate this moment of calm',
-                        'Set intention to carry this peace forward'
-                    ]
-                },
-                {
-                    'title': 'Gentle Movement',
-                    'description': 'Maintain calm through movement',
-                    'icon': 'fas fa-walking',
-                    'steps': [
-                        'Take a slow, mindful walk',
-                        'Try gentle stretching',
-                        'Practice yoga poses',
-                        'Do tai chi movements',
-                        'Move with intention and awareness'
-                    ]
-                },
-                {
-                    'title': 'Peaceful Breathing',
-                    'description': 'Deepen your sense of calm',
-                    'icon': 'fas fa-feather',
-                    'action': url_for('breathing_exercise', mood_key='default'),
-                    'steps': [
-                        'Breathe naturally and slowly',
-                        'Focus on the sensation of breathing',
-                        'Let each exhale release tension',
-                        'Allow calm to spread through your body',
-                        'Rest in this peaceful state'
-                    ]
-                }
-            ]
-        }
-    }
+    coping_strategies = catalog.linked('coping_strategies', url_for, request.script_root)
     
     # Get the selected strategies or default to calm
     selected_strategies = coping_strategies.get(mood_key, coping_strategies['calm'])
@@ -1958,7 +1400,7 @@ def coping_strategies_page(mood_key=None):
                          mood_key=mood_key,
                          all_moods=list(coping_strategies.keys()))
 
-@app.route('/mood_analysis')
+@route('/mood_analysis')
 def mood_analysis():
     """Detailed mood analysis page"""
     user = get_current_user()
@@ -1968,7 +1410,7 @@ def mood_analysis():
     # Redirect to analytics for now
     return redirect(url_for('analytics'))
 
-@app.route('/journal')
+@route('/journal')
 def journal():
     """Journal entries page"""
     user = get_current_user()
@@ -1978,7 +1420,7 @@ def journal():
     # Redirect to mood entry for now
     return redirect(url_for('mood_entry'))
 
-@app.route('/support')
+@route('/support')
 def support():
     """Support and help page"""
     user = get_current_user()
@@ -1988,16 +1430,68 @@ def support():
     # Redirect to wellness hub for now
     return redirect(url_for('wellness_hub'))
 
-@app.route('/privacy')
+@route('/privacy')
 def privacy():
     """Privacy policy page"""
     return render_template('privacy.html')
 
-@app.route('/terms')
+@route('/terms')
 def terms():
     """Terms of service page"""
     return render_template('terms.html')
 
+# Routes that are not server-rendered pages: kept when the React app is the frontend
+NON_PAGE_PREFIXES = ('/api/', '/health', '/static/uploads/')
+
+def create_app(config=None, pages=True):
+    """Application factory: build a Flask app with all Moodly routes registered.
+    
+    No database, storage or AI work happens here; the schema check runs on the
+    first request and clients are created the first time a view needs them.
+    With pages=False only the JSON, health and upload routes are registered, for
+    moodly_app serving the React build in their place.
+    """
+    flask_app = Flask(__name__)
+    flask_app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    # Serve local uploads with X-Sendfile when a front proxy supports it
+    flask_app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() == 'true'
+    if config:
+        flask_app.config.update(config)
+    
+    flask_app.secret_key = os.environ.get('FLASK_SECRET_KEY')
+    if not flask_app.secret_key:
+        # A key made up per process would differ between gunicorn workers and across
+        # restarts, so sessions would only work on the worker that signed them
+        if not (flask_app.testing or flask_app.debug):
+            raise RuntimeError('FLASK_SECRET_KEY is not set; every worker must sign sessions with the same key')
+        flask_app.secret_key = secrets.token_hex(16)
+    
+    configure_logging()
+    init_request_ids(flask_app)
+    init_metrics(flask_app)
+    init_query_log(flask_app)
+    moodly_db.init_replicas(flask_app)
+    init_maintenance(flask_app)
+    moodly_db.init_snapshots(flask_app)
+    init_response_cache(flask_app, page_cache_version, page_cache_today)
+    init_content(flask_app)
+    init_templates(flask_app)
+    
+    for rule, options, view in ROUTES:
+        if not pages and not rule.startswith(NON_PAGE_PREFIXES):
+            continue
+        options = dict(options)
+        flask_app.add_url_rule(rule, options.pop('endpoint', view.__name__), view, **options)
+    if pages:
+        # These flash and redirect to pages
+        for code, handler in ERROR_HANDLERS:
+            flask_app.register_error_handler(code, handler)
+    
+    flask_app.before_request(ensure_database_schema)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
     # Initialize database
     init_db()
@@ -2010,16 +1504,13 @@ if __name__ == '__main__':
     print("\n" + "="*60)
     print("🎭 MOODLY APP - STARTUP COMPLETE")
     print("="*60)
-    print(f"☁️ Storage: {STORAGE_TYPE}")
-    print(f"📤 Uploads: {'Enabled (Cloudinary)' if USE_CLOUD_STORAGE else 'Disabled'}")
+    print(f"☁️ Storage: {storage_type()}")
+    print(f"📤 Uploads: {f'Enabled ({storage_type()})' if uploads_enabled() else 'Disabled'}")
     print(f"🤖 AI Insights: {'Enabled' if openai_api_key else 'Disabled'}")
     print(f"🌍 Environment: {'Production' if is_production() else 'Development'}")
     print(f"🚀 Port: {port}")
     print("="*60)
     
-    # Run the app
-    app.run(
-        debug=debug_mode,
-        host='0.0.0.0',
-        port=port
-    )
\ No newline at end of file
+    # Run the app: gunicorn (gunicorn.conf.py) in production, the reloading dev server otherwise
+    from moodly_server import serve
+    serve('moodly:app', app, port, debug=debug_mode)
\ No newline at end of file
@@ -5,134 +5,76 @@ A clean Flask API backend for the React frontend
 """
 
 import os
-import sqlite3
-import hashlib
-import secrets
-from datetime import datetime, timedelta
-from flask import Flask, request, session, jsonify
+import time
+import logging
+from flask import Blueprint, Flask, current_app, request, session, jsonify, g, has_app_context, has_request_context
 from flask_cors import CORS
-from openai import OpenAI
+from werkzeug.exceptions import HTTPException
+from moodly_auth import hash_password, verify_password
+from moodly_clients import get_openai_client, openai_api_key
+from moodly_logging import configure_logging, init_request_ids
+from moodly_metrics import init_metrics, record_ai_call
+from moodly_querylog import init_query_log
+from moodly_maintenance import init_maintenance
+import moodly_db
+import moodly_insights
+import moodly_prompts
+import moodly_sentiment
+import moodly_series
+import moodly_timezones
 
-# Initialize OpenAI
-openai_api_key = os.environ.get('OPENAI_API_KEY')
-openai_client = None
-if openai_api_key:
-    try:
-        openai_client = OpenAI(api_key=openai_api_key)
-        print("✅ OpenAI client initialized successfully!")
-    except Exception as e:
-        print(f"⚠️ OpenAI initialization failed: {e}")
-        openai_client = None
-else:
-    print("⚠️ OpenAI API key not found - AI features will be disabled")
-
-# Create Flask application instance
-app = Flask(__name__)
-app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'moodly-secret-key-change-in-production')
-
-# Configure CORS to allow requests from React dev server
-CORS(app, resources={
-    r"/api/*": {
-        "origins": ["http://localhost:3001", "http://localhost:8084", "http://localhost:3000", "http://localhost:5173"],
-        "supports_credentials": True
-    }
-})
-
-# Database configuration
-DATABASE = 'moodly.db'
-
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+logger = logging.getLogger('moodly')
+
+# One blueprint per area; moodly_app mounts them next to the web pages, create_app() on their own
+auth = Blueprint('auth', __name__)
+moods = Blueprint('moods', __name__)
+journal = Blueprint('journal', __name__)
+goals = Blueprint('goals', __name__)
+analytics = Blueprint('analytics', __name__)
+system = Blueprint('system', __name__)
+BLUEPRINTS = (auth, moods, journal, goals, analytics, system)
+
+# Origins of the React dev servers allowed to call the API with cookies
+CORS_ORIGINS = ["http://localhost:3001", "http://localhost:8084", "http://localhost:3000", "http://localhost:5173"]
+
+# Database configuration: the same database and schema as the web pages (see moodly_db)
+DATABASE = moodly_db.DATABASE_PATH
+
+def get_db_connection(read_only=None):
+    """Get database connection (inside /api/batch, the batch's shared one).
+    
+    GET requests only read, so by default theirs may go to a read replica.
+    """
+    if has_app_context() and g.get('batch_connection') is not None:
+        return g.batch_connection
+    if read_only is None:
+        read_only = has_request_context() and request.method in ('GET', 'HEAD')
+    return moodly_db.connect(DATABASE, rows=True, read_only=read_only)
 
 def init_database():
     """Initialize the database with required tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Mood entries table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS mood_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            mood_score INTEGER NOT NULL,
-            energy_level INTEGER,
-            anxiety_level INTEGER,
-            sleep_quality INTEGER,
-            notes TEXT,
-            ai_insights TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Journal entries table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS journal_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            tags TEXT,
-            is_favorite BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Goals table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS goals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT,
-            category TEXT,
-            priority TEXT DEFAULT 'medium',
-            target_date DATE,
-            is_completed BOOLEAN DEFAULT FALSE,
-            progress INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    print("✅ Database initialized successfully")
+    moodly_db.init_schema()
+    logger.info("Database initialized")
 
-def hash_password(password):
-    """Hash a password using SHA-256"""
-    salt = secrets.token_hex(16)
-    password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-    return f"{salt}:{password_hash}"
+_schema_checked = False
 
-def verify_password(password, password_hash):
-    """Verify a password against its hash"""
-    try:
-        salt, hash_value = password_hash.split(':')
-        return hashlib.sha256((password + salt).encode()).hexdigest() == hash_value
-    except ValueError:
-        return False
+def ensure_database_schema():
+    """Create or upgrade the schema once per process, on the first request"""
+    global _schema_checked
+    if not _schema_checked:
+        _schema_checked = True
+        init_database()
 
 def get_current_user():
-    """Get the current logged-in user"""
+    """Get the current logged-in user, looked up at most once per request (or batch)"""
+    cached = g.get('current_user')
+    if cached is not None and cached[0] == session.get('user_id'):
+        return cached[1]
+    user = load_current_user()
+    g.current_user = (session.get('user_id'), user)
+    return user
+
+def load_current_user():
     if 'user_id' not in session:
         return None
     
@@ -147,93 +89,22 @@ def get_current_user():
     return None
 
 def get_fallback_insight(mood_data):
-    """Generate intelligent fallback insights based on mood data patterns"""
-    mood_score = mood_data.get('mood_score', 5)
-    energy_level = mood_data.get('energy_level', 5)
-    anxiety_level = mood_data.get('anxiety_level', 5)
-    sleep_quality = mood_data.get('sleep_quality', 5)
-    notes = mood_data.get('notes', '')
-    
-    # Analyze patterns and provide appropriate insights
-    insights = []
-    suggestions = []
-    encouragement = []
-    
-    # Mood analysis
-    if mood_score >= 8:
-        insights.append("You're experiencing a positive mood today")
-        encouragement.append("Keep nurturing this positive energy!")
-    elif mood_score >= 6:
-        insights.append("Your mood is in a stable, balanced range")
-        suggestions.append("Consider what's working well for you and try to maintain these positive habits")
-    elif mood_score >= 4:
-        insights.append("Your mood seems a bit low today")
-        suggestions.append("Try gentle activities like a short walk, listening to music, or connecting with a friend")
-    else:
-        insights.append("You're going through a challenging time")
-        suggestions.append("Be gentle with yourself and consider reaching out for support if needed")
-    
-    # Energy analysis
-    if energy_level <= 3:
-        suggestions.append("Low energy detected - prioritize rest and gentle self-care activities")
-    elif energy_level >= 8:
-        insights.append("Your energy levels are high")
-        
-    # Anxiety analysis
-    if anxiety_level >= 7:
-        suggestions.append("High anxiety noted - try deep breathing exercises or mindfulness techniques")
-    elif anxiety_level <= 3:
-        insights.append("Your anxiety levels appear manageable today")
-        
-    # Sleep analysis
-    if sleep_quality <= 3:
-        suggestions.append("Poor sleep quality can impact mood - consider establishing a calming bedtime routine")
-    elif sleep_quality >= 8:
-        insights.append("Good sleep quality is supporting your overall well-being")
-    
-    # Notes analysis
-    if notes and any(word in notes.lower() for word in ['stress', 'worried', 'anxious', 'overwhelmed']):
-        suggestions.append("Consider breaking down overwhelming tasks into smaller, manageable steps")
-    elif notes and any(word in notes.lower() for word in ['happy', 'good', 'great', 'excited', 'grateful']):
-        encouragement.append("It's wonderful to see positive moments in your day!")
-    
-    # Default encouragement
-    if not encouragement:
-        encouragement = [
-            "Remember that tracking your mood is a valuable step in understanding yourself better",
-            "Every day is a new opportunity for growth and self-compassion",
-            "You're taking positive steps by monitoring your mental health"
-        ]
-    
-    # Combine insights
-    result = ". ".join(insights[:2])
-    if suggestions:
-        result += ". " + suggestions[0]
-    result += ". " + encouragement[0] + "."
-    
-    return result
-
-def analyze_mood_with_ai(mood_data):
-    """Analyze mood data using OpenAI GPT with intelligent fallbacks"""
-    # Extract mood data for fallback use
-    mood_score = mood_data.get('mood_score', 0)
-    energy_level = mood_data.get('energy_level', 0)
-    anxiety_level = mood_data.get('anxiety_level', 0)
-    sleep_quality = mood_data.get('sleep_quality', 0)
-    notes = mood_data.get('notes', '')
-    
-    # If OpenAI is not available, use fallback immediately
-    if not openai_client:
-        return get_fallback_insight(mood_data)
-    
-    try:
-        prompt = f"""
+    """Generate intelligent fallback insights based on mood data patterns (see moodly_insights)"""
+    return moodly_insights.insight_text(mood_data)
+
+# Chat completion settings shared by the sync API and the async one (moodly_asgi)
+AI_COMPLETION_OPTIONS = {'model': 'gpt-3.5-turbo', 'max_tokens': 200, 'temperature': 0.7}
+
+def mood_insight_messages(mood_data, history=None):
+    """Chat messages asking for a supportive insight on one mood entry, with a summary of `history` if it fits"""
+    notes = moodly_prompts.truncate(mood_data.get('notes', ''), moodly_prompts.ENTRY_NOTE_TOKENS)
+    prompt = f"""
         As a supportive mental health assistant, provide a brief, encouraging analysis of this mood data:
         
-        Mood Score: {mood_score}/10
-        Energy Level: {energy_level}/10
-        Anxiety Level: {anxiety_level}/10
-        Sleep Quality: {sleep_quality}/10
+        Mood Score: {mood_data.get('mood_score', 0)}/10
+        Energy Level: {mood_data.get('energy_level', 0)}/10
+        Anxiety Level: {mood_data.get('anxiety_level', 0)}/10
+        Sleep Quality: {mood_data.get('sleep_quality', 0)}/10
         Notes: {notes}
         
         Please provide:
@@ -243,43 +114,46 @@ def analyze_mood_with_ai(mood_data):
         
         Keep response under 150 words and maintain a warm, professional tone.
         """
-        
+    return moodly_prompts.build_messages(
+        "You are a compassionate mental health assistant providing supportive insights.", prompt, history)
+
+def analyze_mood_with_ai(mood_data, user_id=None):
+    """Analyze mood data using OpenAI GPT with intelligent fallbacks; with `user_id`, in light of their recent entries"""
+    # If OpenAI is not available, use fallback immediately
+    openai_client = get_openai_client()
+    if not openai_client:
+        record_ai_call('fallback')
+        return get_fallback_insight(mood_data)
+    
+    start = time.perf_counter()
+    try:
+        history = moodly_prompts.recent_history(user_id) if user_id is not None else None
         response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a compassionate mental health assistant providing supportive insights."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.7
+            messages=mood_insight_messages(mood_data, history),
+            **AI_COMPLETION_OPTIONS
         )
         
+        record_ai_call('openai', time.perf_counter() - start)
+        moodly_prompts.record_usage(response)
         return response.choices[0].message.content.strip()
     except Exception as e:
-        print(f"OpenAI analysis error: {e}")
+        record_ai_call('fallback', time.perf_counter() - start)
+        logger.warning("OpenAI analysis error: %s", e)
         # Use intelligent fallback instead of generic message
         return get_fallback_insight(mood_data)
 
-# Initialize database
-print("============================================================")
-print(" MOODLY MENTAL HEALTH API")
-print("============================================================")
-print(" Initializing application...")
-init_database()
-print(" Database ready")
-
 # API Routes
-@app.route('/api/health')
+@system.route('/api/health')
 def health_check():
     """API health check"""
     return jsonify({
         'status': 'healthy',
         'message': 'Moodly API is running',
         'version': '1.0.0',
-        'ai_enabled': openai_client is not None
+        'ai_enabled': get_openai_client() is not None
     })
 
-@app.route('/api/auth/register', methods=['POST'])
+@auth.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new user"""
     data = request.get_json()
@@ -293,28 +167,13 @@ def register():
     if len(password) < 6:
         return jsonify({'error': 'Password must be at least 6 characters'}), 400
     
-    conn = get_db_connection()
-    
     # Check if user already exists
-    existing_user = conn.execute(
-        'SELECT id FROM users WHERE username = ? OR email = ?',
-        (username, email)
-    ).fetchone()
-    
-    if existing_user:
-        conn.close()
+    if moodly_db.user_exists(username, email):
         return jsonify({'error': 'Username or email already exists'}), 409
     
     # Create new user
     password_hash = hash_password(password)
-    cursor = conn.cursor()
-    cursor.execute(
-        'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
-        (username, email, password_hash)
-    )
-    user_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    user_id = moodly_db.create_user(username, email, password_hash)
     
     # Log in the user
     session['user_id'] = user_id
@@ -328,7 +187,7 @@ def register():
         }
     }), 201
 
-@app.route('/api/auth/login', methods=['POST'])
+@auth.route('/api/auth/login', methods=['POST'])
 def login():
     """Login user"""
     data = request.get_json()
@@ -338,12 +197,7 @@ def login():
     if not username or not password:
         return jsonify({'error': 'Username and password are required'}), 400
     
-    conn = get_db_connection()
-    user = conn.execute(
-        'SELECT * FROM users WHERE username = ? OR email = ?',
-        (username, username)
-    ).fetchone()
-    conn.close()
+    user = moodly_db.find_user(username)
     
     if not user or not verify_password(password, user['password_hash']):
         return jsonify({'error': 'Invalid credentials'}), 401
@@ -359,13 +213,13 @@ def login():
         }
     })
 
-@app.route('/api/auth/logout', methods=['POST'])
+@auth.route('/api/auth/logout', methods=['POST'])
 def logout():
     """Logout user"""
     session.pop('user_id', None)
     return jsonify({'message': 'Logout successful'})
 
-@app.route('/api/auth/me')
+@auth.route('/api/auth/me')
 def get_user_info():
     """Get current user info"""
     user = get_current_user()
@@ -380,7 +234,7 @@ def get_user_info():
         }
     })
 
-@app.route('/api/moods', methods=['GET', 'POST'])
+@moods.route('/api/moods', methods=['GET', 'POST'])
 def handle_moods():
     """Get or create mood entries"""
     user = get_current_user()
@@ -419,17 +273,26 @@ def handle_moods():
             'anxiety_level': anxiety_level,
             'sleep_quality': sleep_quality,
             'notes': notes
-        })
+        }, user['id'])
         
+        # Stored like the web app's entries, so its pages, charts and caches see them
+        created_at = moodly_timezones.utc_timestamp()
+        local_date = moodly_timezones.local_date(created_at, user.get('timezone'))
+        text_sentiment, text_emotion = moodly_sentiment.score_fields(notes)
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
             '''INSERT INTO mood_entries 
-               (user_id, mood_score, energy_level, anxiety_level, sleep_quality, notes, ai_insights)
-               VALUES (?, ?, ?, ?, ?, ?, ?)''',
-            (user['id'], mood_score, energy_level, anxiety_level, sleep_quality, notes, ai_insights)
+               (user_id, mood_score, energy_level, anxiety_level, sleep_quality, notes, ai_insights,
+                created_at, local_date, text_sentiment, text_emotion)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (user['id'], mood_score, energy_level, anxiety_level, sleep_quality, notes, ai_insights,
+             created_at, local_date, text_sentiment, text_emotion)
         )
         mood_id = cursor.lastrowid
+        moodly_db.bump_data_version(cursor, user['id'])
+        if moodly_series.enabled():
+            moodly_series.append(cursor, user['id'], created_at, mood_score)
         conn.commit()
         conn.close()
         
@@ -443,11 +306,11 @@ def handle_moods():
                 'sleep_quality': sleep_quality,
                 'notes': notes,
                 'ai_insights': ai_insights,
-                'created_at': datetime.now().isoformat()
+                'created_at': created_at
             }
         }), 201
 
-@app.route('/api/journal', methods=['GET', 'POST'])
+@journal.route('/api/journal', methods=['GET', 'POST'])
 def handle_journal():
     """Get or create journal entries"""
     user = get_current_user()
@@ -475,13 +338,17 @@ def handle_journal():
         if not title or not content:
             return jsonify({'error': 'Title and content are required'}), 400
         
+        text_sentiment, text_emotion = moodly_sentiment.score_fields(title, content)
+        created_at = moodly_timezones.utc_timestamp()
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            'INSERT INTO journal_entries (user_id, title, content, tags) VALUES (?, ?, ?, ?)',
-            (user['id'], title, content, tags)
+            'INSERT INTO journal_entries (user_id, title, content, tags, text_sentiment, text_emotion, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (user['id'], title, content, tags, text_sentiment, text_emotion, created_at)
         )
         entry_id = cursor.lastrowid
+        moodly_db.bump_data_version(cursor, user['id'])
         conn.commit()
         conn.close()
         
@@ -492,11 +359,11 @@ def handle_journal():
                 'title': title,
                 'content': content,
                 'tags': tags,
-                'created_at': datetime.now().isoformat()
+                'created_at': created_at
             }
         }), 201
 
-@app.route('/api/goals', methods=['GET', 'POST'])
+@goals.route('/api/goals', methods=['GET', 'POST'])
 def handle_goals():
     """Get or create goals"""
     user = get_current_user()
@@ -526,14 +393,16 @@ def handle_goals():
         if not title:
             return jsonify({'error': 'Title is required'}), 400
         
+        created_at = moodly_timezones.utc_timestamp()
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            '''INSERT INTO goals (user_id, title, description, category, priority, target_date)
-               VALUES (?, ?, ?, ?, ?, ?)''',
-            (user['id'], title, description, category, priority, target_date)
+            '''INSERT INTO goals (user_id, title, description, category, priority, target_date, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (user['id'], title, description, category, priority, target_date, created_at)
         )
         goal_id = cursor.lastrowid
+        moodly_db.bump_data_version(cursor, user['id'])
         conn.commit()
         conn.close()
         
@@ -548,11 +417,11 @@ def handle_goals():
                 'target_date': target_date,
                 'progress': 0,
                 'is_completed': False,
-                'created_at': datetime.now().isoformat()
+                'created_at': created_at
             }
         }), 201
 
-@app.route('/api/analytics')
+@analytics.route('/api/analytics')
 def get_analytics():
     """Get user analytics"""
     user = get_current_user()
@@ -573,26 +442,134 @@ def get_analytics():
         (user['id'],)
     ).fetchone()
     
-    # Get recent mood trends (last 30 days)
-    thirty_days_ago = (datetime.now() - timedelta(days=30)).isoformat()
+    # Get recent mood trends (last 30 days; created_at is stored in UTC)
+    thirty_days_ago = moodly_timezones.utc_timestamp(days_ago=30)
     recent_moods = conn.execute(
         'SELECT * FROM mood_entries WHERE user_id = ? AND created_at >= ? ORDER BY created_at',
         (user['id'], thirty_days_ago)
     ).fetchall()
     
+    # What the notes say next to the scores, from the sentiment stored with each entry
+    text_sentiment = moodly_sentiment.mood_summary(conn, user['id'])
+    
     conn.close()
     
     return jsonify({
         'mood_stats': dict(mood_stats) if mood_stats else {},
+        'text_sentiment': text_sentiment,
         'recent_moods': [dict(mood) for mood in recent_moods],
         'total_journal_entries': len([]),  # Can be expanded
         'total_goals': len([])  # Can be expanded
     })
 
+# Sub-requests must not touch the session (the batch's cookie is not re-issued) or recurse
+BATCH_EXCLUDED_PATHS = {'/api/batch', '/api/auth/login', '/api/auth/register', '/api/auth/logout'}
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+
+class BatchConnection:
+    """The batch's single connection, handed to every sub-request; closing is left to the batch"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        pass
+
+def run_batch_item(item):
+    """Dispatch one sub-request in a nested request context; returns (status, body)"""
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if not isinstance(path, str) or not path.startswith('/api/') or path.split('?')[0] in BATCH_EXCLUDED_PATHS:
+        return 400, {'error': 'Unsupported batch path'}
+    
+    headers = {'Cookie': request.headers.get('Cookie', '')}
+    flask_app = current_app._get_current_object()
+    with flask_app.test_request_context(path, method=method, json=item.get('body'), headers=headers):
+        try:
+            response = flask_app.make_response(flask_app.dispatch_request())
+        except HTTPException as e:
+            return e.code, {'error': e.description}
+        except Exception:
+            flask_app.logger.exception("Batch sub-request %s %s failed", method, path)
+            return 500, {'error': 'Internal server error'}
+        return response.status_code, response.get_json(silent=True)
+
+@system.route('/api/batch', methods=['POST'])
+def handle_batch():
+    """Run several API calls in one round trip.
+    
+    Body: {"requests": [{"id": "moods", "method": "GET", "path": "/api/moods"}, ...]}
+    Sub-requests run in order under one auth check and one DB connection. Consecutive
+    reads share a snapshot transaction, so e.g. /api/moods and /api/analytics agree;
+    a write commits on its own and later reads see it.
+    """
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({'error': 'requests must be a list of objects'}), 400
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({'error': f'At most {BATCH_MAX_REQUESTS} requests per batch'}), 400
+    
+    conn = get_db_connection()
+    g.batch_connection = BatchConnection(conn)
+    results = []
+    try:
+        for index, item in enumerate(items):
+            read_only = str(item.get('method', 'GET')).upper() in ('GET', 'HEAD')
+            if read_only and not conn.in_transaction:
+                conn.execute('BEGIN')
+            elif not read_only and conn.in_transaction:
+                # End the read snapshot so the write starts from (and commits to) the latest state
+                conn.commit()
+            status, body = run_batch_item(item)
+            if not read_only and conn.in_transaction:
+                conn.rollback()
+            results.append({'id': item.get('id', index), 'status': status, 'body': body})
+        if conn.in_transaction:
+            conn.commit()
+    finally:
+        g.batch_connection = None
+        conn.close()
+    
+    return jsonify({'responses': results})
+
+def create_app(config=None):
+    """The API on its own (the React app served elsewhere); moodly_app serves it with the pages"""
+    flask_app = Flask(__name__)
+    flask_app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'moodly-secret-key-change-in-production')
+    if config:
+        flask_app.config.update(config)
+    
+    # Configure CORS to allow requests from React dev server
+    CORS(flask_app, resources={r"/api/*": {"origins": CORS_ORIGINS, "supports_credentials": True}})
+    
+    configure_logging()
+    init_request_ids(flask_app)
+    # Request latency, SQL cost and AI stats at /metrics
+    init_metrics(flask_app)
+    init_query_log(flask_app)
+    moodly_db.init_replicas(flask_app)
+    init_maintenance(flask_app)
+    moodly_db.init_snapshots(flask_app)
+    
+    for blueprint in BLUEPRINTS:
+        flask_app.register_blueprint(blueprint)
+    flask_app.before_request(ensure_database_schema)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
+    logger.info("Moodly Mental Health API starting; AI insights %s", 'enabled' if openai_api_key else 'disabled')
+    init_database()
     port = int(os.environ.get('PORT', 3000))
-    print(" Starting Flask development server...")
-    print(f" Server will be available at: http://localhost:{port}")
-    print(" Alternative URL: http://127.0.0.1:3001")
-    print("============================================================")
-    app.run(debug=False, host='0.0.0.0', port=port)
+    logger.info("Serving on http://localhost:%d (gunicorn, or the Flask dev server with SERVER=dev)", port)
+    from moodly_server import serve
+    serve('moodly_api:app', app, port)
@@ -0,0 +1,116 @@
+"""
+Moodly App
+One process serving the frontend (server-rendered pages or the React build) and the JSON API
+
+The web pages (moodly.py), the API blueprints (moodly_api: auth, moods, journal, goals,
+analytics) and the content catalog share one Flask app, database layer (moodly_db),
+session secret and client pool (moodly_clients), so a deployment runs one set of workers.
+
+Run with: gunicorn moodly_app:app, or python moodly_app.py
+"""
+import os
+
+from flask import Blueprint, jsonify, render_template_string, send_from_directory
+from flask_cors import CORS
+
+import moodly
+import moodly_api
+from moodly_content import blueprint as content
+
+# 'templates': moodly.py's pages at /; 'spa': the React build (npm run build) at / instead
+FRONTEND = os.environ.get('MOODLY_FRONTEND', 'templates').lower()
+DIST_DIR = os.environ.get('MOODLY_DIST_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dist')
+
+# Vite content-hashes everything under assets/, so those files never change
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Shown until the React app has been built
+TEMP_INDEX = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Moodly - Loading</title>
+    <style>
+        body { font-family: Arial, sans-serif; text-align: center; padding: 50px; background: #f0f8ff; }
+        .container { max-width: 600px; margin: 0 auto; }
+        .status { padding: 20px; background: white; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        .loading { color: #4a90e2; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🧠 Moodly</h1>
+        <div class="status">
+            <h2 class="loading">Application is Starting...</h2>
+            <p>The React frontend is being built. This may take a few minutes.</p>
+            <p><strong>Backend Status:</strong> ✅ Running</p>
+            <p><strong>API Health:</strong> <a href="/api/health">Check Here</a></p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+spa = Blueprint('spa', __name__)
+
+
+def dist_exists():
+    return os.path.isfile(os.path.join(DIST_DIR, 'index.html'))
+
+
+@spa.route('/')
+def serve_react_app():
+    if dist_exists():
+        return send_from_directory(DIST_DIR, 'index.html', max_age=0)
+    return render_template_string(TEMP_INDEX)
+
+
+@spa.route('/<path:path>')
+def serve_react_static(path):
+    if path.startswith('api/'):
+        return jsonify({'error': 'API endpoint not found'}), 404
+    if os.path.isfile(os.path.join(DIST_DIR, path)):
+        max_age = ASSET_MAX_AGE if path.startswith('assets/') else 0
+        return send_from_directory(DIST_DIR, path, max_age=max_age)
+    # Client-side routes (/dashboard, /journal, ...) all load the app shell
+    return serve_react_app()
+
+
+def create_app(config=None):
+    """Build the combined app; config may set MOODLY_FRONTEND ('templates' or 'spa')"""
+    frontend = (config or {}).get('MOODLY_FRONTEND', FRONTEND)
+    flask_app = moodly.create_app(config, pages=frontend != 'spa')
+    flask_app.config['MOODLY_FRONTEND'] = frontend
+
+    # The React dev server calls the API cross-origin with the session cookie
+    CORS(flask_app, resources={r"/api/*": {"origins": moodly_api.CORS_ORIGINS, "supports_credentials": True}})
+
+    for blueprint in moodly_api.BLUEPRINTS + (content,):
+        flask_app.register_blueprint(blueprint)
+    if frontend == 'spa':
+        flask_app.register_blueprint(spa)
+    if moodly.DATABASE_TYPE != 'sqlite':
+        # The pages use PostgreSQL there, but the API tables are still SQLite
+        flask_app.before_request(moodly_api.ensure_database_schema)
+    return flask_app
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    moodly.init_db()
+    port = int(os.environ.get('PORT', 3000))
+    print("\n" + "=" * 60)
+    print("🎭 MOODLY - PAGES AND API IN ONE PROCESS")
+    print("=" * 60)
+    print(f"🖥️ Frontend: {'React build' if FRONTEND == 'spa' else 'Server-rendered pages'}")
+    if FRONTEND == 'spa' and not dist_exists():
+        print("⚠️  React app not built yet - run 'npm run build'")
+    print(f"🤖 AI Insights: {'Enabled' if moodly.openai_api_key else 'Disabled'}")
+    print(f"🚀 Port: {port}")
+    print("=" * 60)
+
+    from moodly_server import serve
+    serve('moodly_app:app', app, port, debug=not moodly.is_production())
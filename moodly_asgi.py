@@ -0,0 +1,407 @@
+"""
+Async API for Moodly App
+ASGI app serving moodly_api's I/O-bound routes on an event loop, everything else through the Flask app
+
+Run with: uvicorn moodly_asgi:app --host 0.0.0.0 --port $PORT [--workers N]
+"""
+import os
+import io
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import unquote
+
+import aiosqlite
+
+import moodly_api
+import moodly_db
+import moodly_prompts
+import moodly_sentiment
+import moodly_series
+import moodly_timezones
+from moodly_clients import openai_api_key
+from moodly_metrics import LATENCY_BUCKETS, metrics, record_ai_call
+
+logger = logging.getLogger('moodly')
+
+DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', '4'))
+# Threads for requests handed to the Flask app (auth, writes other than moods, /metrics)
+WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', '8'))
+
+
+class ConnectionPool:
+    """A few aiosqlite connections (each runs on its own thread) shared by the event loop"""
+
+    def __init__(self, database, size):
+        self.database = database
+        self.size = size
+        self._idle = None
+
+    async def _open(self):
+        conn = await aiosqlite.connect(self.database)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait(None)
+        conn = await self._idle.get()
+        try:
+            if conn is None:
+                conn = await self._open()
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        while self._idle is not None and not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is not None:
+                await conn.close()
+        self._idle = None
+
+
+class JSONResponse:
+    def __init__(self, body, status=200, headers=()):
+        self.body = json.dumps(body).encode()
+        self.status = status
+        self.headers = [(b'content-type', b'application/json')] + list(headers)
+
+    async def send(self, send):
+        await send({'type': 'http.response.start', 'status': self.status,
+                    'headers': self.headers + [(b'content-length', str(len(self.body)).encode())]})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.body = body
+        self.headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+
+    def json(self):
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError:
+            return None
+
+    def session(self):
+        """The Flask session, read from the same signed cookie moodly_api sets"""
+        flask_app = moodly_api.app
+        cookie = SimpleCookie(self.headers.get('cookie', ''))
+        morsel = cookie.get(flask_app.config['SESSION_COOKIE_NAME'])
+        serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        if morsel is None or serializer is None:
+            return {}
+        try:
+            return serializer.loads(morsel.value, max_age=flask_app.permanent_session_lifetime.total_seconds())
+        except Exception:
+            return {}
+
+
+# Per-process state, created on first use inside the worker's event loop
+db = ConnectionPool(moodly_db.DATABASE_PATH, DB_POOL_SIZE)
+_ai_client = None
+_wsgi_executor = ThreadPoolExecutor(WSGI_THREADS, thread_name_prefix='moodly-wsgi')
+
+
+def get_ai_client():
+    """AsyncOpenAI with its own connection pool, so in-flight AI calls cost no threads"""
+    global _ai_client
+    if _ai_client is None and openai_api_key:
+        from openai import AsyncOpenAI
+        _ai_client = AsyncOpenAI(api_key=openai_api_key)
+    return _ai_client
+
+
+async def analyze_mood_with_ai(mood_data, user_id=None):
+    """Async moodly_api.analyze_mood_with_ai: same prompt, same history, same fallback"""
+    client = get_ai_client()
+    if client is None:
+        record_ai_call('fallback')
+        return moodly_api.get_fallback_insight(mood_data)
+
+    start = time.perf_counter()
+    try:
+        history = None
+        if user_id is not None:
+            history = moodly_prompts.history_for(user_id)
+            async with db.connection() as conn:
+                cursor = await conn.execute(moodly_prompts.HISTORY_QUERY, history.query_args(user_id))
+                moodly_prompts.update_history(history, await cursor.fetchall())
+        response = await client.chat.completions.create(
+            messages=moodly_api.mood_insight_messages(mood_data, history),
+            **moodly_api.AI_COMPLETION_OPTIONS
+        )
+        record_ai_call('openai', time.perf_counter() - start)
+        moodly_prompts.record_usage(response)
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        record_ai_call('fallback', time.perf_counter() - start)
+        logger.warning("OpenAI analysis error: %s", e)
+        return moodly_api.get_fallback_insight(mood_data)
+
+
+def cors_headers(request):
+    """The CORS headers flask_cors adds to moodly_api's responses, for the routes answered here
+
+    Preflight (OPTIONS) requests are not in ROUTES, so the Flask app answers them as before.
+    """
+    origin = request.headers.get('origin')
+    headers = [(b'vary', b'Origin')]
+    if origin in moodly_api.CORS_ORIGINS:
+        headers += [(b'access-control-allow-origin', origin.encode('latin-1')),
+                    (b'access-control-allow-credentials', b'true')]
+    return headers
+
+
+async def current_user(request):
+    user_id = request.session().get('user_id')
+    if user_id is None:
+        return None
+    async with db.connection() as conn:
+        async with conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)) as cursor:
+            user = await cursor.fetchone()
+    return dict(user) if user else None
+
+
+async def fetch_all(sql, params):
+    async with db.connection() as conn:
+        async with conn.execute(sql, params) as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+
+# Route handlers: the same SQL and response bodies as moodly_api's views
+
+async def get_user_info(request, user):
+    return JSONResponse({'user': {'id': user['id'], 'username': user['username'], 'email': user['email']}})
+
+
+async def handle_moods(request, user):
+    if request.method == 'GET':
+        moods = await fetch_all('SELECT * FROM mood_entries WHERE user_id = ? ORDER BY created_at DESC LIMIT 50',
+                                (user['id'],))
+        return JSONResponse({'moods': moods})
+
+    data = request.json() or {}
+    mood = {
+        'mood_score': data.get('mood_score'),
+        'energy_level': data.get('energy_level'),
+        'anxiety_level': data.get('anxiety_level'),
+        'sleep_quality': data.get('sleep_quality'),
+        'notes': data.get('notes', ''),
+    }
+    if mood['mood_score'] is None:
+        return JSONResponse({'error': 'Mood score is required'}, 400)
+
+    # The slow part: awaiting OpenAI holds no thread and no DB connection
+    ai_insights = await analyze_mood_with_ai(mood, user['id'])
+
+    created_at = moodly_timezones.utc_timestamp()
+    local_date = moodly_timezones.local_date(created_at, user.get('timezone'))
+    text_sentiment, text_emotion = moodly_sentiment.score_fields(mood['notes'])
+    async with db.connection() as conn:
+        cursor = await conn.execute(
+            '''INSERT INTO mood_entries
+               (user_id, mood_score, energy_level, anxiety_level, sleep_quality, notes, ai_insights,
+                created_at, local_date, text_sentiment, text_emotion)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (user['id'], mood['mood_score'], mood['energy_level'], mood['anxiety_level'],
+             mood['sleep_quality'], mood['notes'], ai_insights, created_at, local_date,
+             text_sentiment, text_emotion)
+        )
+        mood_id = cursor.lastrowid
+        await conn.execute('UPDATE users SET data_version = COALESCE(data_version, 0) + 1 WHERE id = ?',
+                           (user['id'],))
+        entry = moodly_series.point(created_at, mood['mood_score']) if moodly_series.enabled() else None
+        if entry is not None:
+            month, offset, score = entry
+            async with conn.execute(moodly_series.SELECT_MONTH, (user['id'], month)) as series:
+                row = await series.fetchone()
+            count, data = moodly_series.add_point(row[0] if row else None, offset, score)
+            await conn.execute(moodly_series.UPSERT_MONTH, (user['id'], month, count, data))
+        await conn.commit()
+
+    return JSONResponse({
+        'message': 'Mood entry created successfully',
+        'mood': dict(mood, id=mood_id, ai_insights=ai_insights, created_at=created_at)
+    }, 201)
+
+
+async def list_journal(request, user):
+    entries = await fetch_all('SELECT * FROM journal_entries WHERE user_id = ? ORDER BY created_at DESC',
+                              (user['id'],))
+    return JSONResponse({'entries': entries})
+
+
+async def list_goals(request, user):
+    goals = await fetch_all('SELECT * FROM goals WHERE user_id = ? ORDER BY created_at DESC', (user['id'],))
+    return JSONResponse({'goals': goals})
+
+
+async def get_analytics(request, user):
+    mood_stats = await fetch_all(
+        '''SELECT
+           COUNT(*) as total_entries,
+           AVG(mood_score) as avg_mood,
+           AVG(energy_level) as avg_energy,
+           AVG(anxiety_level) as avg_anxiety,
+           AVG(sleep_quality) as avg_sleep
+           FROM mood_entries WHERE user_id = ?''',
+        (user['id'],)
+    )
+    thirty_days_ago = moodly_timezones.utc_timestamp(days_ago=30)
+    recent_moods = await fetch_all(
+        'SELECT * FROM mood_entries WHERE user_id = ? AND created_at >= ? ORDER BY created_at',
+        (user['id'], thirty_days_ago)
+    )
+    async with db.connection() as conn:
+        async with conn.execute(moodly_sentiment.SUMMARY_SQL, (user['id'],)) as cursor:
+            totals = await cursor.fetchone()
+        async with conn.execute(moodly_sentiment.EMOTION_COUNTS_SQL, (user['id'],)) as cursor:
+            emotions = await cursor.fetchall()
+    return JSONResponse({
+        'mood_stats': mood_stats[0] if mood_stats else {},
+        'text_sentiment': moodly_sentiment.summarize(totals, emotions),
+        'recent_moods': recent_moods,
+        'total_journal_entries': 0,
+        'total_goals': 0
+    })
+
+
+# (method, path) -> (endpoint name for metrics, handler, message when not logged in)
+ROUTES = {
+    ('GET', '/api/auth/me'): ('auth.get_user_info', get_user_info, 'Not authenticated'),
+    ('GET', '/api/moods'): ('moods.handle_moods', handle_moods, 'Authentication required'),
+    ('POST', '/api/moods'): ('moods.handle_moods', handle_moods, 'Authentication required'),
+    ('GET', '/api/journal'): ('journal.handle_journal', list_journal, 'Authentication required'),
+    ('GET', '/api/goals'): ('goals.handle_goals', list_goals, 'Authentication required'),
+    ('GET', '/api/analytics'): ('analytics.get_analytics', get_analytics, 'Authentication required'),
+}
+if moodly_db.shards is not None:
+    # The pool holds one database file; the WSGI app finds each user's shard
+    ROUTES = {}
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': unquote(scope['path'], encoding='latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            name = f'HTTP_{name}'
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    """Run the Flask app on a worker thread; the (small, JSON) response is buffered"""
+    state = {}
+
+    def start_response(status, headers, exc_info=None):
+        state['status'] = int(status.split(' ', 1)[0])
+        state['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+    result = moodly_api.app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return state['status'], state['headers'], body
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Create or upgrade the schema before the first request, as the Flask app does on
+            # its first one; on a worker thread, since it is blocking SQLite work
+            try:
+                await asyncio.get_running_loop().run_in_executor(_wsgi_executor, moodly_api.ensure_database_schema)
+            except Exception as e:
+                logger.exception("Database schema setup failed")
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await db.close()
+            if _ai_client is not None:
+                await _ai_client.close()
+            _wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    body = await read_body(receive)
+    route = ROUTES.get((scope['method'], scope['path']))
+    if route is None:
+        loop = asyncio.get_running_loop()
+        status, headers, payload = await loop.run_in_executor(_wsgi_executor, call_wsgi, wsgi_environ(scope, body))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': payload})
+        return
+
+    endpoint, handler, unauthorized = route
+    start = time.perf_counter()
+    request = Request(scope, body)
+    try:
+        user = await current_user(request)
+        response = await handler(request, user) if user else JSONResponse({'error': unauthorized}, 401)
+    except Exception:
+        logger.exception("Unhandled error in %s %s", scope['method'], scope['path'])
+        response = JSONResponse({'error': 'Internal server error'}, 500)
+    response.headers += cors_headers(request)
+    await response.send(send)
+
+    labels = (('endpoint', endpoint),)
+    metrics.inc('moodly_http_requests_total', labels + (('method', scope['method']), ('status', response.status)))
+    metrics.observe('moodly_http_request_duration_seconds', labels, time.perf_counter() - start, LATENCY_BUCKETS)
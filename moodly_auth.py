@@ -0,0 +1,33 @@
+"""
+Password Hashing for Moodly App
+One password format for the web pages, the API and the serverless auth function
+"""
+import hmac
+import hashlib
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+def hash_password(password):
+    """Hash password using werkzeug security"""
+    return generate_password_hash(password)
+
+
+def verify_password(password, password_hash):
+    """Verify password against a werkzeug hash or one of the older formats.
+
+    Accounts created by the old API ("salt:sha256(password + salt)") and by the
+    serverless function (bare sha256 hex) keep working.
+    """
+    if not password_hash:
+        return False
+    if '$' in password_hash:
+        return check_password_hash(password_hash, password)
+    if ':' in password_hash:
+        salt, _, hash_value = password_hash.partition(':')
+        candidate = hashlib.sha256((password + salt).encode()).hexdigest()
+    else:
+        hash_value = password_hash
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(candidate, hash_value)
+
@@ -0,0 +1,149 @@
+"""
+Response Cache for Moodly App
+Rendered pages cached by (route, user, data version[, local date]) with ETag revalidation and a memory cap
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from moodly_metrics import metrics
+
+# Rough per-entry bookkeeping cost on top of the body, so tiny pages still count
+ENTRY_OVERHEAD = 512
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered responses, bounded by total body bytes"""
+
+    def __init__(self, max_bytes, metric='moodly_response_cache_total'):
+        self.max_bytes = max_bytes
+        self.metric = metric
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, body, content_type):
+        cost = len(body) + ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[key] = (body, content_type, cost)
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                metrics.inc(self.metric, (('result', 'evicted'),))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+cache = ResponseCache(int(float(os.environ.get('RESPONSE_CACHE_MB', '32')) * 1024 * 1024))
+
+# Set by init_response_cache: returns (user_id, data_version) for the current request
+_version_source = None
+# Set by init_response_cache: returns the current user's local date, for dated pages
+_today_source = None
+# Changes when templates or the release change, so old ETags stop matching after a deploy
+_fingerprint = ''
+
+
+def _template_fingerprint(app):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update((os.environ.get('RENDER_GIT_COMMIT') or os.environ.get('VERCEL_GIT_COMMIT_SHA') or '').encode())
+    folder = os.path.join(app.root_path, app.template_folder or 'templates')
+    for dirpath, _, filenames in sorted(os.walk(folder)):
+        for filename in sorted(filenames):
+            stat = os.stat(os.path.join(dirpath, filename))
+            digest.update(f"{dirpath}/{filename}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()
+
+
+def init_response_cache(app, version_source, today_source=None):
+    """Enable cached_page views on `app`.
+
+    `version_source()` returns (user_id, data_version) for the current request; bumping a
+    user's data version on every write is what invalidates their cached pages.
+    `today_source()` returns the user's local date, which also keys pages cached with
+    dated=True, so windows like "the last 7 days" move at their midnight.
+    Caching is off in debug mode unless RESPONSE_CACHE is set explicitly.
+    """
+    global _version_source, _today_source, _fingerprint
+    app.config.setdefault('RESPONSE_CACHE', not app.debug)
+    _version_source = version_source
+    _today_source = today_source
+    _fingerprint = _template_fingerprint(app)
+    return app
+
+
+def current_version():
+    """(user_id, data_version) for the current request, or (None, 0) outside one or when not configured"""
+    from flask import has_request_context
+    if _version_source is None or not has_request_context():
+        return None, 0
+    return _version_source()
+
+
+def cached_page(view=None, *, dated=False):
+    """Cache a GET view's 200 HTML response per user and data version, answering If-None-Match with 304.
+
+    Use @cached_page(dated=True) for pages computed relative to the user's today.
+    """
+    if view is None:
+        return lambda view: cached_page(view, dated=dated)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import Response, current_app, make_response, request, session
+        if (request.method != 'GET' or _version_source is None or not current_app.config.get('RESPONSE_CACHE')
+                or session.get('_flashes')):
+            return view(*args, **kwargs)
+
+        user_id, version = current_version()
+        key = (request.endpoint, user_id, version, request.full_path)
+        if dated:
+            if _today_source is None:
+                return view(*args, **kwargs)
+            key += (_today_source(),)
+        etag = hashlib.blake2b(repr((key, _fingerprint)).encode(), digest_size=12).hexdigest()
+
+        if etag in request.if_none_match:
+            metrics.inc('moodly_response_cache_total', (('result', 'not_modified'),))
+            response = Response(status=304)
+        else:
+            entry = cache.get(key)
+            if entry is not None:
+                metrics.inc('moodly_response_cache_total', (('result', 'hit'),))
+                response = Response(entry[0], content_type=entry[1])
+            else:
+                metrics.inc('moodly_response_cache_total', (('result', 'miss'),))
+                response = make_response(view(*args, **kwargs))
+                # Only plain 200 pages that did not touch the session (e.g. flash) are reusable
+                if (response.status_code != 200 or response.direct_passthrough or session.modified
+                        or response.mimetype != 'text/html'):
+                    return response
+                cache.set(key, response.get_data(), response.content_type)
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+
+    return wrapper
@@ -0,0 +1,54 @@
+"""
+Client Pool for Moodly App
+The process's OpenAI client and profile picture storage backend, created on first use and shared by every route
+"""
+import os
+import logging
+
+from storage_backend import get_storage_backend
+
+logger = logging.getLogger('moodly')
+
+openai_api_key = os.environ.get('OPENAI_API_KEY')
+
+_storage_backend = None
+_openai_client = None
+
+
+def get_storage():
+    """Get the profile picture storage backend, creating it on first use"""
+    global _storage_backend
+    if _storage_backend is None:
+        _storage_backend = get_storage_backend()
+    return _storage_backend
+
+
+def get_openai_client():
+    """The OpenAI client (with its HTTP connection pool), or None without an API key"""
+    global _openai_client
+    if _openai_client is None and openai_api_key:
+        try:
+            # Imported here, not at module level: it takes most of a second, which serverless
+            # cold starts would pay even when no request needs AI (gunicorn preloads it instead)
+            from openai import OpenAI
+            _openai_client = OpenAI(api_key=openai_api_key)
+        except Exception as e:
+            logger.warning("OpenAI initialization failed: %s", e)
+    return _openai_client
+
+
+def preload_openai():
+    """Import the openai package ahead of the first AI request, when there is a key (gunicorn's master does)"""
+    if openai_api_key:
+        import openai  # noqa: F401
+
+
+def reset():
+    """Drop the clients so a forked worker (gunicorn --preload) builds its own connection pools"""
+    global _storage_backend, _openai_client
+    _storage_backend = None
+    _openai_client = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset)
@@ -0,0 +1,153 @@
+"""
+Content Catalog for Moodly App
+Static wellness content loaded once from content/*.json into frozen, indexed structures
+"""
+import os
+import json
+import logging
+import threading
+
+from flask import Blueprint, jsonify, request, url_for
+from werkzeug.routing import BuildError
+
+logger = logging.getLogger('moodly')
+
+CONTENT_DIR = os.environ.get('CONTENT_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content')
+
+
+class FrozenDict(dict):
+    """Read-only dict; still a dict, so Jinja attribute access and tojson work unchanged"""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('content catalog entries are read-only')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+
+def freeze(value):
+    """Deep-convert parsed JSON into FrozenDicts and tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _resolve_urls(value, build_url):
+    # {"$url": {"endpoint": ..., "values": {...}}} becomes build_url(endpoint, **values)
+    if isinstance(value, dict):
+        target = value.get('$url')
+        if target is not None and len(value) == 1:
+            return build_url(target['endpoint'], **target.get('values', {}))
+        return FrozenDict((key, _resolve_urls(item, build_url)) for key, item in value.items())
+    if isinstance(value, tuple):
+        return tuple(_resolve_urls(item, build_url) for item in value)
+    return value
+
+
+class ContentCatalog:
+    """Named sections, one JSON file each, parsed once and shared by every request.
+
+    Mapping sections are looked up by key and list sections by their items' 'id', both
+    in O(1). With auto_reload on (development), a section is re-read when its file changes.
+    """
+
+    def __init__(self, directory=CONTENT_DIR, auto_reload=False):
+        self.directory = directory
+        self.auto_reload = auto_reload
+        self._sections = {}
+        self._linked = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.json')
+
+    def _load(self, name):
+        path = self._path(name)
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, encoding='utf-8') as f:
+            data = freeze(json.load(f))
+        index = data
+        if isinstance(data, tuple):
+            index = {item['id']: item for item in data if isinstance(item, dict) and 'id' in item}
+        return mtime, data, index
+
+    def _section(self, name):
+        section = self._sections.get(name)
+        if section is not None and not (self.auto_reload and os.stat(self._path(name)).st_mtime_ns != section[0]):
+            return section
+        with self._lock:
+            reloaded = name in self._sections
+            section = self._sections[name] = self._load(name)
+            for key in [key for key in self._linked if key[0] == name]:
+                del self._linked[key]
+        if reloaded:
+            logger.info("Reloaded content section %s", name)
+        return section
+
+    def load_all(self):
+        """Parse every section up front (at app creation, before workers fork)"""
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith('.json'):
+                self._section(filename[:-5])
+        return self
+
+    def get(self, name):
+        return self._section(name)[1]
+
+    def lookup(self, name, key, default=None):
+        return self._section(name)[2].get(key, default)
+
+    def keys(self, name):
+        return tuple(self._section(name)[2])
+
+    def names(self):
+        return tuple(sorted(filename[:-5] for filename in os.listdir(self.directory) if filename.endswith('.json')))
+
+    def linked(self, name, build_url, key=''):
+        """The section with its $url references resolved by build_url (e.g. url_for).
+
+        Resolved copies are memoized per `key`; pass request.script_root so apps
+        mounted under different prefixes get their own links.
+        """
+        data = self.get(name)
+        linked = self._linked.get((name, key))
+        if linked is None:
+            linked = self._linked[(name, key)] = _resolve_urls(data, build_url)
+        return linked
+
+
+catalog = ContentCatalog()
+
+
+def init_content(app):
+    """Preload the catalog; reload changed files on access in debug mode or with CONTENT_RELOAD=true"""
+    catalog.auto_reload = app.debug or os.environ.get('CONTENT_RELOAD', 'false').lower() == 'true'
+    catalog.load_all()
+    return app
+
+
+# The catalog as JSON for the React app
+blueprint = Blueprint('content', __name__)
+
+
+def _page_url(endpoint, **values):
+    # Links to server-rendered pages are null when the app serves the React build instead
+    try:
+        return url_for(endpoint, **values)
+    except BuildError:
+        return None
+
+
+@blueprint.route('/api/content')
+def list_sections():
+    return jsonify({'sections': catalog.names()})
+
+
+@blueprint.route('/api/content/<name>')
+def get_section(name):
+    if name not in catalog.names():
+        return jsonify({'error': 'Unknown content section'}), 404
+    return jsonify({name: catalog.linked(name, _page_url, f'api|{request.script_root}')})
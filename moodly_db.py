@@ -0,0 +1,358 @@
+"""
+Database Layer for Moodly App
+Where the database lives, how to connect to it, and the one SQLite schema shared by the web pages and the API
+"""
+import os
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from flask import has_request_context, session
+
+import moodly_replicas
+import moodly_sentiment
+import moodly_series
+import moodly_snapshots
+import moodly_timezones
+from moodly_metrics import connect as db_connect
+from moodly_shards import ShardMap
+
+logger = logging.getLogger('moodly')
+
+
+# Detect Vercel environment
+def is_vercel():
+    return os.environ.get('VERCEL') == '1'
+
+
+# Detect Render environment
+def is_render():
+    return os.environ.get('RENDER') is not None
+
+
+def get_database_url():
+    """Get database URL for different environments"""
+    database_url = os.environ.get('DATABASE_URL')
+
+    if database_url:
+        # Parse PostgreSQL URL for Render
+        url = urlparse(database_url)
+        return {
+            'host': url.hostname,
+            'port': url.port,
+            'database': url.path[1:],
+            'user': url.username,
+            'password': url.password
+        }
+    else:
+        # Use SQLite for local development
+        return {'sqlite': 'moodly.db'}
+
+
+DATABASE_TYPE = 'sqlite'
+DATABASE_CONFIG = None
+if is_vercel():
+    # Use /tmp for SQLite database in serverless environment
+    DATABASE_PATH = '/tmp/moodly.db'
+elif is_render():
+    # Use PostgreSQL on Render
+    db_config = get_database_url()
+    if 'sqlite' not in db_config:
+        DATABASE_TYPE = 'postgresql'
+        DATABASE_CONFIG = db_config
+    DATABASE_PATH = '/opt/render/project/src/moodly.db'
+else:
+    DATABASE_PATH = 'moodly.db'
+
+# Read replicas of the SQLite file every request reads (PostgreSQL, when configured, only gets init_db's schema)
+REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+router = moodly_replicas.ReplicaRouter(DATABASE_PATH, REPLICA_URLS)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: router.after_fork())
+
+# DATABASE_SHARDS=N spreads users over N SQLite files, DATABASE_PATH becoming their directory (see moodly_shards)
+SHARD_COUNT = int(os.environ.get('DATABASE_SHARDS') or 0)
+shards = ShardMap(DATABASE_PATH, SHARD_COUNT, connect=db_connect) if SHARD_COUNT > 0 and DATABASE_TYPE == 'sqlite' else None
+if shards is not None and router.enabled:
+    logger.warning("DATABASE_REPLICA_URLS is ignored with DATABASE_SHARDS: reads go to the user's shard")
+
+
+def connect(path=None, rows=False, read_only=False, user_id=None):
+    """Open a SQLite connection whose queries are counted in the request metrics.
+
+    With `rows`, rows are sqlite3.Row (the API's dict(row) style) instead of tuples.
+    When sharded, a connection to the main database goes to the shard of `user_id`,
+    by default the signed-in user's. Otherwise, with `read_only`, it may go to a
+    read replica (see moodly_replicas); only pass it for connections that never write.
+    """
+    conn = None
+    if shards is not None and path in (None, DATABASE_PATH):
+        path = shard_path(user_id)
+    elif read_only and router.enabled and path in (None, DATABASE_PATH):
+        conn = router.connect_read()
+    if conn is None:
+        conn = db_connect(path or DATABASE_PATH)
+    if rows:
+        conn.row_factory = sqlite3.Row
+    return conn
+
+
+# The union of the tables moodly.py, moodly_api.py and app.py used to create on their own
+TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        profile_picture TEXT,
+        cloudinary_id TEXT,
+        bio TEXT,
+        mood_streak INTEGER DEFAULT 0,
+        last_mood_date DATE,
+        avatar_url TEXT,
+        avatar_version TEXT,
+        data_version INTEGER DEFAULT 0,
+        timezone TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS mood_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        mood_score INTEGER NOT NULL,
+        mood_description TEXT,
+        entry_text TEXT,
+        energy_level INTEGER,
+        anxiety_level INTEGER,
+        sleep_quality INTEGER,
+        notes TEXT,
+        ai_insights TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        tags TEXT,
+        local_date TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS journal_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        tags TEXT,
+        is_favorite BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS goals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        category TEXT,
+        priority TEXT DEFAULT 'medium',
+        target_date DATE,
+        completed BOOLEAN DEFAULT FALSE,
+        is_completed BOOLEAN DEFAULT FALSE,
+        progress INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+)
+
+# Columns a database created by one of the older apps may be missing (timezone and
+# local_date are handled by moodly_timezones)
+UPGRADE_COLUMNS = {
+    'users': (
+        ('updated_at', 'TIMESTAMP'), ('profile_picture', 'TEXT'), ('cloudinary_id', 'TEXT'), ('bio', 'TEXT'),
+        ('mood_streak', 'INTEGER DEFAULT 0'), ('last_mood_date', 'DATE'), ('avatar_url', 'TEXT'),
+        ('avatar_version', 'TEXT'), ('data_version', 'INTEGER DEFAULT 0'),
+    ),
+    'mood_entries': (
+        ('mood_description', 'TEXT'), ('entry_text', 'TEXT'), ('energy_level', 'INTEGER'),
+        ('anxiety_level', 'INTEGER'), ('sleep_quality', 'INTEGER'), ('notes', 'TEXT'), ('ai_insights', 'TEXT'),
+        ('tags', 'TEXT'),
+    ),
+    'journal_entries': (
+        ('tags', 'TEXT'), ('is_favorite', 'BOOLEAN DEFAULT FALSE'), ('updated_at', 'TIMESTAMP'),
+    ),
+    'goals': (
+        ('category', 'TEXT'), ('priority', "TEXT DEFAULT 'medium'"), ('completed', 'BOOLEAN DEFAULT FALSE'),
+        ('is_completed', 'BOOLEAN DEFAULT FALSE'), ('progress', 'INTEGER DEFAULT 0'), ('updated_at', 'TIMESTAMP'),
+    ),
+}
+
+
+def shard_path(user_id=None):
+    """The shard file holding a user's rows (by default the signed-in user's)"""
+    if user_id is None and has_request_context():
+        user_id = session.get('user_id')
+    if user_id is None:
+        return DATABASE_PATH
+    # A user the directory does not know has no rows anywhere; any shard can say so
+    return shards.path(shards.shard_of(user_id) or 0)
+
+
+def databases():
+    """Every SQLite file holding users' rows: the main database, or each shard"""
+    return shards.paths if shards is not None else [DATABASE_PATH]
+
+
+def database_files():
+    """Every SQLite file: the main database and, when sharded, each shard"""
+    return list(dict.fromkeys([DATABASE_PATH] + databases()))
+
+
+def fan_out(sql, parameters=(), paths=None):
+    """Run a read-only query on every database in `paths` (default databases()); one list of rows per database"""
+    def run(path):
+        conn = db_connect(path)
+        try:
+            return conn.execute(sql, parameters).fetchall()
+        finally:
+            conn.close()
+
+    paths = paths or databases()
+    if len(paths) == 1:
+        return [run(paths[0])]
+    with ThreadPoolExecutor(max_workers=min(len(paths), 8)) as pool:
+        return list(pool.map(run, paths))
+
+
+def find_user(login):
+    """The users row (sqlite3.Row) whose username or email is `login`, or None"""
+    if shards is None:
+        conn = connect(rows=True)
+        try:
+            return conn.execute('SELECT * FROM users WHERE username = ? OR email = ?', (login, login)).fetchone()
+        finally:
+            conn.close()
+    found = shards.find(login)
+    if found is None:
+        return None
+    conn = connect(shards.path(found[1]), rows=True)
+    try:
+        return conn.execute('SELECT * FROM users WHERE id = ?', (found[0],)).fetchone()
+    finally:
+        conn.close()
+
+
+def user_exists(username, email):
+    if shards is not None:
+        return shards.exists(username, email)
+    conn = connect()
+    try:
+        return conn.execute('SELECT 1 FROM users WHERE username = ? OR email = ?',
+                            (username, email)).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def create_user(username, email, password_hash):
+    """Insert a user (into the directory and their shard when sharded); returns the new id"""
+    if shards is None:
+        conn = connect()
+        try:
+            user_id = conn.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                                   (username, email, password_hash)).lastrowid
+            conn.commit()
+            return user_id
+        finally:
+            conn.close()
+    user_id, shard = shards.add_user(username, email)
+    try:
+        conn = connect(shards.path(shard))
+        try:
+            conn.execute('INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                         (user_id, username, email, password_hash))
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception:
+        shards.remove_user(user_id)
+        raise
+    return user_id
+
+
+def update_login(user_id, username, email):
+    """Record a change of username or email outside the users table (the shard directory)"""
+    if shards is not None:
+        shards.update_login(user_id, username, email)
+
+
+def init_schema(backfill=False):
+    """Create (or bring up to date) the schema of every database, and the shard directory.
+
+    With `backfill`, also fill in local dates and text sentiment missing from older
+    entries. Files missing on a cold start are first restored from their snapshots, if any.
+    """
+    moodly_snapshots.restore_missing(database_files())
+    paths = databases()
+    if shards is not None:
+        shards.create_directory()
+        conn = db_connect(DATABASE_PATH)
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone() \
+                and conn.execute('SELECT 1 FROM users LIMIT 1').fetchone():
+            logger.warning("%s still holds users from before sharding, served from it until "
+                           "scripts/rebalance_shards.py moves them", DATABASE_PATH)
+            # Their writes still land here, so its schema has to keep up
+            paths = [DATABASE_PATH] + paths
+        conn.close()
+    for path in paths:
+        # Not connect(): inside a request it would send DATABASE_PATH to the signed-in user's shard
+        conn = db_connect(path)
+        create_schema(conn)
+        if shards is not None and path != DATABASE_PATH:
+            shards.reserve_ids(conn, shards.paths.index(path))
+        if backfill:
+            moodly_timezones.backfill(conn)
+            moodly_sentiment.backfill(conn)
+        conn.close()
+
+
+def init_replicas(app):
+    """Send each user's reads to the primary briefly after they write, when there are replicas"""
+    if router.enabled:
+        moodly_replicas.init_read_your_writes(app)
+
+
+def init_snapshots(app):
+    """Ship changes to every database file to the snapshot store, when there is one"""
+    moodly_snapshots.init_snapshots(app, database_files)
+
+
+def add_missing_columns(cursor):
+    for table, columns in UPGRADE_COLUMNS.items():
+        existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()}
+        for column, column_type in columns:
+            if column not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+                logger.info("Added %s column to %s table", column, table)
+
+
+def create_schema(conn):
+    """Create (or bring up to date) every table, index and the mood series store; idempotent"""
+    cursor = conn.cursor()
+    # Lets moodly_maintenance hand free pages back bit by bit; only takes effect on a new file
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    for statement in TABLES:
+        cursor.execute(statement)
+    add_missing_columns(cursor)
+    moodly_timezones.add_columns(cursor)
+    moodly_sentiment.add_columns(cursor)
+    moodly_series.create_table(cursor)
+    conn.commit()
+
+
+def bump_data_version(cursor, user_id):
+    """Invalidate the user's cached pages; run in the same transaction as the write"""
+    cursor.execute('UPDATE users SET data_version = COALESCE(data_version, 0) + 1 WHERE id = ?', (user_id,))
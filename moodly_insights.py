@@ -0,0 +1,140 @@
+"""
+Insight Rules for Moodly App
+Data-driven rules behind the offline mood insight
+
+The insight shown when OpenAI is not available comes from two tables: THRESHOLDS maps each
+score to bands, KEYWORDS maps words in the notes to categories. The text is built from the
+first two insights and the first suggestion matched, then the first encouragement (or a
+default one).
+
+Each note is lowercased once and each category is a run of `in` checks stopping at its first
+hit: faster in CPython than one regex alternation over the note, or a search of all notes
+joined together (see scripts/bench_insights.py). Everything else depends only on the four
+scores and which categories were found, a few thousand combinations on the 1-10 scales, so
+it is worked out once per combination and cached.
+"""
+import operator
+from functools import lru_cache
+
+# A score that is missing (or null) counts as the middle of the 1-10 scale
+NEUTRAL_SCORE = 5
+
+COMPARISONS = {'>=': operator.ge, '<=': operator.le, '<': operator.lt}
+
+# field -> bands, checked in order until one matches: (comparison, threshold, messages)
+THRESHOLDS = {
+    'mood_score': (
+        ('>=', 8, {
+            'insight': "You're experiencing a positive mood today",
+            'encouragement': "Keep nurturing this positive energy!",
+        }),
+        ('>=', 6, {
+            'insight': "Your mood is in a stable, balanced range",
+            'suggestion': "Consider what's working well for you and try to maintain these positive habits",
+        }),
+        ('>=', 4, {
+            'insight': "Your mood seems a bit low today",
+            'suggestion': "Try gentle activities like a short walk, listening to music, or connecting with a friend",
+        }),
+        ('<', 4, {
+            'insight': "You're going through a challenging time",
+            'suggestion': "Be gentle with yourself and consider reaching out for support if needed",
+        }),
+    ),
+    'energy_level': (
+        ('<=', 3, {
+            'suggestion': "Low energy detected - prioritize rest and gentle self-care activities",
+        }),
+        ('>=', 8, {
+            'insight': "Your energy levels are high",
+        }),
+    ),
+    'anxiety_level': (
+        ('>=', 7, {
+            'suggestion': "High anxiety noted - try deep breathing exercises or mindfulness techniques",
+        }),
+        ('<=', 3, {
+            'insight': "Your anxiety levels appear manageable today",
+        }),
+    ),
+    'sleep_quality': (
+        ('<=', 3, {
+            'suggestion': "Poor sleep quality can impact mood - consider establishing a calming bedtime routine",
+        }),
+        ('>=', 8, {
+            'insight': "Good sleep quality is supporting your overall well-being",
+        }),
+    ),
+}
+
+# (words found anywhere in the notes regardless of case, messages); only the first category
+# found has its messages used
+KEYWORDS = (
+    (('stress', 'worried', 'anxious', 'overwhelmed'), {
+        'suggestion': "Consider breaking down overwhelming tasks into smaller, manageable steps",
+    }),
+    (('happy', 'good', 'great', 'excited', 'grateful'), {
+        'encouragement': "It's wonderful to see positive moments in your day!",
+    }),
+)
+
+DEFAULT_ENCOURAGEMENT = "Remember that tracking your mood is a valuable step in understanding yourself better"
+
+# Distinct (scores, categories found) combinations whose text is kept
+CACHE_SIZE = 65536
+
+_THRESHOLDS = [[(COMPARISONS[comparison], threshold, messages) for comparison, threshold, messages in bands]
+               for bands in THRESHOLDS.values()]
+_FIELDS = tuple(THRESHOLDS)
+_KEYWORD_WORDS = [words for words, _ in KEYWORDS]
+
+
+def categories_found(notes):
+    """Whether the notes contain a word of each KEYWORDS category, in order"""
+    lowered = notes.lower() if notes else ''
+    found = []
+    # Plain loops: any() over a generator costs more than the searches on a typical note
+    for words in _KEYWORD_WORDS:
+        for word in words:
+            if word in lowered:
+                found.append(True)
+                break
+        else:
+            found.append(False)
+    return tuple(found)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _text(scores, categories):
+    messages = {'insight': [], 'suggestion': [], 'encouragement': []}
+    for bands, value in zip(_THRESHOLDS, scores):
+        for compare, threshold, band_messages in bands:
+            if compare(value, threshold):
+                for kind, message in band_messages.items():
+                    messages[kind].append(message)
+                break
+
+    for (_, keyword_messages), found in zip(KEYWORDS, categories):
+        if found:
+            for kind, message in keyword_messages.items():
+                messages[kind].append(message)
+            break
+
+    text = ". ".join(messages['insight'][:2])
+    if messages['suggestion']:
+        text += ". " + messages['suggestion'][0]
+    return text + ". " + (messages['encouragement'] or [DEFAULT_ENCOURAGEMENT])[0] + "."
+
+
+def _scores(entry):
+    scores = []
+    for field in _FIELDS:
+        value = entry.get(field)
+        scores.append(NEUTRAL_SCORE if value is None else value)
+    return tuple(scores)
+
+
+def insight_text(entry):
+    """The insight shown for one mood entry (a dict with the scores and notes)"""
+    return _text(_scores(entry), categories_found(entry.get('notes')))
+
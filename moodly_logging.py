@@ -0,0 +1,171 @@
+"""
+Structured Logging for Moodly App
+Non-blocking JSON logs with request ids and sampling for hot messages
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import random
+import logging
+import threading
+from queue import SimpleQueue
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_lock = threading.Lock()
+
+
+def get_request_id():
+    """Current request id, or '-' outside a Flask request"""
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return '-'
+    if has_request_context():
+        return g.get('request_id', '-')
+    return '-'
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the Flask request id; runs in the request thread, before the queue"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = get_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Drop a share of low-level records and rate-limit repeated messages.
+
+    Records at or above `always_level` are never sampled out, only rate-limited.
+    Rate limiting keys on (logger, message template), so log with %-style args
+    rather than f-strings for hot messages. When a message is let through again
+    after being suppressed, the record carries a `suppressed` count.
+    """
+
+    def __init__(self, sample_rate=1.0, rate_limit=20.0, burst=None, always_level=logging.WARNING):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.burst = burst if burst is not None else max(rate_limit, 1.0)
+        self.always_level = always_level
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.always_level and self.sample_rate < 1.0:
+            if random.random() >= self.sample_rate:
+                return False
+        if self.rate_limit <= 0:
+            return True
+
+        key = (record.name, record.msg if isinstance(record.msg, str) else id(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate_limit)
+            if tokens < 1.0:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1.0, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def configure_logging(level=None, json_format=None, stream=None):
+    """Route the 'moodly' loggers through a queue so callers never block on stdout.
+
+    Safe to call more than once; only the first call installs handlers.
+    Settings come from LOG_LEVEL, LOG_FORMAT (json|text), LOG_SAMPLE_RATE and LOG_RATE_LIMIT.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        level = level or os.environ.get('LOG_LEVEL', 'INFO').upper()
+        if json_format is None:
+            json_format = os.environ.get('LOG_FORMAT', 'json').lower() == 'json'
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        if json_format:
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'))
+
+        queue_handler = QueueHandler(SimpleQueue())
+        queue_handler.addFilter(RequestIdFilter())
+        queue_handler.addFilter(SamplingFilter(
+            sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', '1.0')),
+            rate_limit=float(os.environ.get('LOG_RATE_LIMIT', '20')),
+        ))
+
+        for name in ('moodly', 'moodly_api', 'cloudinary_storage', 'local_storage', 'storage_backend'):
+            logger = logging.getLogger(name)
+            logger.setLevel(level)
+            logger.addHandler(queue_handler)
+            logger.propagate = False
+
+        _listener = QueueListener(queue_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+        if hasattr(os, 'register_at_fork'):
+            # The listener thread does not survive fork (gunicorn --preload), so restart it in workers
+            os.register_at_fork(after_in_child=_restart_listener)
+        return _listener
+
+
+def _stop_listener():
+    # Flush queued records at exit; the listener may already have been stopped
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_listener():
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def init_request_ids(app):
+    """Give every request an id (from X-Request-ID or generated) and echo it back"""
+    from flask import g, request
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def echo_request_id(response):
+        response.headers.setdefault('X-Request-ID', g.get('request_id', '-'))
+        return response
+
+    return app
@@ -0,0 +1,397 @@
+"""
+Database Maintenance for Moodly App
+Online backups, compaction and statistics, retention of old entries in compressed archives, and size metrics
+
+Jobs (run them with scripts/maintain_db.py, e.g. from cron, or let the app schedule them):
+
+  backup    copy every database file with SQLite's online backup API, a few pages per step,
+            into BACKUP_DIR, keeping the newest BACKUP_KEEP copies per file
+  compact   PRAGMA incremental_vacuum (bounded by VACUUM_PAGES) to hand free pages back to
+            the filesystem, then ANALYZE (the first time) and PRAGMA optimize; a database
+            from before incremental auto-vacuum is converted by `maintain_db.py convert`
+  archive   with RETENTION_DAYS set, move mood and journal entries older than that into
+            gzipped JSON-lines files in ARCHIVE_DIR, then delete them
+
+With MAINTENANCE_ENABLED=true, requests start due jobs in a background thread; a row per job
+in the main database makes sure one process runs each job per interval. File size and free
+page share of every database are exported at /metrics on each scrape.
+"""
+import os
+import glob
+import gzip
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import moodly_db
+import moodly_series
+from moodly_metrics import metrics
+
+logger = logging.getLogger('moodly')
+
+ENABLED = os.environ.get('MAINTENANCE_ENABLED', 'false').lower() == 'true'
+# How often each process looks for due jobs (one small UPDATE on the main database)
+CHECK_INTERVAL = 60
+
+BACKUP_DIR = os.environ.get('BACKUP_DIR', 'instance/backups')
+BACKUP_INTERVAL = float(os.environ.get('BACKUP_INTERVAL_HOURS', 24)) * 3600
+BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 7))
+# Pages copied per backup step; writers only ever wait for one step
+BACKUP_PAGES = int(os.environ.get('BACKUP_PAGES', 256))
+BACKUP_SLEEP = 0.005
+# A write from another connection restarts a stepped copy; after this many restarts the
+# copy is finished in one step, holding writers off for that long instead of never finishing
+BACKUP_RESTARTS = 3
+
+COMPACT_INTERVAL = float(os.environ.get('COMPACT_INTERVAL_HOURS', 24)) * 3600
+# Free pages returned per compact run (x page size; 4096 pages of 4 KiB = 16 MiB)
+VACUUM_PAGES = int(os.environ.get('VACUUM_PAGES', 4096))
+
+RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 0))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'instance/archive')
+ARCHIVE_INTERVAL = 24 * 3600
+ARCHIVE_BATCH = 1000
+# Tables whose old rows are archived; everything else is per-user state that is kept
+ARCHIVE_TABLES = ('mood_entries', 'journal_entries')
+
+STATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS maintenance_runs (
+        job TEXT PRIMARY KEY,
+        started_at REAL NOT NULL,
+        finished_at REAL,
+        outcome TEXT
+    )
+'''
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _stamp():
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+class _Restarted(Exception):
+    pass
+
+
+class _RestartLimit:
+    """Backup progress callback giving up once the copy has started over BACKUP_RESTARTS times"""
+
+    def __init__(self):
+        self.remaining = None
+        self.restarts = 0
+
+    def __call__(self, status, remaining, total):
+        if self.remaining is not None and remaining > self.remaining:
+            self.restarts += 1
+            if self.restarts >= BACKUP_RESTARTS:
+                raise _Restarted()
+        self.remaining = remaining
+
+
+def backup(path, directory=None, pages=None, keep=None):
+    """Copy one database with the online backup API; returns the backup's path.
+
+    The copy goes `pages` pages at a time with a short sleep in between, so the app keeps
+    reading and writing throughout. It is written next to its final name and renamed once
+    complete and checked.
+    """
+    directory = directory or BACKUP_DIR
+    keep = BACKUP_KEEP if keep is None else keep
+    if keep < 1:
+        # Pruning to the newest `keep` would remove the copy about to be written
+        raise ValueError(f'keep must be at least 1, got {keep}')
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f'{_stem(path)}-{_stamp()}.db')
+    partial = target + '.partial'
+    source = sqlite3.connect(path)
+    destination = sqlite3.connect(partial)
+    try:
+        try:
+            source.backup(destination, pages=pages or BACKUP_PAGES, progress=_RestartLimit(), sleep=BACKUP_SLEEP)
+        except _Restarted:
+            logger.info("Backup of %s kept restarting under writes; copying the rest in one step", path)
+            source.backup(destination)
+        result = destination.execute('PRAGMA quick_check').fetchone()[0]
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f'backup of {path} failed its check: {result}')
+    finally:
+        destination.close()
+        source.close()
+    os.replace(partial, target)
+
+    # Timestamped names sort by age
+    for old in sorted(glob.glob(os.path.join(directory, f'{_stem(path)}-*.db')))[:-keep]:
+        os.remove(old)
+    return target
+
+
+def convert(path):
+    """Switch a database created before incremental auto-vacuum (moodly_db.create_schema asks
+    for it) over, with one full VACUUM; returns whether it needed it.
+
+    The VACUUM rewrites the whole file and locks out every writer until done, so this is a
+    deploy step (scripts/maintain_db.py convert), never something a request starts.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        logger.info("Converting %s to incremental auto-vacuum (one full VACUUM)", path)
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return True
+    finally:
+        conn.close()
+
+
+def compact(path, pages=None):
+    """Return free pages to the filesystem and refresh the query planner's statistics.
+
+    Each run frees at most `pages` pages, so it never holds writers off for long. A database
+    not yet converted (see convert()) has nothing to free incrementally and only gets its
+    statistics refreshed. Returns the number of pages freed.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        before = conn.execute('PRAGMA page_count').fetchone()[0]
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            logger.warning("%s is not on incremental auto-vacuum; run scripts/maintain_db.py convert", path)
+        else:
+            # The pragma frees one page per step, and execute() steps a statement without
+            # result columns only once; executescript() runs it to the end
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages or VACUUM_PAGES)});')
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            # Sampled, so the first ANALYZE of a large database stays quick
+            conn.execute('PRAGMA analysis_limit = 1000')
+            conn.execute('ANALYZE')
+        conn.execute('PRAGMA optimize')
+        conn.commit()
+        return before - conn.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def archive(path, days=None, directory=None):
+    """Move entries older than `days` into gzipped JSON lines, one file per table; returns rows per table.
+
+    Rows are deleted only after their archive file is complete and synced, so a crash can
+    at worst archive some rows twice, never lose them. Affected users get their mood series
+    rebuilt and their cached pages invalidated.
+    """
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return {}
+    directory = directory or ARCHIVE_DIR
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = sqlite3.connect(path)
+    archived = {}
+    users = set()
+    try:
+        for table in ARCHIVE_TABLES:
+            ids = []
+            target = os.path.join(directory, f'{_stem(path)}-{table}-{_stamp()}.jsonl.gz')
+            out = None
+            while True:
+                # A batch per query: a read left open would hold off every writer's commit
+                cursor = conn.execute(f'SELECT * FROM {table} WHERE created_at < ? AND id > ? ORDER BY id LIMIT ?',
+                                      (cutoff, ids[-1] if ids else 0, ARCHIVE_BATCH))
+                columns = [description[0] for description in cursor.description]
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                if out is None:
+                    os.makedirs(directory, exist_ok=True)
+                    raw = open(target + '.partial', 'wb')
+                    out = gzip.GzipFile(fileobj=raw, mode='wb')
+                for row in rows:
+                    record = dict(zip(columns, row))
+                    out.write(json.dumps(record, default=str).encode() + b'\n')
+                    ids.append(record['id'])
+                    users.add(record['user_id'])
+            if out is None:
+                continue
+            out.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+            raw.close()
+            os.replace(target + '.partial', target)
+
+            for start in range(0, len(ids), ARCHIVE_BATCH):
+                batch = ids[start:start + ARCHIVE_BATCH]
+                conn.execute(f'DELETE FROM {table} WHERE id IN ({",".join("?" * len(batch))})', batch)
+                conn.commit()
+            archived[table] = len(ids)
+            metrics.inc('moodly_archived_rows_total', (('table', table),), len(ids))
+            logger.info("Archived %d %s rows older than %s from %s to %s", len(ids), table, cutoff, path, target)
+
+        for user_id in users:
+            cursor = conn.cursor()
+            moodly_db.bump_data_version(cursor, user_id)
+            conn.commit()
+            if conn.execute('SELECT 1 FROM mood_series WHERE user_id = ? LIMIT 1', (user_id,)).fetchone():
+                moodly_series.rebuild(conn, user_id)
+        return archived
+    finally:
+        conn.close()
+
+
+def file_stats(path):
+    """Size in bytes and the share of pages on the freelist"""
+    conn = sqlite3.connect(path)
+    try:
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+    return os.path.getsize(path), free / page_count if page_count else 0.0
+
+
+def collect_database_stats():
+    for path in moodly_db.database_files():
+        if not os.path.exists(path):
+            continue
+        size, free_ratio = file_stats(path)
+        labels = (('database', os.path.basename(path)),)
+        yield 'moodly_db_size_bytes', labels, size
+        yield 'moodly_db_free_ratio', labels, round(free_ratio, 4)
+    for job, finished_at in _last_successes():
+        yield 'moodly_maintenance_last_success_timestamp_seconds', (('job', job),), finished_at
+
+
+def _last_successes():
+    conn = sqlite3.connect(moodly_db.DATABASE_PATH)
+    try:
+        return conn.execute("SELECT job, finished_at FROM maintenance_runs WHERE outcome = 'ok'").fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+def run_backup():
+    return [backup(path) for path in moodly_db.database_files()]
+
+
+def run_compact():
+    return {path: compact(path) for path in moodly_db.database_files()}
+
+
+def run_archive():
+    return {path: archive(path) for path in moodly_db.databases()}
+
+
+# name -> (interval in seconds, job); archive before compact, which hands back the pages it freed
+JOBS = {
+    'backup': (BACKUP_INTERVAL, run_backup),
+    'archive': (ARCHIVE_INTERVAL, run_archive),
+    'compact': (COMPACT_INTERVAL, run_compact),
+}
+
+
+def run_job(name):
+    """Run one job now, recording the outcome; returns its result"""
+    start = time.time()
+    try:
+        result = JOBS[name][1]()
+    except Exception:
+        metrics.inc('moodly_maintenance_runs_total', (('job', name), ('outcome', 'error')))
+        _record(name, start, 'error')
+        logger.exception("Maintenance job %s failed", name)
+        raise
+    metrics.inc('moodly_maintenance_runs_total', (('job', name), ('outcome', 'ok')))
+    _record(name, start, 'ok')
+    logger.info("Maintenance job %s finished in %.1fs", name, time.time() - start)
+    return result
+
+
+def _record(name, started_at, outcome):
+    conn = sqlite3.connect(moodly_db.DATABASE_PATH, timeout=5)
+    try:
+        conn.execute(STATE_TABLE)
+        conn.execute('''
+            INSERT INTO maintenance_runs (job, started_at, finished_at, outcome) VALUES (?, ?, ?, ?)
+            ON CONFLICT (job) DO UPDATE SET finished_at = excluded.finished_at, outcome = excluded.outcome
+        ''', (name, started_at, time.time(), outcome))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def claim_due_jobs(now=None):
+    """Claim the jobs whose interval has passed since they last started; returns their names.
+
+    The claim is one conditional UPDATE per job, so of all the processes sharing the
+    database exactly one gets each run.
+    """
+    now = now or time.time()
+    claimed = []
+    conn = sqlite3.connect(moodly_db.DATABASE_PATH, timeout=1)
+    try:
+        conn.execute(STATE_TABLE)
+        for name, (interval, _) in JOBS.items():
+            if name == 'archive' and RETENTION_DAYS <= 0:
+                continue
+            conn.execute('INSERT OR IGNORE INTO maintenance_runs (job, started_at) VALUES (?, 0)', (name,))
+            cursor = conn.execute('UPDATE maintenance_runs SET started_at = ? WHERE job = ? AND started_at <= ?',
+                                  (now, name, now - interval))
+            if cursor.rowcount:
+                claimed.append(name)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        # Busy: another process is claiming; try again at the next check
+        logger.debug("Maintenance claim skipped: %s", e)
+        conn.rollback()
+        return []
+    finally:
+        conn.close()
+    return claimed
+
+
+# The first check waits an interval, clear of the schema upgrades a starting app runs
+_next_check = time.time() + CHECK_INTERVAL
+_running = threading.Lock()
+
+
+def schedule_due_jobs():
+    """before_request hook: at most every CHECK_INTERVAL, start due jobs in a background thread"""
+    global _next_check
+    now = time.time()
+    if now < _next_check or _running.locked():
+        return
+    _next_check = now + CHECK_INTERVAL
+    jobs = claim_due_jobs(now)
+    if jobs:
+        threading.Thread(target=_run_claimed, args=(jobs,), name='moodly-maintenance', daemon=True).start()
+
+
+def _run_claimed(jobs):
+    with _running:
+        for name in jobs:
+            try:
+                run_job(name)
+            except Exception:
+                pass  # logged by run_job; the other jobs still run
+
+
+def _after_fork():
+    global _next_check, _running
+    _next_check = time.time() + CHECK_INTERVAL
+    _running = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+metrics.add_collector(collect_database_stats)
+
+
+def init_maintenance(app):
+    """Let requests start due maintenance jobs, when MAINTENANCE_ENABLED"""
+    if ENABLED and moodly_db.DATABASE_TYPE == 'sqlite':
+        app.before_request(schedule_due_jobs)
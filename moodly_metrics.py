@@ -0,0 +1,302 @@
+"""
+Request Metrics for Moodly App
+Per-route latency, per-request SQL cost and OpenAI call stats in Prometheus text format
+"""
+import os
+import hmac
+import time
+import sqlite3
+import weakref
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+AI_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+# Scrapers send it as "Authorization: Bearer <token>"; without one, only loopback clients may scrape
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+LOOPBACK = ('127.0.0.1', '::1')
+
+HELP = {
+    'moodly_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status'),
+    'moodly_http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'moodly_db_queries_per_request': ('histogram', 'SQL statements executed per request'),
+    'moodly_db_time_per_request_seconds': ('histogram', 'Time spent in SQL per request'),
+    'moodly_db_queries_total': ('counter', 'SQL statements executed, by endpoint'),
+    'moodly_openai_request_duration_seconds': ('histogram', 'OpenAI call latency by outcome'),
+    'moodly_ai_insights_total': ('counter', 'AI insights served, by source (openai, fallback, cache)'),
+    'moodly_response_cache_total': ('counter', 'Cached page lookups by result (hit, miss, not_modified, evicted)'),
+    'moodly_fragment_cache_total': ('counter', 'Template fragment cache lookups by result (hit, miss, evicted)'),
+    'moodly_db_read_routing_total': ('counter', 'Read-only connections by target (replica, primary) and reason'),
+    'moodly_db_size_bytes': ('gauge', 'SQLite database file size, by database'),
+    'moodly_db_free_ratio': ('gauge', 'Share of the database file on the freelist (reclaimable by vacuum), by database'),
+    'moodly_maintenance_runs_total': ('counter', 'Maintenance job runs by job (backup, compact, archive) and outcome'),
+    'moodly_maintenance_last_success_timestamp_seconds': ('gauge', 'When each maintenance job last succeeded'),
+    'moodly_archived_rows_total': ('counter', 'Rows moved to cold storage by the retention job, by table'),
+    'moodly_snapshot_shipped_bytes_total': ('counter', 'Compressed snapshot bytes shipped to the store, by kind (base, delta)'),
+    'moodly_snapshot_restore_seconds': ('histogram', 'Time to restore a database from its snapshot on cold start'),
+    'moodly_ai_prompt_tokens': ('histogram', 'Tokens per AI prompt, by part (total, history; reported by the API)'),
+    'moodly_prompt_history_total': ('counter', 'Prompt history lookups by result (hit, update, miss)'),
+}
+
+
+class _ShardOwner:
+    """Held only by its thread's local storage, so it is freed when the thread exits"""
+
+
+def _merge(counters, histograms, shard):
+    for key, value in list(shard['counters'].items()):
+        counters[key] = counters.get(key, 0) + value
+    for key, state in list(shard['histograms'].items()):
+        total = histograms.get(key)
+        if total is None:
+            histograms[key] = list(state)
+        else:
+            for i, value in enumerate(state):
+                total[i] += value
+
+
+class MetricsRegistry:
+    """Counters and histograms sharded per thread.
+
+    Each thread only ever writes to its own shard, so the hot path takes no locks;
+    a scrape sums all shards. The lock only guards shard registration and retirement:
+    when a thread exits, its shard is folded into one retired total, so threads that
+    come and go (ASGI executors, waitress) do not grow the list a scrape walks.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {'counters': {}, 'histograms': {}}
+        self._shards_lock = threading.Lock()
+        self._collectors = []
+
+    def add_collector(self, collect):
+        """Register a callable returning (name, labels, value) gauges, read at every scrape"""
+        self._collectors.append(collect)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {'counters': {}, 'histograms': {}}
+            with self._shards_lock:
+                self._shards.append(shard)
+            owner = self._local.owner = _ShardOwner()
+            weakref.finalize(owner, self._retire, self._shards, shard).atexit = False
+            self._local.shard = shard
+        return shard
+
+    def _retire(self, shards, shard):
+        # Runs once the owning thread is gone, so nothing writes to the shard any more
+        with self._shards_lock:
+            if shards is not self._shards:
+                return  # registered before a fork; the child starts from zero
+            for index, registered in enumerate(shards):
+                if registered is shard:
+                    del shards[index]
+                    _merge(self._retired['counters'], self._retired['histograms'], shard)
+                    break
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard()['counters']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        histograms = self._shard()['histograms']
+        key = (name, labels, buckets)
+        state = histograms.get(key)
+        if state is None:
+            # one slot per bucket, one for +Inf, then sum and count
+            state = histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+        state[bisect_left(buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def collect(self):
+        """Aggregate all shards into (counters, histograms)"""
+        counters = {}
+        histograms = {}
+        with self._shards_lock:
+            # Copied together, so a shard retiring meanwhile is counted exactly once
+            shards = list(self._shards)
+            _merge(counters, histograms, self._retired)
+        for shard in shards:
+            _merge(counters, histograms, shard)
+        return counters, histograms
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        counters, histograms = self.collect()
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels, buckets), state in histograms.items():
+            lines = by_name.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), state[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(state[-2])}")
+            lines.append(f"{name}_count{_labels(labels)} {state[-1]}")
+        for collect in self._collectors:
+            try:
+                gauges = list(collect())
+            except Exception:
+                # A gauge that cannot be read now must not take the rest of the scrape down
+                continue
+            for name, labels, value in gauges:
+                by_name.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+
+        output = []
+        for name in sorted(by_name):
+            kind, description = HELP.get(name, ('untyped', name))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(by_name[name])
+        return '\n'.join(output) + '\n'
+
+    def reset(self):
+        with self._shards_lock:
+            for shard in self._shards + [self._retired]:
+                shard['counters'].clear()
+                shard['histograms'].clear()
+
+    def _after_fork(self):
+        # A forked worker (gunicorn --preload) starts from zero: it must not report the
+        # master's counts as its own, and the lock may have been held by a thread that is gone
+        # (the lock and list first: dropping the old thread-locals retires their shards)
+        self._shards_lock = threading.Lock()
+        self._shards = []
+        self._retired = {'counters': {}, 'histograms': {}}
+        self._local = threading.local()
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+metrics = MetricsRegistry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=metrics._after_fork)
+
+# Per-request SQL accounting; set by the request hooks, read by the instrumented cursor
+_request_state = threading.local()
+
+# Callables (sql, parameters, elapsed, connection) that want every statement, e.g. moodly_querylog
+query_observers = []
+
+
+def _record_query(cursor, sql, parameters, elapsed):
+    stats = getattr(_request_state, 'db', None)
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+    for observer in query_observers:
+        observer(sql, parameters, elapsed, cursor.connection)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """sqlite3 cursor that counts statements and time for the current request"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(self, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(self, sql, None, time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are instrumented; pass as `factory=` to sqlite3.connect"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect with statement accounting"""
+    return sqlite3.connect(database, factory=InstrumentedConnection, **kwargs)
+
+
+def record_ai_call(outcome, elapsed=None):
+    """Record an AI insight: outcome is 'openai', 'fallback' or 'cache'"""
+    metrics.inc('moodly_ai_insights_total', (('source', outcome),))
+    if elapsed is not None:
+        metrics.observe('moodly_openai_request_duration_seconds', (('outcome', 'ok' if outcome == 'openai' else 'error'),),
+                        elapsed, AI_LATENCY_BUCKETS)
+
+
+def init_metrics(app, path='/metrics'):
+    """Install request timing hooks and the Prometheus scrape endpoint on a Flask app.
+
+    The endpoint wants METRICS_TOKEN as a bearer token when it is set, and otherwise only
+    answers clients on the same host (a local agent or sidecar); anyone else gets a 404.
+    """
+    from flask import Response, abort, request
+
+    @app.before_request
+    def start_request_metrics():
+        _request_state.start = time.perf_counter()
+        _request_state.db = [0, 0.0]
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = getattr(_request_state, 'start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        queries, db_time = _request_state.db
+        _request_state.start = None
+        _request_state.db = None
+
+        endpoint = request.endpoint or 'unmatched'
+        route = (('endpoint', endpoint),)
+        metrics.inc('moodly_http_requests_total', route + (('method', request.method), ('status', response.status_code)))
+        metrics.observe('moodly_http_request_duration_seconds', route, elapsed, LATENCY_BUCKETS)
+        metrics.observe('moodly_db_queries_per_request', route, queries, QUERY_COUNT_BUCKETS)
+        metrics.observe('moodly_db_time_per_request_seconds', route, db_time, LATENCY_BUCKETS)
+        if queries:
+            metrics.inc('moodly_db_queries_total', route, queries)
+        return response
+
+    def metrics_endpoint():
+        if METRICS_TOKEN:
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+                abort(401)
+        elif request.remote_addr not in LOOPBACK:
+            abort(404)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule(path, 'metrics', metrics_endpoint)
+    return app
@@ -0,0 +1,324 @@
+"""
+Prompt Context for Moodly App
+Token-budgeted AI prompts that carry a compact summary of the user's recent entries
+
+An insight on one entry reads better next to how the last two weeks went, but pasting the
+history in would multiply prompt tokens (and latency) with every entry logged. Instead each
+prompt gets a few lines of statistics (averages, the mood trend, what the notes' sentiment
+and emotions lean to) and the most notable notes, shortened, added only while they fit in
+PROMPT_TOKEN_BUDGET with the rest of the prompt.
+
+Each process keeps every active user's recent entries: a call reads only the rows logged
+since the last one (usually none or one) through the (user_id, local_date) index, and the
+summary is rebuilt only when those rows changed. Tokens are counted with tiktoken when it is
+installed and its encoding is available, else estimated offline, erring high.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict, deque, namedtuple
+from datetime import date, datetime, timedelta
+
+import moodly_db
+from moodly_metrics import metrics
+
+try:
+    import tiktoken
+except ImportError:  # count_tokens() estimates instead
+    tiktoken = None
+
+logger = logging.getLogger('moodly')
+
+# Most tokens a prompt (system and user messages together) may take
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 600))
+# Most tokens of the current entry's own notes sent
+ENTRY_NOTE_TOKENS = int(os.environ.get('PROMPT_ENTRY_NOTE_TOKENS', 150))
+# How far back the history goes, and how many of its entries are kept per user
+HISTORY_DAYS = int(os.environ.get('PROMPT_HISTORY_DAYS', 14))
+HISTORY_LIMIT = int(os.environ.get('PROMPT_HISTORY_LIMIT', 100))
+# Notes quoted from the history at most, and tokens each is shortened to
+NOTABLE_NOTES = int(os.environ.get('PROMPT_NOTABLE_NOTES', 5))
+NOTE_TOKENS = int(os.environ.get('PROMPT_NOTE_TOKENS', 40))
+# Users whose history is kept, and for how long before it is read again in full
+HISTORY_CACHE_USERS = int(os.environ.get('PROMPT_HISTORY_CACHE_USERS', 5000))
+HISTORY_CACHE_SECONDS = int(os.environ.get('PROMPT_HISTORY_CACHE_SECONDS', 3600))
+TOKENIZER = os.environ.get('PROMPT_TOKENIZER', 'cl100k_base')
+
+# Chat formatting tokens around each message
+MESSAGE_TOKENS = 4
+PROMPT_TOKEN_BUCKETS = (50, 100, 200, 300, 400, 500, 600, 800, 1200, 1600, 2400, 3200)
+
+# A change in average mood smaller than this per week reads as steady
+STEADY_TREND = 0.25
+
+# Rows after the cached ones in the window, newest first; the window goes by the user's
+# local_date so the (user_id, local_date) index bounds the scan
+HISTORY_QUERY = '''
+    SELECT id, local_date, mood_score, energy_level, anxiety_level, sleep_quality, text_sentiment,
+           text_emotion, COALESCE(NULLIF(notes, ''), entry_text)
+    FROM mood_entries
+    WHERE user_id = ? AND local_date >= ? AND id > ?
+    ORDER BY id DESC LIMIT ?
+'''
+
+CONTEXT_HEADING = 'For context, their recent history (do not repeat it back):'
+NOTES_HEADING = 'Notable recent notes:'
+
+Entry = namedtuple('Entry', 'id day mood energy anxiety sleep sentiment emotion note')
+
+_WORD_PIECES = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding(TOKENIZER)
+            except Exception as e:  # the encoding is downloaded on first use
+                logger.info("Tokenizer %s unavailable, estimating prompt tokens: %s", TOKENIZER, e)
+    return _encoding
+
+
+def count_tokens(text):
+    """Tokens in `text`: exact with tiktoken, else about one per 6 letters of a word, digit group or symbol"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(1 + (len(piece) - 1) // 6 for piece in _WORD_PIECES.findall(text))
+
+
+CONTEXT_HEADING_TOKENS = count_tokens(CONTEXT_HEADING) + 2
+NOTES_HEADING_TOKENS = count_tokens(NOTES_HEADING) + 1
+
+
+def truncate(text, tokens):
+    """`text` cut at a word boundary to at most `tokens` tokens, marked with an ellipsis when cut"""
+    if not text or count_tokens(text) <= tokens:
+        return text or ''
+    words = text.split()
+    low, high = 0, len(words)
+    # Longest prefix of words that fits with the ellipsis
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(' '.join(words[:middle]) + '…') <= tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return ' '.join(words[:low]) + '…' if low else ''
+
+
+def _describe_sentiment(sentiment):
+    if sentiment >= 0.3:
+        return 'positive'
+    if sentiment >= 0.05:
+        return 'slightly positive'
+    if sentiment <= -0.3:
+        return 'negative'
+    if sentiment <= -0.05:
+        return 'slightly negative'
+    return 'neutral'
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+class History:
+    """A user's entries of the last HISTORY_DAYS, updated incrementally, and the summary of them"""
+
+    def __init__(self):
+        self.entries = deque()
+        self.last_id = 0
+        self.loaded = False
+        self.loaded_at = time.monotonic()
+        self._summary = None
+
+    def query_args(self, user_id, today=None):
+        """Parameters of HISTORY_QUERY for the rows this history is missing"""
+        return (user_id, self.window_start(today), self.last_id, HISTORY_LIMIT)
+
+    @staticmethod
+    def window_start(today=None):
+        return ((today or datetime.utcnow().date()) - timedelta(days=HISTORY_DAYS)).isoformat()
+
+    def update(self, rows, today=None):
+        """Add rows read with HISTORY_QUERY and drop entries that left the window; returns whether anything changed"""
+        changed = False
+        self.loaded = True
+        for row in sorted(rows, key=lambda row: row[0]):
+            if row[0] <= self.last_id:
+                continue
+            note = truncate(' '.join(row[8].split()), NOTE_TOKENS) if row[8] else ''
+            self.entries.append(Entry(*row[:8], note))
+            self.last_id = row[0]
+            changed = True
+        start = self.window_start(today)
+        while self.entries and (len(self.entries) > HISTORY_LIMIT or str(self.entries[0].day) < start):
+            self.entries.popleft()
+            changed = True
+        if changed:
+            self._summary = None
+        return changed
+
+    def summary(self):
+        """(overview, its tokens, notable notes as (id, line, tokens) most notable first), rebuilt only after a change"""
+        if self._summary is None:
+            self._summary = self._summarize()
+        return self._summary
+
+    def _summarize(self):
+        entries = list(self.entries)
+        if not entries:
+            return '', 0, ()
+        days = [date.fromisoformat(str(entry.day)[:10]).toordinal() for entry in entries]
+        moods = [entry.mood for entry in entries]
+        average_mood = _mean(moods)
+        parts = [f"Their last {HISTORY_DAYS} days ({len(entries)} entries): mood {average_mood:.1f}/10 on average"]
+        if len(entries) >= 3 and days[-1] > days[0]:
+            mean_day = sum(days) / len(days)
+            spread = sum((day - mean_day) ** 2 for day in days)
+            slope = sum((day - mean_day) * (mood - average_mood) for day, mood in zip(days, moods)) / spread * 7
+            if abs(slope) < STEADY_TREND:
+                parts[0] += ", steady"
+            else:
+                parts[0] += f", {'rising' if slope > 0 else 'falling'} about {abs(slope):.1f} a week"
+        levels = [f"{label} {value:.1f}" for label, value in
+                  (('energy', _mean(entry.energy for entry in entries)),
+                   ('anxiety', _mean(entry.anxiety for entry in entries)),
+                   ('sleep', _mean(entry.sleep for entry in entries))) if value is not None]
+        if levels:
+            parts.append(', '.join(levels))
+        sentiment = _mean(entry.sentiment for entry in entries)
+        if sentiment is not None:
+            emotions = {}
+            for entry in entries:
+                if entry.emotion and entry.emotion != 'neutral':
+                    emotions[entry.emotion] = emotions.get(entry.emotion, 0) + 1
+            leaning = sorted(emotions, key=lambda emotion: -emotions[emotion])[:2]
+            parts.append(f"their notes read {_describe_sentiment(sentiment)}"
+                         + (f", mostly {' and '.join(leaning)}" if leaning else ''))
+        overview = '; '.join(parts) + '.'
+
+        # Notable: far from their usual mood or strongly worded, the more recent the better
+        ranked = sorted((-(abs(entry.mood - average_mood) / 3 + abs(entry.sentiment or 0)
+                           - (days[-1] - day) / (HISTORY_DAYS * 4)), index)
+                        for index, (entry, day) in enumerate(zip(entries, days)) if entry.note)
+        ranked = [entries[index] for _, index in ranked]
+        notable, quoted = [], set()
+        for entry in ranked:
+            if len(notable) == NOTABLE_NOTES:
+                break
+            if entry.note in quoted:
+                continue
+            quoted.add(entry.note)
+            line = f'- {str(entry.day)[:10]}, mood {entry.mood}: "{entry.note}"'
+            notable.append((entry.id, line, count_tokens(line)))
+        return overview, count_tokens(overview), tuple(notable)
+
+    def context(self, tokens):
+        """The summary as prompt text of at most `tokens` tokens ('' when even the overview does not fit)"""
+        overview, overview_tokens, notable = self.summary()
+        if not overview or overview_tokens > tokens:
+            return ''
+        tokens -= overview_tokens + NOTES_HEADING_TOKENS
+        quoted = []
+        for entry_id, line, line_tokens in notable:
+            if line_tokens <= tokens:
+                quoted.append((entry_id, line))
+                tokens -= line_tokens
+        lines = [overview]
+        if quoted:
+            lines.append(NOTES_HEADING)
+            lines.extend(line for _, line in sorted(quoted))
+        return '\n'.join(lines)
+
+
+_histories = OrderedDict()
+_lock = threading.Lock()
+
+
+def history_for(user_id):
+    """The cached History of a user, a new empty one if missing or older than HISTORY_CACHE_SECONDS"""
+    with _lock:
+        history = _histories.get(user_id)
+        if history is not None and time.monotonic() - history.loaded_at < HISTORY_CACHE_SECONDS:
+            _histories.move_to_end(user_id)
+            return history
+        history = _histories[user_id] = History()
+        while len(_histories) > HISTORY_CACHE_USERS:
+            _histories.popitem(last=False)
+        return history
+
+
+def update_history(history, rows):
+    """History.update for rows read with HISTORY_QUERY, recording how much the cache saved"""
+    new = not history.loaded
+    with _lock:
+        changed = history.update(rows)
+    metrics.inc('moodly_prompt_history_total', (('result', 'miss' if new else 'update' if changed else 'hit'),))
+    return history
+
+
+def recent_history(user_id, conn=None):
+    """The user's History, brought up to date with the entries they logged since the last call"""
+    history = history_for(user_id)
+    own = conn is None
+    if own:
+        conn = moodly_db.connect(user_id=user_id)
+    try:
+        rows = conn.execute(HISTORY_QUERY, history.query_args(user_id)).fetchall()
+    finally:
+        if own:
+            conn.close()
+    return update_history(history, rows)
+
+
+def build_messages(system, prompt, history=None, budget=None):
+    """Chat messages for `prompt`, with as much of `history` as fits in `budget` tokens (PROMPT_TOKEN_BUDGET)"""
+    budget = budget or PROMPT_TOKEN_BUDGET
+    base_tokens = count_tokens(system) + count_tokens(prompt) + 2 * MESSAGE_TOKENS
+    tokens, history_tokens = base_tokens, 0
+    allowance = budget - base_tokens - CONTEXT_HEADING_TOKENS
+    while history is not None and allowance > 0:
+        context = history.context(allowance)
+        if not context:
+            break
+        with_context = f"{prompt}\n\n{CONTEXT_HEADING}\n{context}"
+        total = count_tokens(system) + count_tokens(with_context) + 2 * MESSAGE_TOKENS
+        if total <= budget:
+            prompt, tokens, history_tokens = with_context, total, total - base_tokens
+            break
+        # Pieces counted apart can take a token or two more joined up
+        allowance -= total - budget
+    metrics.observe('moodly_ai_prompt_tokens', (('part', 'total'),), tokens, PROMPT_TOKEN_BUCKETS)
+    metrics.observe('moodly_ai_prompt_tokens', (('part', 'history'),), history_tokens, PROMPT_TOKEN_BUCKETS)
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def record_usage(response):
+    """Record the prompt tokens the API reports it billed, next to the estimates of build_messages"""
+    usage = getattr(response, 'usage', None)
+    if usage is not None and getattr(usage, 'prompt_tokens', None):
+        metrics.observe('moodly_ai_prompt_tokens', (('part', 'reported'),), usage.prompt_tokens, PROMPT_TOKEN_BUCKETS)
+
+
+def _after_fork():
+    global _lock
+    _lock = threading.Lock()
+    _histories.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,146 @@
+"""
+Query Log for Moodly App
+Records every SQL statement per request, flags N+1 patterns and explains slow queries
+"""
+import os
+import re
+import sqlite3
+import logging
+import threading
+
+from moodly_metrics import query_observers
+
+logger = logging.getLogger('moodly')
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '3'))
+
+_WHITESPACE = re.compile(r'\s+')
+_state = threading.local()
+_listeners = []
+_enabled = os.environ.get('QUERY_LOG', 'false').lower() == 'true'
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so the same statement written on several lines groups together"""
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryLog:
+    """Statements executed while handling one request"""
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    @property
+    def total_time(self):
+        return sum(elapsed for _, _, elapsed in self.statements)
+
+    def add(self, sql, parameters, elapsed):
+        self.statements.append((normalize_sql(sql), parameters, elapsed))
+
+    def n_plus_one(self, threshold=None):
+        """Statements run `threshold` or more times, as [(sql, count, distinct_params)].
+
+        The same SQL with different parameters is the classic N+1 loop; the same SQL
+        with the same parameters is a duplicate that should have been reused.
+        """
+        threshold = threshold or N_PLUS_ONE_THRESHOLD
+        groups = {}
+        for sql, parameters, _ in self.statements:
+            groups.setdefault(sql, []).append(repr(parameters))
+        return [(sql, len(params), len(set(params)))
+                for sql, params in groups.items() if len(params) >= threshold]
+
+    def summary(self):
+        return {
+            'endpoint': self.endpoint,
+            'queries': len(self.statements),
+            'db_ms': round(self.total_time * 1000, 2),
+            'n_plus_one': [{'sql': sql, 'count': count, 'distinct_params': distinct}
+                           for sql, count, distinct in self.n_plus_one()],
+        }
+
+
+def enable(flag=True):
+    """Turn statement recording on or off process-wide (the pytest plugin turns it on)"""
+    global _enabled
+    _enabled = flag
+
+
+def add_listener(callback):
+    """Call `callback(query_log)` when each request finishes"""
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def start(endpoint=None):
+    _state.log = QueryLog(endpoint)
+    return _state.log
+
+
+def finish():
+    log = getattr(_state, 'log', None)
+    _state.log = None
+    return log
+
+
+def explain(connection, sql, parameters=()):
+    """EXPLAIN QUERY PLAN rows for a SELECT, run on the plain sqlite3 API so it is not itself recorded"""
+    if not normalize_sql(sql).upper().startswith(('SELECT', 'WITH')):
+        return []
+    try:
+        cursor = sqlite3.Connection.cursor(connection)
+        sqlite3.Cursor.execute(cursor, 'EXPLAIN QUERY PLAN ' + sql, parameters or ())
+        return [row[-1] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f'explain failed: {e}']
+
+
+def _observe(sql, parameters, elapsed, connection):
+    log = getattr(_state, 'log', None)
+    if log is None:
+        return
+    log.add(sql, parameters, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms) on %s: %s", elapsed * 1000, log.endpoint, normalize_sql(sql),
+                       extra={'plan': explain(connection, sql, parameters)})
+
+
+query_observers.append(_observe)
+
+
+def init_query_log(app):
+    """Record statements per request when app.debug, QUERY_LOG=true or enable() is set.
+
+    Warns about N+1 patterns and adds an X-Query-Count header so they show up in dev tools.
+    """
+    from flask import request
+
+    @app.before_request
+    def start_query_log():
+        if _enabled or app.debug:
+            start(request.endpoint)
+
+    @app.after_request
+    def finish_query_log(response):
+        log = finish()
+        if log is None:
+            return response
+        response.headers['X-Query-Count'] = str(len(log))
+        for sql, count, distinct in log.n_plus_one():
+            logger.warning("Possible N+1 on %s: %d executions (%d distinct params) of %s",
+                           log.endpoint, count, distinct, sql)
+        for callback in list(_listeners):
+            callback(log)
+        return response
+
+    return app
@@ -0,0 +1,217 @@
+"""
+Read Replicas for Moodly App
+Routes read-only connections to replica databases that are healthy and current, and a user's reads to the primary right after they write
+
+Replicas are listed in DATABASE_REPLICA_URLS (comma separated): SQLite file paths (sqlite:///path
+also works) kept in sync with the SQLite primary by something like Litestream or LiteFS. Every
+query the apps run goes to SQLite, even on Render where init_db also sets up PostgreSQL, so
+postgres:// replicas are ignored.
+
+Health and lag are checked lazily by whichever request finds the last check older than
+CHECK_INTERVAL. SQLite has no notion of replication lag, so each check stamps a heartbeat row
+on the primary: a replica holding the previous stamp is current, and one that does not is
+counted as old as the stamp it holds.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from itertools import count
+from urllib.parse import quote
+
+from flask import g, has_app_context, has_request_context, session
+
+from moodly_metrics import connect as db_connect, metrics, query_observers
+
+logger = logging.getLogger('moodly')
+
+# A replica further behind the primary than this many seconds serves no reads
+MAX_LAG = float(os.environ.get('DATABASE_REPLICA_MAX_LAG', 5))
+CHECK_INTERVAL = float(os.environ.get('DATABASE_REPLICA_CHECK_INTERVAL', 5))
+# Never shorter than the staleness a replica may have and still be used, so once the pin
+# expires every replica in use already has the user's write
+PIN_SECONDS = max(float(os.environ.get('DATABASE_PIN_SECONDS', 15)), MAX_LAG + CHECK_INTERVAL)
+CONNECT_TIMEOUT = 2
+
+PIN_KEY = 'db_primary_until'
+WRITE_VERBS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+HEARTBEAT_TABLE = '''
+    CREATE TABLE IF NOT EXISTS replication_heartbeat (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        beat REAL NOT NULL
+    )
+'''
+
+
+def sqlite_path(url):
+    return url[len('sqlite:///'):] if url.startswith('sqlite:///') else url
+
+
+def sqlite_read_only(path, factory=sqlite3.connect):
+    """Open a SQLite file read-only; fails instead of creating it when it is missing"""
+    return factory(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True, timeout=CONNECT_TIMEOUT)
+
+
+class Replica:
+    """One replica and what the last health check found"""
+
+    def __init__(self, url):
+        self.url = url
+        self.healthy = False
+        self.lag = None
+        self.error = 'not checked yet'
+
+    @property
+    def name(self):
+        """Where the replica is (for logs and metrics)"""
+        return sqlite_path(self.url)
+
+    def usable(self, max_lag):
+        return self.healthy and self.lag is not None and self.lag <= max_lag
+
+    def connect(self):
+        """A read-only connection whose queries are counted in the request metrics"""
+        return sqlite_read_only(sqlite_path(self.url), factory=db_connect)
+
+    def measure_lag(self, primary_beat):
+        """Seconds behind the primary, or None when that cannot be told yet"""
+        conn = sqlite_read_only(sqlite_path(self.url))
+        try:
+            row = conn.execute('SELECT beat FROM replication_heartbeat WHERE id = 1').fetchone()
+        finally:
+            conn.close()
+        if row is None or primary_beat is None:
+            return None
+        return 0.0 if row[0] >= primary_beat else time.time() - row[0]
+
+    def update(self, healthy, lag=None, error=None):
+        self.healthy, self.lag, self.error = healthy, lag, error
+
+    def status(self):
+        return {'replica': self.name, 'healthy': self.healthy, 'lag': self.lag, 'error': self.error}
+
+
+class ReplicaRouter:
+    """Picks the database for each read-only connection: a current replica, else the primary"""
+
+    def __init__(self, primary, replicas, max_lag=MAX_LAG, check_interval=CHECK_INTERVAL):
+        self.primary = primary
+        self.replicas = []
+        for url in replicas:
+            if url.startswith(('postgres://', 'postgresql://')):
+                logger.warning("Ignoring PostgreSQL read replica %s: the apps only read from SQLite",
+                               url.split('@')[-1])
+            else:
+                self.replicas.append(Replica(url))
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = count()
+        self._lock = threading.Lock()
+        self._checked_at = None
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    def check(self, force=False):
+        """Refresh every replica's health and lag if the last check is older than check_interval.
+
+        One thread checks while the others route on the previous results, so a slow or
+        unreachable replica never holds up more than the request that happens to check.
+        """
+        if not force and self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            primary_beat = self._heartbeat()
+            for replica in self.replicas:
+                was_usable = replica.usable(self.max_lag)
+                try:
+                    lag = replica.measure_lag(primary_beat)
+                except Exception as e:
+                    replica.update(False, error=str(e))
+                else:
+                    if lag is None:
+                        replica.update(True, error='lag unknown until the heartbeat replicates')
+                    elif lag > self.max_lag:
+                        replica.update(True, lag, error=f'{lag:.1f}s behind the primary')
+                    else:
+                        replica.update(True, lag)
+                if was_usable and not replica.usable(self.max_lag):
+                    logger.warning("Read replica %s taken out of rotation: %s", replica.name, replica.error)
+                elif replica.usable(self.max_lag) and not was_usable:
+                    logger.info("Read replica %s in rotation (%.1fs behind)", replica.name, replica.lag)
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def _heartbeat(self):
+        """Stamp the SQLite primary's heartbeat row; returns the stamp replicas are compared with"""
+        # Uninstrumented: the check is not part of the request that happens to run it
+        conn = sqlite3.connect(self.primary, timeout=CONNECT_TIMEOUT)
+        try:
+            conn.execute(HEARTBEAT_TABLE)
+            row = conn.execute('SELECT beat FROM replication_heartbeat WHERE id = 1').fetchone()
+            conn.execute('INSERT OR REPLACE INTO replication_heartbeat (id, beat) VALUES (1, ?)', (time.time(),))
+            conn.commit()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning("Replication heartbeat on the primary failed: %s", e)
+            return None
+        finally:
+            conn.close()
+
+    def connect_read(self):
+        """A replica connection for a read-only query, or None when the primary should serve it"""
+        if reads_pinned():
+            metrics.inc('moodly_db_read_routing_total', (('target', 'primary'), ('reason', 'pinned')))
+            return None
+        self.check()
+        usable = [replica for replica in self.replicas if replica.usable(self.max_lag)]
+        start = next(self._next)
+        for i in range(len(usable)):
+            replica = usable[(start + i) % len(usable)]
+            try:
+                conn = replica.connect()
+            except Exception as e:
+                replica.update(False, error=str(e))
+                continue
+            metrics.inc('moodly_db_read_routing_total', (('target', 'replica'), ('reason', 'current')))
+            return conn
+        metrics.inc('moodly_db_read_routing_total', (('target', 'primary'), ('reason', 'no_replica')))
+        return None
+
+    def status(self):
+        return [replica.status() for replica in self.replicas]
+
+    def after_fork(self):
+        # The lock may have been held by a thread that did not survive the fork
+        self._lock = threading.Lock()
+
+
+def reads_pinned():
+    """True while the current session's reads must go to the primary to see its own writes"""
+    return has_request_context() and session.get(PIN_KEY, 0) > time.time()
+
+
+def _watch_writes(sql, parameters, elapsed, connection):
+    if has_app_context() and sql.lstrip()[:7].upper().startswith(WRITE_VERBS):
+        g.db_wrote = True
+
+
+def init_read_your_writes(app):
+    """Pin a user's reads to the primary for PIN_SECONDS after any request of theirs writes.
+
+    The pin lives in the session cookie, so it holds whichever worker serves the next request.
+    """
+    if _watch_writes not in query_observers:
+        query_observers.append(_watch_writes)
+
+    @app.after_request
+    def pin_reads_after_write(response):
+        if g.get('db_wrote') and 'user_id' in session:
+            session[PIN_KEY] = time.time() + PIN_SECONDS
+        return response
@@ -0,0 +1,377 @@
+"""
+Text Sentiment for Moodly App
+Offline lexicon scoring of mood notes and journal text, stored with each entry
+
+Every mood entry (notes or entry_text) and journal entry (title and content) gets, at write
+time, text_sentiment, from -1 (negative) to 1 (positive), and text_emotion, the emotion its
+words lean to most ('neutral' when none does). No network and no model files: a lexicon in
+the spirit of VADER, tuned to the words people use about their day, with negation ("not
+happy"), intensifiers ("really tired") and "but" shifting weight to what follows.
+
+Entries without text get a NULL sentiment, so AVG() and correlations skip them; a NULL
+emotion marks rows written before scoring existed, which backfill() scores in batches.
+score_batch() runs the same rules over a whole batch with NumPy when it is installed
+(15-25% faster on journal-length text; see scripts/bench_sentiment.py), else one text at a
+time. NumPy is imported on the first batch, not with the app, so a cold start that never
+backfills does not pay for it.
+"""
+import re
+import math
+import logging
+
+logger = logging.getLogger('moodly')
+
+EMOTIONS = ('joy', 'gratitude', 'calm', 'sadness', 'anxiety', 'anger', 'fatigue')
+NO_EMOTION = 'neutral'
+
+# word -> (valence from -4 to 4, emotion or None)
+LEXICON = {
+    # joy
+    'happy': (2.7, 'joy'), 'happier': (2.7, 'joy'), 'happiest': (3.0, 'joy'), 'happiness': (2.6, 'joy'),
+    'joy': (2.8, 'joy'), 'joyful': (2.9, 'joy'), 'glad': (2.0, 'joy'), 'cheerful': (2.5, 'joy'),
+    'excited': (2.3, 'joy'), 'exciting': (2.2, 'joy'), 'fun': (2.3, 'joy'), 'great': (3.1, 'joy'),
+    'good': (1.9, 'joy'), 'better': (1.9, 'joy'), 'best': (3.2, 'joy'), 'amazing': (2.8, 'joy'),
+    'awesome': (3.1, 'joy'), 'wonderful': (2.7, 'joy'), 'fantastic': (2.6, 'joy'), 'love': (3.2, 'joy'),
+    'loved': (2.9, 'joy'), 'loving': (2.9, 'joy'), 'enjoy': (2.2, 'joy'), 'enjoyed': (2.3, 'joy'),
+    'proud': (2.1, 'joy'), 'smile': (1.5, 'joy'), 'smiled': (1.5, 'joy'), 'laugh': (2.6, 'joy'),
+    'laughed': (2.0, 'joy'), 'productive': (1.8, 'joy'), 'accomplished': (1.8, 'joy'), 'hopeful': (2.2, 'joy'),
+    'motivated': (1.9, 'joy'), 'energized': (2.0, 'joy'), 'confident': (2.2, 'joy'), 'nice': (1.8, 'joy'),
+    'celebrate': (2.7, 'joy'), 'celebrated': (2.7, 'joy'), 'win': (2.8, 'joy'), 'success': (2.7, 'joy'),
+    'lovely': (2.8, 'joy'), 'finished': (1.3, 'joy'),
+    # gratitude
+    'grateful': (2.0, 'gratitude'), 'thankful': (2.0, 'gratitude'), 'thanks': (1.9, 'gratitude'),
+    'appreciate': (1.7, 'gratitude'), 'appreciated': (2.3, 'gratitude'), 'blessed': (2.9, 'gratitude'),
+    'lucky': (1.8, 'gratitude'), 'gratitude': (2.2, 'gratitude'), 'support': (1.7, 'gratitude'),
+    'supported': (1.9, 'gratitude'), 'kind': (2.4, 'gratitude'), 'helped': (1.6, 'gratitude'),
+    # calm
+    'calm': (1.3, 'calm'), 'calmer': (1.4, 'calm'), 'relaxed': (2.2, 'calm'), 'relaxing': (2.1, 'calm'),
+    'peaceful': (2.2, 'calm'), 'peace': (2.5, 'calm'), 'rested': (1.6, 'calm'), 'content': (1.6, 'calm'),
+    'balanced': (1.4, 'calm'), 'relief': (2.1, 'calm'), 'relieved': (1.9, 'calm'), 'safe': (1.9, 'calm'),
+    'comfortable': (1.8, 'calm'), 'mindful': (1.2, 'calm'), 'okay': (0.9, 'calm'), 'ok': (0.9, 'calm'),
+    'fine': (0.8, 'calm'), 'steady': (1.0, 'calm'), 'lighter': (1.3, 'calm'), 'quiet': (0.6, 'calm'),
+    # sadness
+    'sad': (-2.1, 'sadness'), 'sadder': (-2.4, 'sadness'), 'sadness': (-1.9, 'sadness'),
+    'unhappy': (-1.8, 'sadness'), 'depressed': (-2.3, 'sadness'), 'depressing': (-1.6, 'sadness'),
+    'down': (-1.2, 'sadness'), 'low': (-1.1, 'sadness'), 'lonely': (-1.5, 'sadness'), 'alone': (-1.0, 'sadness'),
+    'cry': (-2.1, 'sadness'), 'cried': (-1.6, 'sadness'), 'crying': (-2.1, 'sadness'), 'tears': (-0.9, 'sadness'),
+    'miss': (-0.6, 'sadness'), 'missed': (-1.2, 'sadness'), 'lost': (-1.3, 'sadness'), 'grief': (-2.2, 'sadness'),
+    'hopeless': (-2.0, 'sadness'), 'empty': (-0.8, 'sadness'), 'hurt': (-2.4, 'sadness'), 'disappointed': (-1.9, 'sadness'),
+    'bad': (-2.5, 'sadness'), 'worse': (-2.1, 'sadness'), 'worst': (-3.1, 'sadness'), 'awful': (-2.0, 'sadness'),
+    'terrible': (-2.1, 'sadness'), 'horrible': (-2.5, 'sadness'), 'miserable': (-2.2, 'sadness'),
+    'rejected': (-1.7, 'sadness'), 'worthless': (-1.9, 'sadness'), 'failed': (-2.3, 'sadness'), 'failure': (-2.3, 'sadness'),
+    'heavy': (-1.0, 'sadness'),
+    # anxiety
+    'anxious': (-1.0, 'anxiety'), 'anxiety': (-0.7, 'anxiety'), 'worried': (-1.2, 'anxiety'), 'worry': (-1.9, 'anxiety'),
+    'worrying': (-1.4, 'anxiety'), 'nervous': (-1.1, 'anxiety'), 'scared': (-2.2, 'anxiety'), 'afraid': (-2.0, 'anxiety'),
+    'fear': (-2.2, 'anxiety'), 'panic': (-2.3, 'anxiety'), 'stress': (-1.8, 'anxiety'), 'stressed': (-1.4, 'anxiety'),
+    'stressful': (-1.8, 'anxiety'), 'overwhelmed': (-1.5, 'anxiety'), 'overwhelming': (-1.4, 'anxiety'),
+    'tense': (-1.4, 'anxiety'), 'uneasy': (-1.6, 'anxiety'), 'pressure': (-1.2, 'anxiety'), 'deadline': (-0.6, 'anxiety'),
+    'restless': (-1.1, 'anxiety'), 'insecure': (-1.8, 'anxiety'), 'dread': (-2.0, 'anxiety'), 'deadlines': (-0.6, 'anxiety'),
+    'noise': (-0.6, 'anxiety'),
+    # anger
+    'angry': (-2.3, 'anger'), 'anger': (-2.7, 'anger'), 'mad': (-2.2, 'anger'), 'annoyed': (-1.6, 'anger'),
+    'annoying': (-1.7, 'anger'), 'irritated': (-1.8, 'anger'), 'frustrated': (-1.8, 'anger'), 'frustrating': (-1.9, 'anger'),
+    'furious': (-2.7, 'anger'), 'hate': (-2.7, 'anger'), 'hated': (-3.2, 'anger'), 'upset': (-1.6, 'anger'),
+    'argument': (-1.6, 'anger'), 'argued': (-1.4, 'anger'), 'fight': (-1.6, 'anger'), 'unfair': (-2.1, 'anger'),
+    'resent': (-1.9, 'anger'),
+    # fatigue
+    'tired': (-1.4, 'fatigue'), 'exhausted': (-1.8, 'fatigue'), 'exhausting': (-1.5, 'fatigue'), 'drained': (-1.5, 'fatigue'),
+    'sleepy': (-0.4, 'fatigue'), 'fatigue': (-1.5, 'fatigue'), 'fatigued': (-1.5, 'fatigue'), 'burnout': (-2.1, 'fatigue'),
+    'burned': (-1.2, 'fatigue'), 'weary': (-1.3, 'fatigue'), 'insomnia': (-1.6, 'fatigue'), 'sick': (-1.9, 'fatigue'),
+    'ill': (-1.7, 'fatigue'), 'headache': (-1.6, 'fatigue'), 'pain': (-2.3, 'fatigue'),
+    'worn': (-1.0, 'fatigue'), 'dipped': (-0.8, 'fatigue'),
+    # sentiment without a particular emotion
+    'well': (1.1, None), 'progress': (1.5, None), 'healthy': (1.7, None), 'friends': (1.5, None),
+    'boring': (-1.3, None), 'bored': (-1.1, None), 'hard': (-0.4, None), 'difficult': (-1.5, None),
+    'struggle': (-1.4, None), 'struggling': (-1.6, None), 'problem': (-1.7, None), 'problems': (-1.7, None),
+    'mess': (-1.5, None), 'wrong': (-2.1, None), 'meh': (-0.3, None), 'badly': (-1.6, None),
+}
+
+NEGATIONS = frozenset((
+    'not', 'no', 'never', 'nothing', 'none', 'nobody', 'neither', 'nor', 'without', 'hardly', 'barely',
+    'dont', 'didnt', 'doesnt', 'isnt', 'wasnt', 'arent', 'werent', 'cant', 'cannot', 'couldnt', 'wont',
+    'wouldnt', 'shouldnt', 'havent', 'hasnt', 'aint',
+))
+INTENSIFIERS = {
+    'very': 1.3, 'really': 1.3, 'so': 1.25, 'extremely': 1.5, 'incredibly': 1.5, 'super': 1.3, 'totally': 1.3,
+    'completely': 1.3, 'too': 1.2, 'quite': 1.1, 'pretty': 1.1,
+    'slightly': 0.7, 'somewhat': 0.8, 'kinda': 0.8, 'little': 0.8, 'bit': 0.8,
+}
+# A negation flips (and damps) lexicon words up to this many words after it
+NEGATION_WINDOW = 3
+NEGATION_FACTOR = -0.74
+# "x but y": y counts more than x
+BEFORE_BUT, AFTER_BUT = 0.5, 1.5
+# Sum of valences -> -1..1, as VADER normalises
+NORMALIZATION = 15
+
+# Words, and the punctuation that ends a negation's reach ("can't sleep, exhausted")
+TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.,;:!?]")
+CLAUSE_ENDS = frozenset('.,;:!?')
+
+INDEXES = (
+    # Rows written before scoring existed; empty (and free) once the backfill has run
+    'CREATE INDEX IF NOT EXISTS idx_mood_entries_pending_emotion ON mood_entries (id) WHERE text_emotion IS NULL',
+    'CREATE INDEX IF NOT EXISTS idx_journal_entries_pending_emotion ON journal_entries (id) WHERE text_emotion IS NULL',
+)
+
+# table -> the text columns scored together
+TEXT_COLUMNS = {
+    'mood_entries': ('notes', 'entry_text'),
+    'journal_entries': ('title', 'content'),
+}
+
+
+def score(text):
+    """(sentiment from -1 to 1, or None for no words; emotion, or 'neutral') for a piece of text"""
+    if not text:
+        return None, NO_EMOTION
+    tokens = TOKEN.findall(text.lower().replace('’', "'"))
+    if not tokens or all(token in CLAUSE_ENDS for token in tokens):
+        return None, NO_EMOTION
+
+    hits = []  # (valence, emotion) of each lexicon word, weighted
+    negated_until = -1
+    boost = 1.0
+    but_at = None
+    for position, token in enumerate(tokens):
+        entry = LEXICON.get(token)
+        if entry is None:
+            if token in CLAUSE_ENDS:
+                negated_until = -1
+            elif token in NEGATIONS or token.endswith("n't"):
+                negated_until = position + NEGATION_WINDOW
+            elif token in INTENSIFIERS:
+                boost = INTENSIFIERS[token]
+                continue
+            elif token == 'but':
+                but_at = len(hits)
+            boost = 1.0
+            continue
+        valence, emotion = entry
+        valence *= boost
+        if position <= negated_until:
+            # "not happy" leans negative but is not sadness; "not worried" is not anxiety
+            valence *= NEGATION_FACTOR
+            emotion = None
+        hits.append((valence, emotion))
+        boost = 1.0
+
+    if not hits:
+        return 0.0, NO_EMOTION
+    total = 0.0
+    emotions = {}
+    for index, (valence, emotion) in enumerate(hits):
+        if but_at is not None:
+            valence *= BEFORE_BUT if index < but_at else AFTER_BUT
+        total += valence
+        if emotion is not None:
+            emotions[emotion] = emotions.get(emotion, 0.0) + abs(valence)
+    sentiment = round(total / math.sqrt(total * total + NORMALIZATION), 4)
+    # Ties go to the emotion listed first
+    emotion = max(emotions, key=lambda name: (emotions[name], -EMOTIONS.index(name))) if emotions else NO_EMOTION
+    return sentiment, emotion
+
+
+class _TokenIds(dict):
+    """Token -> vocabulary id: unknown tokens are 0, or the id of "not" when they end in n't"""
+
+    def __missing__(self, token):
+        value = self['not'] if token.endswith("n't") else 0
+        if len(self) < TOKEN_CACHE_SIZE:
+            self[token] = value
+        return value
+
+
+# Unknown tokens remembered by _TokenIds before it stops adding them
+TOKEN_CACHE_SIZE = 200000
+
+
+# NumPy once _numpy() has looked for it, False when it is not installed
+_np = None
+# (token ids, lookup tables), built by score_batch() on first use
+_VOCABULARY = None
+
+
+def _numpy():
+    """The numpy module, imported on first use; None when it is not installed (score() per text then)"""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _np = numpy
+    return _np or None
+
+
+def _vocabulary(np):
+    """Per-id lookup tables over every token score() treats specially; id 0 is any other word"""
+    tokens = [None] + sorted(set(LEXICON) | NEGATIONS | set(INTENSIFIERS) | CLAUSE_ENDS | {'but'})
+    ids = _TokenIds((token, index) for index, token in enumerate(tokens) if token is not None)
+    tables = {
+        'lexicon': np.array([token in LEXICON for token in tokens]),
+        'valence': np.array([LEXICON[token][0] if token in LEXICON else 0.0 for token in tokens]),
+        'emotion': np.array([EMOTIONS.index(LEXICON[token][1]) if token in LEXICON and LEXICON[token][1] else -1
+                             for token in tokens]),
+        'negation': np.array([token in NEGATIONS for token in tokens]),
+        'boost': np.array([INTENSIFIERS.get(token, 1.0) for token in tokens]),
+        'clause_end': np.array([token in CLAUSE_ENDS for token in tokens]),
+        'but': np.array([token == 'but' for token in tokens]),
+    }
+    return ids, tables
+
+
+
+def score_batch(texts):
+    """score() for many texts at once, with the same results; the rules run as NumPy array operations.
+
+    Only tokenising stays per text: negation windows become running maxima over the batch,
+    intensifiers a look at the previous token, and the sums per text bincounts.
+    """
+    global _VOCABULARY
+    np = _numpy() if texts else None
+    if np is None:
+        return [score(text) for text in texts]
+    if _VOCABULARY is None:
+        _VOCABULARY = _vocabulary(np)
+    token_ids, tables = _VOCABULARY
+    ids = []
+    starts = []
+    for text in texts:
+        starts.append(len(ids))
+        if text:
+            ids.extend(map(token_ids.__getitem__, TOKEN.findall(text.lower().replace('’', "'"))))
+    count = len(texts)
+    lengths = np.diff(np.array(starts + [len(ids)]))
+    ids = np.array(ids, dtype=np.intp)
+    doc = np.repeat(np.arange(count), lengths)
+    position = np.arange(len(ids))
+
+    # A word is negated when the latest negation before it in its text is within the window
+    # and no clause has ended since; keys are doubled so a text's start (2p - 1) sorts just
+    # before a negation that is its first word (2p)
+    doc_start = np.zeros(len(ids), dtype=bool)
+    doc_start[np.array(starts)[lengths > 0]] = True
+    negation_key = np.maximum.accumulate(np.where(tables['negation'][ids], 2 * position, -2))
+    reset_key = np.maximum.accumulate(np.where(tables['clause_end'][ids], 2 * position,
+                                               np.where(doc_start, 2 * position - 1, -2)))
+    negated = (negation_key > reset_key) & (position - negation_key // 2 <= NEGATION_WINDOW)
+
+    previous = np.concatenate(([0], ids[:-1]))
+    boost = np.where(doc_start, 1.0, tables['boost'][previous])
+    valence = tables['valence'][ids] * boost
+    valence = np.where(negated, valence * NEGATION_FACTOR, valence)
+
+    # Weight either side of the text's last "but"
+    but_position = np.where(tables['but'][ids], position, -1)
+    last_but = np.full(count, -1)
+    non_empty = lengths > 0
+    if non_empty.any():
+        last_but[non_empty] = np.maximum.reduceat(but_position, np.array(starts)[non_empty])
+    text_but = last_but[doc]
+    valence = np.where(text_but < 0, valence,
+                       np.where(position < text_but, valence * BEFORE_BUT, valence * AFTER_BUT))
+
+    hit = tables['lexicon'][ids]
+    totals = np.bincount(doc[hit], weights=valence[hit], minlength=count)
+    hits = np.bincount(doc[hit], minlength=count)
+    words = np.bincount(doc[~tables['clause_end'][ids]], minlength=count)
+    emotion = tables['emotion'][ids]
+    felt = hit & ~negated & (emotion >= 0)
+    emotions = np.bincount(doc[felt] * len(EMOTIONS) + emotion[felt], weights=np.abs(valence[felt]),
+                           minlength=count * len(EMOTIONS)).reshape(count, len(EMOTIONS))
+    strongest = emotions.argmax(axis=1)
+    has_emotion = emotions.max(axis=1) > 0
+
+    results = []
+    for index in range(count):
+        if not words[index]:
+            results.append((None, NO_EMOTION))
+        elif not hits[index]:
+            results.append((0.0, NO_EMOTION))
+        else:
+            total = float(totals[index])
+            results.append((round(total / math.sqrt(total * total + NORMALIZATION), 4),
+                            EMOTIONS[strongest[index]] if has_emotion[index] else NO_EMOTION))
+    return results
+
+
+def score_fields(*texts):
+    """score() of several text fields of one entry read together (notes and entry_text, title and content)"""
+    return score('\n'.join(text for text in texts if text))
+
+
+# mood_summary()'s two queries, each taking the user id
+SUMMARY_SQL = """SELECT COUNT(*), SUM(text_sentiment), SUM(mood_score), SUM(text_sentiment * text_sentiment),
+                        SUM(mood_score * mood_score), SUM(text_sentiment * mood_score)
+                 FROM mood_entries WHERE user_id = ? AND text_sentiment IS NOT NULL"""
+EMOTION_COUNTS_SQL = """SELECT text_emotion, COUNT(*) FROM mood_entries
+                        WHERE user_id = ? AND text_sentiment IS NOT NULL GROUP BY text_emotion ORDER BY COUNT(*) DESC"""
+
+
+def mood_summary(conn, user_id):
+    """A user's text sentiment next to their mood scores, from SQL aggregates over their entries.
+
+    'correlation' is Pearson's r between text_sentiment and mood_score (None under two scored
+    entries or without variation); 'emotions' counts the entries with text by text_emotion.
+    """
+    return summarize(conn.execute(SUMMARY_SQL, (user_id,)).fetchone(),
+                     conn.execute(EMOTION_COUNTS_SQL, (user_id,)).fetchall())
+
+
+def summarize(totals, emotions):
+    """mood_summary() from the rows of SUMMARY_SQL and EMOTION_COUNTS_SQL (for async connections)"""
+    n, sum_x, sum_y, sum_xx, sum_yy, sum_xy = totals
+    correlation = None
+    if n >= 2:
+        spread = (n * sum_xx - sum_x * sum_x) * (n * sum_yy - sum_y * sum_y)
+        if spread > 0:
+            correlation = round((n * sum_xy - sum_x * sum_y) / math.sqrt(spread), 4)
+    return {
+        'scored_entries': n,
+        'avg_sentiment': round(sum_x / n, 4) if n else None,
+        'correlation': correlation,
+        'emotions': {emotion: count for emotion, count in emotions},
+    }
+
+
+def add_columns(cursor):
+    """SQLite migration: text_sentiment and text_emotion on mood and journal entries"""
+    for table in TEXT_COLUMNS:
+        existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()}
+        for column, column_type in (('text_sentiment', 'REAL'), ('text_emotion', 'TEXT')):
+            if column not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+                logger.info("Added %s column to %s table", column, table)
+    for statement in INDEXES:
+        cursor.execute(statement)
+
+
+def backfill(conn, batch=2000, recompute=False):
+    """Score entries that have no text_emotion yet (every entry with `recompute`); returns rows updated.
+
+    Cheap to call on every start once done. Each batch commits on its own to keep write
+    locks short.
+    """
+    cursor = conn.cursor()
+    updated = 0
+    for table, columns in TEXT_COLUMNS.items():
+        last_id = 0
+        while True:
+            condition = 'id > ?' if recompute else 'text_emotion IS NULL AND id > ?'
+            cursor.execute(f'SELECT id, {", ".join(columns)} FROM {table} WHERE {condition} ORDER BY id LIMIT ?',
+                           (last_id, batch))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            scores = score_batch(['\n'.join(text for text in texts if text) for _, *texts in rows])
+            cursor.executemany(f'UPDATE {table} SET text_sentiment = ?, text_emotion = ? WHERE id = ?',
+                               [scored + (row[0],) for scored, row in zip(scores, rows)])
+            conn.commit()
+            updated += len(rows)
+            last_id = rows[-1][0]
+    if updated:
+        logger.info("Scored text sentiment for %d entries", updated)
+    return updated
+
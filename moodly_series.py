@@ -0,0 +1,269 @@
+"""
+Mood Series Store for Moodly App
+Compact per-user-month mood score series for charts, kept in sync with mood_entries
+"""
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from moodly_timezones import local_date, local_midnight_utc, local_today
+
+# Blob layout: version byte, varint count, count uint8 scores, then count varint deltas of
+# seconds since the start of the month (first delta is from the month start itself)
+FORMAT_VERSION = 1
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS mood_series (
+        user_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (user_id, month)
+    ) WITHOUT ROWID
+'''
+
+
+def enabled():
+    """Series reads and write-through are opt-in: run scripts/build_mood_series.py, then set MOOD_SERIES=true"""
+    return os.environ.get('MOOD_SERIES', 'false').lower() == 'true'
+
+
+def create_table(cursor):
+    cursor.execute(SCHEMA)
+
+
+def _put_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode(offsets, scores):
+    """Pack sorted second offsets and their scores (0-255) into a blob"""
+    out = bytearray((FORMAT_VERSION,))
+    _put_varint(out, len(offsets))
+    out += bytes(scores)
+    previous = 0
+    for offset in offsets:
+        _put_varint(out, offset - previous)
+        previous = offset
+    return bytes(out)
+
+
+def decode(blob):
+    """Return (offsets, scores) where scores is a bytes object"""
+    if blob[0] != FORMAT_VERSION:
+        raise ValueError(f"Unknown mood series format {blob[0]}")
+    count, pos = _get_varint(blob, 1)
+    scores = blob[pos:pos + count]
+    pos += count
+    offsets = []
+    total = 0
+    for _ in range(count):
+        delta, pos = _get_varint(blob, pos)
+        total += delta
+        offsets.append(total)
+    return offsets, scores
+
+
+def _scores_only(blob):
+    count, pos = _get_varint(blob, 1)
+    return blob[pos:pos + count]
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0, tzinfo=None)
+    value = str(value)
+    if len(value) == 10:
+        return datetime.strptime(value, '%Y-%m-%d')
+    return datetime.strptime(value[:19].replace('T', ' '), '%Y-%m-%d %H:%M:%S')
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(timestamp):
+    return int((timestamp - _EPOCH).total_seconds())
+
+
+def _month_start(month):
+    return datetime.strptime(month + '-01', '%Y-%m-%d')
+
+
+def _split(timestamp):
+    month = timestamp.strftime('%Y-%m')
+    return month, int((timestamp - _month_start(month)).total_seconds())
+
+
+def _clamp_score(score):
+    return max(0, min(255, int(float(score))))
+
+
+SELECT_MONTH = 'SELECT data FROM mood_series WHERE user_id = ? AND month = ?'
+UPSERT_MONTH = '''
+    INSERT INTO mood_series (user_id, month, count, data) VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id, month) DO UPDATE SET count = excluded.count, data = excluded.data
+'''
+
+
+def point(created_at, score):
+    """(month, offset, score) for an entry, or None if the score is not a number"""
+    try:
+        score = _clamp_score(score)
+    except (TypeError, ValueError):
+        return None
+    month, offset = _split(_parse_timestamp(created_at))
+    return month, offset, score
+
+
+def add_point(blob, offset, score):
+    """(count, blob) for a month's blob (None for a new month) with one more point"""
+    if blob:
+        offsets, scores = decode(blob)
+        scores = bytearray(scores)
+    else:
+        offsets, scores = [], bytearray()
+    # Entries usually arrive in order, so this is normally an append
+    position = bisect_right(offsets, offset)
+    offsets.insert(position, offset)
+    scores.insert(position, score)
+    return len(offsets), encode(offsets, scores)
+
+
+def append(cursor, user_id, created_at, score):
+    """Add one entry to the user's series; call in the same transaction as the mood_entries insert"""
+    entry = point(created_at, score)
+    if entry is None:
+        return
+    month, offset, score = entry
+    cursor.execute(SELECT_MONTH, (user_id, month))
+    row = cursor.fetchone()
+    count, data = add_point(row[0] if row else None, offset, score)
+    cursor.execute(UPSERT_MONTH, (user_id, month, count, data))
+
+
+def rebuild(conn, user_id=None):
+    """Rebuild series from mood_entries for one user or everyone; returns months written"""
+    cursor = conn.cursor()
+    if user_id is None:
+        cursor.execute('DELETE FROM mood_series')
+        cursor.execute('SELECT user_id, created_at, mood_score FROM mood_entries')
+    else:
+        cursor.execute('DELETE FROM mood_series WHERE user_id = ?', (user_id,))
+        cursor.execute('SELECT user_id, created_at, mood_score FROM mood_entries WHERE user_id = ?', (user_id,))
+
+    months = {}
+    for row_user, created_at, score in cursor.fetchall():
+        try:
+            month, offset = _split(_parse_timestamp(created_at))
+            score = _clamp_score(score)
+        except (TypeError, ValueError):
+            continue
+        months.setdefault((row_user, month), []).append((offset, score))
+
+    rows = []
+    for (row_user, month), points in months.items():
+        points.sort(key=lambda point: point[0])
+        rows.append((row_user, month, len(points),
+                     encode([offset for offset, _ in points], [score for _, score in points])))
+    cursor.executemany('INSERT INTO mood_series (user_id, month, count, data) VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    return len(rows)
+
+
+def points(conn, user_id, since=None):
+    """Yield (datetime, score) oldest first, optionally from `since` on"""
+    cursor = conn.cursor()
+    if since is None:
+        cursor.execute('SELECT month, data FROM mood_series WHERE user_id = ? ORDER BY month', (user_id,))
+    else:
+        cursor.execute('SELECT month, data FROM mood_series WHERE user_id = ? AND month >= ? ORDER BY month',
+                       (user_id, since.strftime('%Y-%m')))
+    for month, blob in cursor.fetchall():
+        start = _month_start(month)
+        offsets, scores = decode(blob)
+        for offset, score in zip(offsets, scores):
+            timestamp = start + timedelta(seconds=offset)
+            if since is None or timestamp >= since:
+                yield timestamp, score
+
+
+def daily_averages(conn, user_id, days=30, tz_name=None):
+    """[(local date, average score)] over the user's last `days` days, as /api/mood_data returns.
+
+    Days are bucketed in the user's current timezone (mood_entries.local_date keeps the
+    zone at write time, so the two only differ for entries logged before a change).
+    """
+    first_day = datetime.strptime(local_today(tz_name, days), '%Y-%m-%d')
+    day_names, bounds = [], []
+    # Local midnights from the first day to the end of today, as UTC seconds
+    for index in range(days + 2):
+        day = first_day + timedelta(days=index)
+        day_names.append(day.strftime('%Y-%m-%d'))
+        bounds.append(_seconds(local_midnight_utc(day.date(), tz_name)))
+    cursor = conn.cursor()
+    cursor.execute('SELECT month, data FROM mood_series WHERE user_id = ? AND month >= ? ORDER BY month',
+                   (user_id, (_EPOCH + timedelta(seconds=bounds[0])).strftime('%Y-%m')))
+    totals = {}
+    for month, blob in cursor.fetchall():
+        base = _seconds(_month_start(month))
+        offsets, scores = decode(blob)
+        position = bisect_left(offsets, bounds[0] - base)
+        for offset, score in zip(offsets[position:], scores[position:]):
+            index = bisect_right(bounds, base + offset) - 1
+            if index <= days:
+                day = day_names[index]
+            else:
+                day = local_date(_EPOCH + timedelta(seconds=base + offset), tz_name)
+            total = totals.get(day)
+            if total is None:
+                totals[day] = [score, 1]
+            else:
+                total[0] += score
+                total[1] += 1
+    return [(day, total / count) for day, (total, count) in sorted(totals.items())]
+
+
+def recent(conn, user_id, limit=30, tz_name=None):
+    """[(score, local date)] for the newest `limit` entries, newest first"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT month, data FROM mood_series WHERE user_id = ? ORDER BY month DESC', (user_id,))
+    result = []
+    for month, blob in cursor:
+        start = _month_start(month)
+        offsets, scores = decode(blob)
+        for index in range(len(offsets) - 1, -1, -1):
+            result.append((scores[index], local_date(start + timedelta(seconds=offsets[index]), tz_name)))
+            if len(result) >= limit:
+                return result
+    return result
+
+
+def stats(conn, user_id):
+    """(avg, max, min, count) over all of the user's entries, like the SQL aggregate"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT data FROM mood_series WHERE user_id = ?', (user_id,))
+    total = count = 0
+    highest = lowest = None
+    for (blob,) in cursor:
+        scores = _scores_only(blob)
+        if not scores:
+            continue
+        total += sum(scores)
+        count += len(scores)
+        highest = max(scores) if highest is None else max(highest, max(scores))
+        lowest = min(scores) if lowest is None else min(lowest, min(scores))
+    return (total / count if count else None, highest, lowest, count)
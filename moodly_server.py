@@ -0,0 +1,56 @@
+"""
+Server Launcher for Moodly App
+Runs an app under gunicorn with gunicorn.conf.py, or Flask's development server when developing
+"""
+import os
+import sys
+import logging
+
+logger = logging.getLogger('moodly')
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def available_cores():
+    """CPUs this process may run on (respects container/affinity limits where the OS exposes them)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count():
+    """WEB_CONCURRENCY if set, else 2 x cores + 1 capped at GUNICORN_MAX_WORKERS (default 8)"""
+    configured = os.environ.get('WEB_CONCURRENCY')
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(2 * available_cores() + 1, int(os.environ.get('GUNICORN_MAX_WORKERS', '8'))))
+
+
+def use_dev_server(debug):
+    """SERVER=dev|gunicorn forces a choice; otherwise debug mode and Windows (no gunicorn) use app.run"""
+    choice = os.environ.get('SERVER', '').lower()
+    if choice in ('dev', 'flask'):
+        return True
+    if choice == 'gunicorn':
+        return False
+    return debug or os.name == 'nt'
+
+
+def serve(target, app, port, debug=False, host='0.0.0.0'):
+    """Serve `target` ('module:app') under gunicorn, replacing this process.
+
+    In development (debug), on Windows or with SERVER=dev this is app.run with the
+    reloader, as before; it is also the fallback when gunicorn is not installed.
+    """
+    if not use_dev_server(debug):
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            logger.warning("gunicorn is not installed; using Flask's development server")
+        else:
+            os.environ['PORT'] = str(port)
+            os.environ.setdefault('HOST', host)
+            sys.stdout.flush()
+            os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', CONFIG_PATH, target])
+    app.run(host=host, port=port, debug=debug)
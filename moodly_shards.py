@@ -0,0 +1,230 @@
+"""
+Shards for Moodly App
+Spreads users over several SQLite files, each holding whole users, with a small directory database mapping users to files
+
+SQLite takes one writer per file, so with every user in moodly.db all mood inserts queue on one
+lock. With DATABASE_SHARDS=N, moodly.db only keeps user_directory (login name, email and shard
+per user id, and the id sequence); each user's row and data live in moodly-shardNN.db, so writes
+for users on different shards commit in parallel. New users are hashed to a shard by id; the
+directory records the choice, so scripts/rebalance_shards.py can move users when N changes.
+
+Users from before sharding are added to the directory as living in moodly.db itself (MAIN_SHARD),
+where they keep logging in and writing until the rebalance moves them, and new ids start above
+any id moodly.db ever handed out.
+"""
+import os
+import zlib
+import sqlite3
+import logging
+
+logger = logging.getLogger('moodly')
+
+DIRECTORY_TABLE = '''
+    CREATE TABLE IF NOT EXISTS user_directory (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        shard INTEGER NOT NULL
+    )
+'''
+
+# Each shard numbers its rows from (shard + 1) * ID_RANGE, so ids stay unique across shards
+# (a moved user keeps theirs) and never clash with ids from before sharding
+ID_RANGE = 2 ** 40
+ID_TABLES = ('mood_entries', 'journal_entries', 'goals')
+
+# The tables holding a user's rows, and the column naming the user
+USER_TABLES = (
+    ('users', 'id'),
+    ('mood_entries', 'user_id'),
+    ('journal_entries', 'user_id'),
+    ('goals', 'user_id'),
+    ('mood_series', 'user_id'),
+)
+
+# The directory's shard for users still in the main database's own tables (from before sharding)
+MAIN_SHARD = -1
+
+# Directory lookups are cached per process; the cache is simply dropped when it gets this big
+CACHE_SIZE = 100000
+
+
+def placement(user_id, count):
+    """The shard a user is hashed to when there are `count` shards"""
+    return zlib.crc32(str(user_id).encode()) % count
+
+
+class ShardMap:
+    """The directory database and the shard files next to it"""
+
+    def __init__(self, directory, count, connect=sqlite3.connect):
+        self.directory = directory
+        self.count = count
+        self._connect = connect
+        self._shards = {}
+
+    def path(self, shard):
+        if shard == MAIN_SHARD:
+            return self.directory
+        base, ext = os.path.splitext(self.directory)
+        return f'{base}-shard{shard:02d}{ext}'
+
+    @property
+    def paths(self):
+        return [self.path(shard) for shard in range(self.count)]
+
+    def create_directory(self):
+        """Create the directory, adding any users from before sharding to it; idempotent"""
+        conn = self._connect(self.directory)
+        try:
+            conn.execute(DIRECTORY_TABLE)
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone():
+                self._adopt_main_users(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _adopt_main_users(self, conn):
+        # Ids the directory allocates must not be ones these users have (or had)
+        last_id = max(conn.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0],
+                      *[row[0] for row in conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'users'")])
+        if conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'user_directory'").fetchone() is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('user_directory', ?)", (last_id,))
+        else:
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'user_directory'", (last_id,))
+        adopted = conn.execute('INSERT OR IGNORE INTO user_directory (user_id, username, email, shard) '
+                               'SELECT id, username, email, ? FROM users', (MAIN_SHARD,)).rowcount
+        if adopted > 0:
+            logger.info("Added %d users from before sharding to the shard directory", adopted)
+        clashes = conn.execute('''
+            SELECT COUNT(*) FROM users u
+            WHERE NOT EXISTS (SELECT 1 FROM user_directory d WHERE d.user_id = u.id AND d.username = u.username)
+        ''').fetchone()[0]
+        if clashes:
+            logger.error("%d users in %s share an id, username or email with another directory entry "
+                         "and cannot log in; resolve them by hand", clashes, self.directory)
+
+    def reserve_ids(self, conn, shard):
+        """Start the shard's row ids in its own range; run once the tables exist"""
+        for table in ID_TABLES:
+            if conn.execute('SELECT 1 FROM sqlite_sequence WHERE name = ?', (table,)).fetchone() is None:
+                conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, (shard + 1) * ID_RANGE))
+        conn.commit()
+
+    def shard_of(self, user_id):
+        """The shard holding the user's rows, or None for a user the directory does not know"""
+        shard = self._shards.get(user_id)
+        if shard is None:
+            conn = self._connect(self.directory)
+            try:
+                row = conn.execute('SELECT shard FROM user_directory WHERE user_id = ?', (user_id,)).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                return None
+            if len(self._shards) >= CACHE_SIZE:
+                self._shards.clear()
+            shard = self._shards[user_id] = row[0]
+        return shard
+
+    def find(self, login):
+        """(user_id, shard) for a username or email, or None"""
+        conn = self._connect(self.directory)
+        try:
+            return conn.execute('SELECT user_id, shard FROM user_directory WHERE username = ? OR email = ?',
+                                (login, login)).fetchone()
+        finally:
+            conn.close()
+
+    def exists(self, username, email):
+        conn = self._connect(self.directory)
+        try:
+            return conn.execute('SELECT 1 FROM user_directory WHERE username = ? OR email = ?',
+                                (username, email)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def add_user(self, username, email):
+        """Allocate a user id and place the user on a shard; returns (user_id, shard)"""
+        conn = self._connect(self.directory)
+        try:
+            # Placed in the same transaction, once the id is known
+            user_id = conn.execute('INSERT INTO user_directory (username, email, shard) VALUES (?, ?, 0)',
+                                   (username, email)).lastrowid
+            shard = placement(user_id, self.count)
+            conn.execute('UPDATE user_directory SET shard = ? WHERE user_id = ?', (shard, user_id))
+            conn.commit()
+        finally:
+            conn.close()
+        self._shards[user_id] = shard
+        return user_id, shard
+
+    def remove_user(self, user_id):
+        conn = self._connect(self.directory)
+        try:
+            conn.execute('DELETE FROM user_directory WHERE user_id = ?', (user_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        self._shards.pop(user_id, None)
+
+    def update_login(self, user_id, username, email):
+        """Keep the directory's login names in step with a renamed user"""
+        conn = self._connect(self.directory)
+        try:
+            conn.execute('UPDATE user_directory SET username = ?, email = ? WHERE user_id = ?',
+                         (username, email, user_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def move(self, user_id, source, shard):
+        """Move a user's rows from the database file `source` to `shard`; returns the rows moved.
+
+        Copies first, then repoints the directory, then deletes the originals, so a crash
+        leaves the user readable; rerunning redoes the copy (INSERT OR REPLACE). Workers
+        cache placements, so move users while the app is stopped, or restart it afterwards.
+        """
+        src = self._connect(source)
+        dst = self._connect(self.path(shard))
+        try:
+            user = None
+            moved = 0
+            present = []
+            for table, column in USER_TABLES:
+                try:
+                    cursor = src.execute(f'SELECT * FROM {table} WHERE {column} = ?', (user_id,))
+                except sqlite3.OperationalError:
+                    # A database from before the table existed
+                    continue
+                present.append((table, column))
+                columns = [description[0] for description in cursor.description]
+                rows = cursor.fetchall()
+                if table == 'users':
+                    if not rows:
+                        return 0
+                    user = dict(zip(columns, rows[0]))
+                if rows:
+                    dst.executemany(f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) '
+                                    f'VALUES ({", ".join("?" * len(columns))})', rows)
+                    moved += len(rows)
+            dst.commit()
+
+            directory = self._connect(self.directory)
+            try:
+                directory.execute('''
+                    INSERT INTO user_directory (user_id, username, email, shard) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET shard = excluded.shard
+                ''', (user_id, user['username'], user['email'], shard))
+                directory.commit()
+            finally:
+                directory.close()
+            self._shards[user_id] = shard
+
+            for table, column in present:
+                src.execute(f'DELETE FROM {table} WHERE {column} = ?', (user_id,))
+            src.commit()
+            return moved
+        finally:
+            dst.close()
+            src.close()
@@ -0,0 +1,511 @@
+"""
+Database Snapshots for Moodly App
+Keeps SQLite databases that live on ephemeral disk (/tmp on Vercel) in a snapshot store, restored on cold start
+
+/tmp does not survive a cold start, so without snapshots every new Vercel instance starts from an
+empty moodly.db. With SNAPSHOT_STORE set, to 'cloudinary' (private raw files in the account the
+profile pictures use, under SNAPSHOT_PREFIX) or to a directory on a persistent volume, each
+database file is kept in the store as a generation:
+
+  <name>/<generation>/base.gz            the whole file, gzip-compressed
+  <name>/<generation>/delta-000001.gz    the pages changed since the previous ship, and so on
+
+Initialising the schema of a missing file (a cold start) first restores the newest generation:
+the base is decompressed as a stream straight to disk, then the deltas are laid over it in order.
+While the app runs, a request that finds a file changed ships a delta before its response goes
+out (at most every SNAPSHOT_INTERVAL seconds; on Vercel, after every such request, since a
+frozen instance runs nothing later), and a fresh base once the deltas add up to half of it.
+
+The databases use SQLite's rollback journal, so there is no WAL to tail; a delta holds what WAL
+frames would, the changed pages, found by hashing each page of a consistent copy (made with the
+backup API) against the hashes from the previous ship. Instances do not merge: one that finds a
+newer generation in the store than the one it built on starts its own, so the last to ship wins.
+"""
+import os
+import gzip
+import json
+import time
+import uuid
+import shutil
+import struct
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: the in-process lock alone
+    fcntl = None
+
+from moodly_metrics import metrics
+
+logger = logging.getLogger('moodly')
+
+# 'cloudinary', or a directory; SnapshotStore is the interface for keeping snapshots anywhere else
+STORE = os.environ.get('SNAPSHOT_STORE', '')
+SNAPSHOT_PREFIX = os.environ.get('SNAPSHOT_PREFIX', 'moodly-snapshots')
+SNAPSHOT_INTERVAL = float(os.environ.get('SNAPSHOT_INTERVAL', 0 if os.environ.get('VERCEL') == '1' else 30))
+COMPRESSION_LEVEL = int(os.environ.get('SNAPSHOT_COMPRESSION_LEVEL', 6))
+# Start a new generation once its deltas add up to this share of the base
+REBASE_RATIO = 0.5
+# Generations kept in the store: the current one and the one before
+KEEP_GENERATIONS = 2
+CHUNK = 1 << 20
+
+DELTA_MAGIC = b'MDLT'
+DELTA_HEADER = struct.Struct('>4sIII')  # magic, page size, page count after the delta, pages in it
+PAGE_NUMBER = struct.Struct('>I')
+
+RESTORE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class SnapshotStore:
+    """Where snapshots are kept; keys are '/'-separated paths"""
+
+    def put(self, key, source):
+        """Store the contents of the readable binary file `source` under `key`, replacing it whole"""
+        raise NotImplementedError
+
+    def get(self, key):
+        """A readable binary stream of the object at `key`"""
+        raise NotImplementedError
+
+    def list(self, prefix):
+        """Sorted keys starting with `prefix`"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class LocalSnapshotStore(SnapshotStore):
+    """Snapshots in a local directory (a mounted volume, or a stand-in for a bucket in tests)"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def put(self, key, source):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(source, f, CHUNK)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, path)
+        except BaseException:
+            os.remove(partial)
+            raise
+
+    def get(self, key):
+        return open(self._path(key), 'rb')
+
+    def list(self, prefix):
+        keys = []
+        for directory, _, files in os.walk(self.root):
+            relative = os.path.relpath(directory, self.root).replace(os.sep, '/')
+            for name in files:
+                key = name if relative == '.' else f'{relative}/{name}'
+                if key.startswith(prefix) and not name.startswith('.upload-'):
+                    keys.append(key)
+        return sorted(keys)
+
+    def delete(self, key):
+        path = self._path(key)
+        os.remove(path)
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass  # not empty yet
+
+
+class CloudinarySnapshotStore(SnapshotStore):
+    """Snapshots as private raw files in Cloudinary, with the CLOUDINARY_* credentials of the profile pictures"""
+
+    def __init__(self, prefix=SNAPSHOT_PREFIX):
+        self.prefix = prefix.strip('/') + '/'
+        self._configured = False
+
+    def _options(self):
+        if not self._configured:
+            # Imported here: most processes never touch the store after their cold start
+            from cloudinary_storage import CloudinaryStorage
+            storage = CloudinaryStorage()
+            if not storage.is_enabled():
+                raise RuntimeError('SNAPSHOT_STORE=cloudinary needs CLOUDINARY_CLOUD_NAME, _API_KEY and _API_SECRET')
+            storage._ensure_configured()
+            self._configured = True
+        return {'resource_type': 'raw', 'type': 'private'}
+
+    def put(self, key, source):
+        import cloudinary.uploader
+        cloudinary.uploader.upload(source, public_id=self.prefix + key, overwrite=True, invalidate=True,
+                                   **self._options())
+
+    def get(self, key):
+        import urllib.request
+        import cloudinary.utils
+        url = cloudinary.utils.private_download_url(self.prefix + key, '', **self._options())
+        # Spooled to a local file: restore() seeks and tells, which a download stream cannot
+        local = tempfile.TemporaryFile()
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                shutil.copyfileobj(response, local, CHUNK)
+        except BaseException:
+            local.close()
+            raise
+        local.seek(0)
+        return local
+
+    def list(self, prefix):
+        import cloudinary.api
+        keys = []
+        cursor = None
+        while True:
+            page = cloudinary.api.resources(prefix=self.prefix + prefix, max_results=500, next_cursor=cursor,
+                                            **self._options())
+            keys.extend(resource['public_id'][len(self.prefix):] for resource in page.get('resources', []))
+            cursor = page.get('next_cursor')
+            if not cursor:
+                return sorted(keys)
+
+    def delete(self, key):
+        import cloudinary.uploader
+        cloudinary.uploader.destroy(self.prefix + key, invalidate=True, **self._options())
+
+
+def get_snapshot_store():
+    """The store SNAPSHOT_STORE points at, or None when snapshots are off"""
+    if not STORE:
+        return None
+    if STORE.lower() == 'cloudinary':
+        return CloudinarySnapshotStore()
+    return LocalSnapshotStore(STORE)
+
+
+def _name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def latest_generation(store, name):
+    """(generation, number of deltas in an unbroken run) of the newest complete generation, or None"""
+    generations = {}
+    for key in store.list(f'{name}/'):
+        parts = key.split('/')
+        if len(parts) == 3:
+            generations.setdefault(parts[1], set()).add(parts[2])
+    for generation in sorted(generations, reverse=True):
+        files = generations[generation]
+        if 'base.gz' in files:
+            seq = 0
+            while f'delta-{seq + 1:06d}.gz' in files:
+                seq += 1
+            return generation, seq
+    return None
+
+
+# Locking: a thread lock per file, plus flock on a lock file beside it against other
+# processes (never the database itself: closing any descriptor on it would drop SQLite's locks)
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(path):
+    with _locks_lock:
+        lock = _locks.setdefault(path, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + '.snapshot-lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _page_size(path):
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    size = int.from_bytes(header[16:18], 'big')
+    return 65536 if size == 1 else size
+
+
+def _page_hashes(path, page_size):
+    hashes = []
+    with open(path, 'rb') as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return hashes
+            hashes.append(hashlib.blake2b(page, digest_size=16).digest())
+
+
+# Ship state, beside the database: a JSON line (generation, deltas shipped, sizes, the file's
+# mtime when last shipped), then the 16-byte hash of every page as shipped
+def _load_state(path):
+    try:
+        with open(path + '.snapshot-state', 'rb') as f:
+            state = json.loads(f.readline())
+            data = f.read()
+    except (OSError, ValueError):
+        return None
+    state['hashes'] = [data[i:i + 16] for i in range(0, len(data), 16)]
+    return state
+
+
+def _save_state(path, state):
+    fields = {key: value for key, value in state.items() if key != 'hashes'}
+    partial = path + '.snapshot-state.partial'
+    with open(partial, 'wb') as f:
+        f.write(json.dumps(fields).encode() + b'\n')
+        f.write(b''.join(state['hashes']))
+    os.replace(partial, path + '.snapshot-state')
+
+
+def _consistent_copy(path, target):
+    source = sqlite3.connect(path, timeout=30)
+    destination = sqlite3.connect(target)
+    try:
+        source.backup(destination)
+    finally:
+        destination.close()
+        source.close()
+
+
+def _put_compressed(store, key, write):
+    """Compress what `write(out)` writes to a temporary file, upload it; returns the compressed size"""
+    with tempfile.TemporaryFile() as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=COMPRESSION_LEVEL) as out:
+            write(out)
+        size = raw.tell()
+        raw.seek(0)
+        store.put(key, raw)
+    return size
+
+
+def ship(path, store=None, rebase=False):
+    """Ship what changed in the database since the last ship; returns ('base' or 'delta', bytes) or (None, 0)"""
+    store = store or get_snapshot_store()
+    with _locked(path):
+        state = _load_state(path)
+        mtime = os.stat(path).st_mtime_ns
+        if state is not None and state['mtime'] == mtime and not rebase:
+            return None, 0
+
+        name = _name(path)
+        copy = path + '.snapshot'
+        _consistent_copy(path, copy)
+        try:
+            page_size = _page_size(copy)
+            hashes = _page_hashes(copy, page_size)
+            current = (state['generation'], state['seq']) if state else None
+            if (rebase or state is None or page_size != state['page_size']
+                    or latest_generation(store, name) != current
+                    or state['delta_bytes'] > state['base_bytes'] * REBASE_RATIO):
+                generation = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()) + '-' + uuid.uuid4().hex[:8]
+
+                def write_base(out):
+                    with open(copy, 'rb') as f:
+                        shutil.copyfileobj(f, out, CHUNK)
+
+                size = _put_compressed(store, f'{name}/{generation}/base.gz', write_base)
+                state = {'generation': generation, 'seq': 0, 'page_size': page_size,
+                         'base_bytes': size, 'delta_bytes': 0}
+                kind = 'base'
+                _prune(store, name)
+            else:
+                previous = state['hashes']
+                changed = [number for number, digest in enumerate(hashes)
+                           if number >= len(previous) or previous[number] != digest]
+                if not changed and len(hashes) == len(previous):
+                    state.update(mtime=mtime)
+                    _save_state(path, state)
+                    return None, 0
+
+                def write_delta(out):
+                    out.write(DELTA_HEADER.pack(DELTA_MAGIC, page_size, len(hashes), len(changed)))
+                    with open(copy, 'rb') as f:
+                        for number in changed:
+                            f.seek(number * page_size)
+                            out.write(PAGE_NUMBER.pack(number) + f.read(page_size))
+
+                state['seq'] += 1
+                size = _put_compressed(store, f'{name}/{state["generation"]}/delta-{state["seq"]:06d}.gz',
+                                       write_delta)
+                state['delta_bytes'] += size
+                kind = 'delta'
+        finally:
+            os.remove(copy)
+
+        state.update(mtime=mtime, hashes=hashes)
+        _save_state(path, state)
+    metrics.inc('moodly_snapshot_shipped_bytes_total', (('kind', kind),), size)
+    logger.debug("Shipped %s snapshot of %s (%d bytes)", kind, path, size)
+    return kind, size
+
+
+def _prune(store, name):
+    generations = sorted({key.split('/')[1] for key in store.list(f'{name}/') if key.count('/') == 2})
+    for generation in generations[:-KEEP_GENERATIONS]:
+        for key in store.list(f'{name}/{generation}/'):
+            store.delete(key)
+
+
+def _read_delta(stream):
+    """(page size, page count, [(page number, page)]) of a whole delta, checked before any of it is applied"""
+    with gzip.GzipFile(fileobj=stream) as f:
+        magic, page_size, page_count, count = DELTA_HEADER.unpack(f.read(DELTA_HEADER.size))
+        if magic != DELTA_MAGIC:
+            raise ValueError('not a snapshot delta')
+        pages = []
+        for _ in range(count):
+            (number,) = PAGE_NUMBER.unpack(f.read(PAGE_NUMBER.size))
+            page = f.read(page_size)
+            if len(page) != page_size:
+                raise ValueError('truncated snapshot delta')
+            pages.append((number, page))
+        # Reading to the end makes gzip check the CRC
+        if f.read(1):
+            raise ValueError('trailing data in snapshot delta')
+    return page_size, page_count, pages
+
+
+def restore(path, store=None):
+    """Rebuild the database at `path` from the newest generation in the store.
+
+    Returns the seconds it took, or None when the store has no snapshot of it. The file
+    is assembled beside `path` and only moved into place once it passes quick_check.
+    """
+    store = store or get_snapshot_store()
+    name = _name(path)
+    latest = latest_generation(store, name)
+    if latest is None:
+        return None
+    generation, seq = latest
+    start = time.perf_counter()
+    partial = path + '.restore'
+    hashes = []
+    # Pages are hashed on the way through, sparing a second read of the file for the ship state
+    with store.get(f'{name}/{generation}/base.gz') as raw, gzip.GzipFile(fileobj=raw) as source, \
+            open(partial, 'wb') as target:
+        page_size = None
+        while True:
+            # CHUNK is a whole number of pages of any size SQLite allows
+            chunk = source.read(CHUNK)
+            if not chunk:
+                break
+            target.write(chunk)
+            if page_size is None:
+                size = int.from_bytes(chunk[16:18], 'big')
+                page_size = 65536 if size == 1 else size
+            hashes.extend(hashlib.blake2b(chunk[offset:offset + page_size], digest_size=16).digest()
+                          for offset in range(0, len(chunk), page_size))
+        base_bytes = raw.tell()
+    delta_bytes = 0
+    with open(partial, 'r+b') as target:
+        for number in range(1, seq + 1):
+            with store.get(f'{name}/{generation}/delta-{number:06d}.gz') as raw:
+                page_size, page_count, pages = _read_delta(raw)
+                delta_bytes += raw.tell()
+            del hashes[page_count:]
+            hashes.extend([b''] * (page_count - len(hashes)))
+            for page_number, page in pages:
+                target.seek(page_number * page_size)
+                target.write(page)
+                hashes[page_number] = hashlib.blake2b(page, digest_size=16).digest()
+            target.truncate(page_count * page_size)
+        target.flush()
+        os.fsync(target.fileno())
+
+    conn = sqlite3.connect(partial)
+    try:
+        result = conn.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        os.remove(partial)
+        raise sqlite3.DatabaseError(f'snapshot {generation} of {name} failed its check: {result}')
+    os.replace(partial, path)
+    elapsed = time.perf_counter() - start
+
+    # Carry on shipping deltas to the generation just restored
+    _save_state(path, {'generation': generation, 'seq': seq, 'page_size': page_size,
+                       'base_bytes': base_bytes, 'delta_bytes': delta_bytes,
+                       'mtime': os.stat(path).st_mtime_ns, 'hashes': hashes})
+    metrics.observe('moodly_snapshot_restore_seconds', (), elapsed, RESTORE_BUCKETS)
+    logger.info("Restored %s from snapshot %s with %d deltas in %.2fs", path, generation, seq, elapsed)
+    return elapsed
+
+
+def restore_missing(paths):
+    """Cold start: restore each database file that does not exist from the store, when there is one"""
+    store = get_snapshot_store()
+    if store is None:
+        return
+    for path in paths:
+        with _locked(path):
+            # Another worker may have restored it while this one waited for the lock
+            if not os.path.exists(path):
+                restore(path, store)
+
+
+def ship_all(paths):
+    store = get_snapshot_store()
+    for path in paths:
+        if os.path.exists(path):
+            try:
+                ship(path, store)
+            except Exception:
+                logger.exception("Shipping a snapshot of %s failed", path)
+
+
+_next_ship = time.time() + SNAPSHOT_INTERVAL
+_shipping = threading.Lock()
+
+
+def ship_due(paths):
+    """Ship changed files now, in the calling request, when SNAPSHOT_INTERVAL has passed.
+
+    Runs before the response is sent, so serverless runtimes, which freeze an instance
+    once it has answered, never cut a ship short. A request arriving while another
+    thread ships skips it; the next one due picks up its changes.
+    """
+    global _next_ship
+    now = time.time()
+    if now < _next_ship or not _shipping.acquire(blocking=False):
+        return
+    try:
+        _next_ship = now + SNAPSHOT_INTERVAL
+        ship_all(paths())
+    finally:
+        _shipping.release()
+
+
+def _after_fork():
+    global _next_ship, _shipping
+    _next_ship = time.time() + SNAPSHOT_INTERVAL
+    _shipping = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def init_snapshots(app, paths):
+    """Let requests ship snapshots of the files `paths()` returns, when SNAPSHOT_STORE is set"""
+    if STORE:
+        @app.after_request
+        def ship_snapshots(response):
+            # After the view has committed its writes
+            ship_due(paths)
+            return response
@@ -0,0 +1,104 @@
+"""
+Template Setup for Moodly App
+Jinja bytecode cache, template preloading at worker boot and a {% cache %} fragment tag
+"""
+import os
+import time
+import logging
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from moodly_cache import ResponseCache, current_version
+from moodly_metrics import metrics
+
+logger = logging.getLogger('moodly')
+
+fragments = ResponseCache(int(float(os.environ.get('FRAGMENT_CACHE_MB', '16')) * 1024 * 1024),
+                          metric='moodly_fragment_cache_total')
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'name'[, extra, keys] %}...{% endcache %}
+
+    Caches the rendered block per template, tag position, current user and their data
+    version (plus any extra keys), so a write by the user invalidates it. Use it around
+    expensive partials such as achievement lists or the wellness hub grid.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache_enabled=True)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        keys = [nodes.Const(parser.name), nodes.Const(lineno)]
+        while parser.stream.current.type != 'block_end':
+            if len(keys) > 2:
+                parser.stream.expect('comma')
+            keys.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(keys)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, keys, caller):
+        if not self.environment.fragment_cache_enabled:
+            return caller()
+        key = tuple(keys) + current_version()
+        entry = fragments.get(key)
+        if entry is not None:
+            metrics.inc('moodly_fragment_cache_total', (('result', 'hit'),))
+            return Markup(entry[0])
+        metrics.inc('moodly_fragment_cache_total', (('result', 'miss'),))
+        html = caller()
+        fragments.set(key, str(html), 'text/html')
+        return html
+
+
+def _bytecode_cache(app):
+    directory = os.environ.get('JINJA_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        if os.access(directory, os.W_OK):
+            return FileSystemBytecodeCache(directory)
+    except OSError:
+        pass
+    # Read-only filesystem (e.g. serverless): Jinja's default per-user temp directory
+    return FileSystemBytecodeCache()
+
+
+def init_templates(app):
+    """Configure the Jinja environment before its first use.
+
+    Compiled templates are kept in a filesystem bytecode cache (JINJA_CACHE_DIR, default
+    instance/jinja_cache) so a fresh worker skips parsing. PRELOAD_TEMPLATES=true also
+    compiles every template here; under gunicorn, gunicorn.conf.py does it in each worker.
+    """
+    app.jinja_options = dict(app.jinja_options,
+                             bytecode_cache=_bytecode_cache(app),
+                             extensions=list(app.jinja_options.get('extensions', ())) + [FragmentCacheExtension])
+    app.jinja_env.fragment_cache_enabled = app.config.get('FRAGMENT_CACHE', not app.debug)
+    if os.environ.get('PRELOAD_TEMPLATES', 'false').lower() == 'true':
+        preload_templates(app)
+    return app
+
+
+def preload_templates(app):
+    """Load every template into the environment's cache; returns how many were loaded"""
+    env = app.jinja_env
+    start = time.perf_counter()
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    # Keep them all in memory rather than evicting at Jinja's default 400
+    if env.cache is not None and getattr(env.cache, 'capacity', 0) < len(names):
+        env.cache.capacity = len(names)
+    loaded = 0
+    for name in names:
+        try:
+            env.get_template(name)
+            loaded += 1
+        except Exception as e:
+            logger.warning("Could not preload template %s: %s", name, e)
+    logger.info("Preloaded %d templates in %.1f ms", loaded, (time.perf_counter() - start) * 1000)
+    return loaded
@@ -0,0 +1,124 @@
+"""
+Local Dates for Moodly App
+Per-user timezones and the stored mood_entries.local_date used for daily bucketing
+"""
+import os
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+logger = logging.getLogger('moodly')
+
+DEFAULT_TIMEZONE = os.environ.get('DEFAULT_TIMEZONE', 'UTC')
+
+INDEXES = (
+    # Daily aggregation: WHERE user_id = ? AND local_date >= ? GROUP BY local_date
+    'CREATE INDEX IF NOT EXISTS idx_mood_entries_user_local_date ON mood_entries (user_id, local_date)',
+    # Rows still waiting for the backfill; empty (and free) once it has run
+    'CREATE INDEX IF NOT EXISTS idx_mood_entries_pending_local_date ON mood_entries (id) WHERE local_date IS NULL',
+)
+
+
+@lru_cache(maxsize=256)
+def get_zone(name):
+    """ZoneInfo for `name`, falling back to DEFAULT_TIMEZONE (then UTC) when unknown"""
+    for candidate in (name, DEFAULT_TIMEZONE):
+        if candidate:
+            try:
+                return ZoneInfo(candidate)
+            except (ZoneInfoNotFoundError, ValueError):
+                continue
+    return timezone.utc
+
+
+def is_valid_timezone(name):
+    if not name:
+        return False
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def timezone_choices():
+    return sorted(available_timezones())
+
+
+def _as_utc(created_at):
+    if isinstance(created_at, datetime):
+        value = created_at
+    else:
+        value = datetime.fromisoformat(str(created_at).strip().replace('T', ' ')[:26])
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def utc_timestamp(days_ago=0):
+    """The current UTC time, optionally `days_ago` earlier, as created_at stores it ('YYYY-MM-DD HH:MM:SS')"""
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def local_date(created_at, tz_name):
+    """'YYYY-MM-DD' of a UTC timestamp (datetime or stored string) in the user's timezone"""
+    return _as_utc(created_at).astimezone(get_zone(tz_name)).strftime('%Y-%m-%d')
+
+
+def local_today(tz_name, days_ago=0):
+    """The user's current date, optionally `days_ago` earlier, as 'YYYY-MM-DD'"""
+    today = datetime.now(timezone.utc).astimezone(get_zone(tz_name)).date()
+    return (today - timedelta(days=days_ago)).isoformat()
+
+
+def local_midnight_utc(day, tz_name):
+    """Naive UTC datetime at which the local date `day` (a date) starts"""
+    start = datetime.combine(day, datetime.min.time()).replace(tzinfo=get_zone(tz_name))
+    return start.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def add_columns(cursor):
+    """SQLite migration: users.timezone, mood_entries.local_date and their indexes"""
+    for table, column in (('users', 'timezone TEXT'), ('mood_entries', 'local_date TEXT')):
+        try:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+            logger.info("Added %s column to %s table", column.split()[0], table)
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" not in str(e).lower():
+                logger.error("Error updating schema: %s", e)
+    for statement in INDEXES:
+        cursor.execute(statement)
+
+
+def backfill(conn, batch=5000, recompute=False):
+    """Fill mood_entries.local_date from created_at and the owner's timezone; returns rows updated.
+
+    Only rows with no local_date are touched unless `recompute` is set, so it is cheap
+    to call on every start. Each batch commits on its own to keep write locks short.
+    """
+    cursor = conn.cursor()
+    zones = {row[0]: row[1] for row in cursor.execute('SELECT id, timezone FROM users').fetchall()}
+    updated = 0
+    last_id = 0
+    while True:
+        condition = 'id > ?' if recompute else 'local_date IS NULL AND id > ?'
+        cursor.execute(f'SELECT id, user_id, created_at FROM mood_entries WHERE {condition} ORDER BY id LIMIT ?',
+                       (last_id, batch))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        values = []
+        for entry_id, user_id, created_at in rows:
+            try:
+                values.append((local_date(created_at, zones.get(user_id)), entry_id))
+            except (TypeError, ValueError):
+                logger.warning("Skipping mood entry %s with unparseable created_at %r", entry_id, created_at)
+        cursor.executemany('UPDATE mood_entries SET local_date = ? WHERE id = ?', values)
+        conn.commit()
+        updated += len(values)
+        last_id = rows[-1][0]
+    if updated:
+        logger.info("Backfilled local_date for %d mood entries", updated)
+    return updated
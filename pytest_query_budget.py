@@ -0,0 +1,84 @@
+"""
+Pytest plugin: fail tests whose requests run more SQL than their route's budget.
+
+conftest.py registers it through pytest_plugins. Budgets come from query_budgets.json
+(or the file in QUERY_BUDGET_FILE), mapping endpoint name to the maximum number of
+statements one request may execute, and can be overridden per test:
+
+    @pytest.mark.query_budget(3)                  # every request in this test
+    @pytest.mark.query_budget(2, endpoint='dashboard')
+
+Pass --fail-on-n-plus-one to also fail on repeated statements within a request.
+"""
+import os
+import json
+
+import pytest
+
+import moodly_querylog
+
+DEFAULT_BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budgets.json')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('query_budget')
+    group.addoption('--query-budget-file', default=os.environ.get('QUERY_BUDGET_FILE', DEFAULT_BUDGET_FILE),
+                    help='JSON file mapping endpoint to max SQL statements per request')
+    group.addoption('--fail-on-n-plus-one', action='store_true', default=False,
+                    help='fail tests whose requests repeat the same statement (N+1)')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'query_budget(max_queries, endpoint=None): '
+                                       'limit SQL statements per request in this test')
+    budgets = {}
+    path = config.getoption('query_budget_file')
+    if path and os.path.exists(path):
+        with open(path) as f:
+            budgets = json.load(f)
+    config._query_budgets = budgets
+    moodly_querylog.enable()
+
+
+def _budget_for(item, endpoint):
+    for marker in item.iter_markers('query_budget'):
+        target = marker.kwargs.get('endpoint')
+        if target is None or target == endpoint:
+            return marker.args[0] if marker.args else marker.kwargs['max_queries']
+    return item.config._query_budgets.get(endpoint)
+
+
+def _check(item, logs):
+    failures = []
+    for log in logs:
+        budget = _budget_for(item, log.endpoint)
+        if budget is not None and len(log) > budget:
+            statements = '\n    '.join(sql for sql, _, _ in log.statements)
+            failures.append(f"{log.endpoint}: {len(log)} queries (budget {budget})\n    {statements}")
+        if item.config.getoption('fail_on_n_plus_one'):
+            for sql, count, distinct in log.n_plus_one():
+                failures.append(f"{log.endpoint}: N+1, {count} executions ({distinct} distinct params) of {sql}")
+    return failures
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    logs = []
+    moodly_querylog.add_listener(logs.append)
+    try:
+        result = yield
+    finally:
+        moodly_querylog.remove_listener(logs.append)
+    failures = _check(item, logs)
+    if failures:
+        pytest.fail('Query budget exceeded:\n' + '\n'.join(failures), pytrace=False)
+    return result
+
+
+@pytest.fixture
+def query_logs(request):
+    """Query logs of the requests made so far in this test, for ad-hoc assertions"""
+    logs = []
+    moodly_querylog.add_listener(logs.append)
+    yield logs
+    moodly_querylog.remove_listener(logs.append)
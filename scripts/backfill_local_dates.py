@@ -0,0 +1,38 @@
+"""
+Backfill mood_entries.local_date from created_at and each user's timezone.
+
+The app runs the same migration for rows missing a local_date on its first request;
+use this to run it ahead of a deploy, or with --recompute after bulk timezone changes.
+
+Usage: python scripts/backfill_local_dates.py [--db PATH] [--batch N] [--recompute]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import moodly_timezones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='moodly.db')
+    parser.add_argument('--batch', type=int, default=5000, help='rows per transaction')
+    parser.add_argument('--recompute', action='store_true', help='rewrite every row, not only missing ones')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    moodly_timezones.add_columns(conn.cursor())
+    conn.commit()
+    start = time.perf_counter()
+    updated = moodly_timezones.backfill(conn, batch=args.batch, recompute=args.recompute)
+    conn.close()
+    print(f"Updated local_date on {updated} mood entries in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
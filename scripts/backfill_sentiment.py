@@ -0,0 +1,38 @@
+"""
+Backfill text_sentiment and text_emotion on mood and journal entries from their text.
+
+The app runs the same migration for unscored rows when the schema is set up with backfill;
+use this to run it ahead of a deploy, or with --recompute after changing the lexicon.
+
+Usage: python scripts/backfill_sentiment.py [--db PATH] [--batch N] [--recompute]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import moodly_sentiment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='moodly.db')
+    parser.add_argument('--batch', type=int, default=2000, help='rows per transaction')
+    parser.add_argument('--recompute', action='store_true', help='rescore every row, not only unscored ones')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    moodly_sentiment.add_columns(conn.cursor())
+    conn.commit()
+    start = time.perf_counter()
+    updated = moodly_sentiment.backfill(conn, batch=args.batch, recompute=args.recompute)
+    conn.close()
+    print(f"Scored text sentiment on {updated} entries in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark the async API (moodly_asgi under uvicorn) against moodly_api under gunicorn.
+
+Both servers talk to scripts/fake_openai.py, which answers each chat completion after
+--latency seconds (2s by default, roughly a real gpt-3.5 insight). The workload is
+--requests POST /api/moods with up to --concurrency in flight, then a burst of reads;
+with AI calls in the request path the sync server is bounded by workers x threads,
+the async one by the event loop.
+
+Usage: python scripts/bench_async.py [--requests N] [--concurrency N] [--latency SECONDS]
+                                     [--workers N] [--users N] [--entries N]
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from http.cookies import SimpleCookie
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import PASSWORD, free_port, percentile, seed_database
+from bench_server import wait_for_port
+from generate_dataset import create_schema
+
+MOOD = {'mood_score': 7, 'energy_level': 6, 'anxiety_level': 3, 'sleep_quality': 8, 'notes': 'bench'}
+
+
+def start_server(mode, workdir, workers, env):
+    port = free_port()
+    env = dict(env, PORT=str(port), HOST='127.0.0.1', WEB_CONCURRENCY=str(workers))
+    if mode == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'moodly_api:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'moodly_asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port, process)
+    return process, port
+
+
+def login(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('POST', '/api/auth/login', body=json.dumps({'username': 'bench0', 'password': PASSWORD}),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    cookies = SimpleCookie()
+    for header in response.headers.get_all('Set-Cookie') or ():
+        cookies.load(header)
+    if response.status != 200 or not cookies:
+        raise SystemExit(f"login failed with {response.status}")
+    return '; '.join(f'{key}={morsel.value}' for key, morsel in cookies.items())
+
+
+async def send_request(port, method, path, cookie, payload=None):
+    """One request on its own connection; returns the status (0 on a connection error)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    head = (f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nCookie: {cookie}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n')
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(head.encode() + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        writer.close()
+        return int(status_line.split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+async def run_load(port, cookie, method, path, payload, requests, concurrency, expected):
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with gate:
+            start = time.perf_counter()
+            status = await send_request(port, method, path, cookie, payload)
+            latencies.append(time.perf_counter() - start)
+            if status != expected:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'rps': requests / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400, help='POST /api/moods requests')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=2.0, help='fake OpenAI seconds per completion')
+    parser.add_argument('--workers', type=int, default=0, help='processes for both servers (default: auto)')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--entries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from moodly_server import worker_count
+    workers = args.workers or worker_count()
+    openai_port = free_port()
+    fake = subprocess.Popen([sys.executable, os.path.join(ROOT, 'scripts', 'fake_openai.py'),
+                             '--port', str(openai_port), '--latency', str(args.latency)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+               OPENAI_API_KEY='fake', OPENAI_BASE_URL=f'http://127.0.0.1:{openai_port}/v1',
+               STORAGE_BACKEND='local', LOG_LEVEL='WARNING')
+
+    print(f"Async benchmark: {args.requests} POST /api/moods, {args.concurrency} in flight, "
+          f"OpenAI latency {args.latency}s, {workers} workers "
+          f"(gunicorn x {os.environ.get('GUNICORN_THREADS', '4')} threads)")
+    print("-" * 100)
+    try:
+        for mode in ('gunicorn', 'uvicorn'):
+            workdir = tempfile.mkdtemp(prefix='moodly-async-bench-')
+            process = None
+            try:
+                db_path = os.path.join(workdir, 'moodly.db')
+                create_schema('api', db_path)
+                seed_database('api', db_path, args.users, args.entries, args.seed)
+                process, port = start_server(mode, workdir, workers, env)
+                cookie = login(port)
+                workloads = (
+                    ('POST /api/moods', 'POST', '/api/moods', MOOD, args.requests, 201),
+                    ('GET /api/analytics', 'GET', '/api/analytics', None, args.requests, 200),
+                )
+                print(mode)
+                for name, method, path, payload, requests, expected in workloads:
+                    stats = asyncio.run(run_load(port, cookie, method, path, payload, requests,
+                                                 args.concurrency, expected))
+                    print(f"  {name:<20} {stats['elapsed']:>7.2f} s  {stats['rps']:>8.1f} req/s  "
+                          f"p50 {stats['p50_ms']:>8.1f} ms  p99 {stats['p99_ms']:>8.1f} ms  errors {stats['errors']}")
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=30)
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    main()
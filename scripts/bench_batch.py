@@ -0,0 +1,118 @@
+"""
+Benchmark React page loads: sequential API calls vs one /api/batch round trip.
+
+Seeds moodly_api's schema, serves it over HTTP (werkzeug in-process, or gunicorn with
+--gunicorn) and loads each page's data both ways. --rtt adds a simulated network round
+trip per HTTP request, since localhost hides the cost the batch endpoint removes.
+
+Usage: python scripts/bench_batch.py [--users N] [--entries N] [--loads N] [--rtt MS] [--gunicorn]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import HttpClient, api_login, free_port, percentile, seed_api, start_gunicorn
+
+# The calls each page makes on load
+PAGES = {
+    'DashboardPage': ('/api/auth/me', '/api/moods', '/api/goals', '/api/analytics'),
+    'AnalyticsPage': ('/api/auth/me', '/api/analytics', '/api/moods'),
+    'MoodTrackerPage': ('/api/auth/me', '/api/moods'),
+}
+
+
+class SlowClient(HttpClient):
+    """HttpClient that sleeps `rtt` seconds per request to stand in for network latency"""
+
+    def __init__(self, base_url, rtt):
+        super().__init__(base_url)
+        self.rtt = rtt
+
+    def request(self, method, path, json=None, data=None):
+        time.sleep(self.rtt)
+        return super().request(method, path, json=json, data=data)
+
+
+def load_sequential(client, paths):
+    return all(client.request('GET', path) == 200 for path in paths)
+
+
+def load_batched(client, paths):
+    batch = {'requests': [{'id': path, 'method': 'GET', 'path': path} for path in paths]}
+    return client.request('POST', '/api/batch', json=batch) == 200
+
+
+def measure(func, client, paths, loads):
+    timings = []
+    failures = 0
+    for _ in range(loads):
+        start = time.perf_counter()
+        if not func(client, paths):
+            failures += 1
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return percentile(timings, 50), percentile(timings, 90), failures
+
+
+def serve_in_thread(app):
+    from werkzeug.serving import make_server
+    port = free_port()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--entries', type=int, default=365)
+    parser.add_argument('--loads', type=int, default=200, help='page loads per case')
+    parser.add_argument('--rtt', type=float, default=0.0, help='simulated round trip in ms')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--gunicorn', action='store_true')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodly-batch-bench-')
+    os.chdir(workdir)
+    server = process = None
+    try:
+        app = seed_api(args.users, args.entries, args.seed)
+        if args.gunicorn:
+            process, base_url = start_gunicorn('moodly_api', workdir, args.workers)
+        else:
+            server, base_url = serve_in_thread(app)
+        client = SlowClient(base_url, args.rtt / 1000)
+        api_login(client, 0)
+
+        print(f"Batch API benchmark ({args.loads} loads per case, {args.entries} entries/user, "
+              f"rtt {args.rtt:g} ms, {'gunicorn' if args.gunicorn else 'werkzeug'})")
+        print(f"{'page':<16} {'calls':>5} {'sequential p50':>15} {'p90':>8} {'batched p50':>12} {'p90':>8} {'saved':>7}")
+        print("-" * 78)
+        for page, paths in PAGES.items():
+            measure(load_sequential, client, paths, 5)
+            measure(load_batched, client, paths, 5)
+            seq50, seq90, seq_failed = measure(load_sequential, client, paths, args.loads)
+            bat50, bat90, bat_failed = measure(load_batched, client, paths, args.loads)
+            failed = f"  ({seq_failed + bat_failed} failed)" if seq_failed or bat_failed else ''
+            print(f"{page:<16} {len(paths):>5} {seq50:>12.2f} ms {seq90:>8.2f} {bat50:>9.2f} ms {bat90:>8.2f} "
+                  f"{(1 - bat50 / seq50) * 100:>6.0f}%{failed}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
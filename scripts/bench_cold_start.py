@@ -0,0 +1,146 @@
+"""
+Cold-start benchmark for moodly.py.
+
+Measures, in fresh interpreter processes:
+  - import time of moodly (python -X importtime, cumulative microseconds)
+  - time to first response (import + create app + first GET /health)
+  - network connections attempted during import (must be zero)
+
+Usage: python scripts/bench_cold_start.py [--runs N] [--max-import-ms MS] [--json PATH]
+Exits non-zero when a budget is exceeded, so CI can track regressions.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Children run in a scratch directory so the first request never touches the repo's moodly.db
+WORKDIR = None
+
+FIRST_RESPONSE_SNIPPET = """
+import socket, sys, time, json
+start = time.perf_counter()
+connections = []
+_connect = socket.socket.connect
+def record_connect(self, address):
+    connections.append(str(address))
+    return _connect(self, address)
+socket.socket.connect = record_connect
+sys.path.insert(0, {root!r})
+import moodly
+imported = time.perf_counter()
+import_connections = list(connections)
+client = moodly.app.test_client()
+response = client.get('/health')
+done = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'first_response_ms': (done - start) * 1000,
+    'status': response.status_code,
+    'import_connections': import_connections,
+}}))
+"""
+
+
+def run_importtime():
+    """Return (total_us, heaviest direct imports) for `import moodly` from -X importtime output"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import moodly'],
+        cwd=WORKDIR, capture_output=True, text=True, env=child_env()
+    )
+    total = None
+    children = []
+    direct_imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|', 2)
+        name = name[1:].rstrip()
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        # Output is post-order: a module's direct imports are listed just before it
+        if depth == 1:
+            children.append((int(cumulative_us), name.strip()))
+        elif depth == 0:
+            if name == 'moodly':
+                total = int(cumulative_us)
+                direct_imports = children
+            children = []
+    return total, sorted(direct_imports, reverse=True)[:10]
+
+
+def run_first_response():
+    result = subprocess.run(
+        [sys.executable, '-c', FIRST_RESPONSE_SNIPPET.format(root=ROOT)],
+        cwd=WORKDIR, capture_output=True, text=True, env=child_env()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault('STORAGE_BACKEND', 'local')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=None)
+    parser.add_argument('--max-first-response-ms', type=float, default=None)
+    parser.add_argument('--json', dest='json_path', default=None, help='write results to this file')
+    args = parser.parse_args()
+
+    global WORKDIR
+    WORKDIR = tempfile.mkdtemp(prefix='moodly-coldstart-')
+    try:
+        total_us, top_level = run_importtime()
+        runs = [run_first_response() for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    first_response_ms = statistics.median(run['first_response_ms'] for run in runs)
+    connections = sorted({conn for run in runs for conn in run['import_connections']})
+
+    print("Cold start benchmark (moodly.py)")
+    print("-" * 60)
+    if total_us is not None:
+        print(f"-X importtime cumulative: {total_us / 1000:.1f} ms")
+    print("Heaviest imports made by moodly:")
+    for cumulative, name in top_level:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    print(f"Import (median of {args.runs}):            {import_ms:.1f} ms")
+    print(f"Time to first response (median):   {first_response_ms:.1f} ms")
+    print(f"Network connections during import: {len(connections)}")
+
+    results = {
+        'importtime_ms': total_us / 1000 if total_us is not None else None,
+        'import_ms': import_ms,
+        'first_response_ms': first_response_ms,
+        'import_connections': connections,
+    }
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if connections:
+        failures.append(f"import opened network connections: {connections}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import took {import_ms:.1f} ms (budget {args.max_import_ms} ms)")
+    if args.max_first_response_ms is not None and first_response_ms > args.max_first_response_ms:
+        failures.append(f"first response took {first_response_ms:.1f} ms (budget {args.max_first_response_ms} ms)")
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
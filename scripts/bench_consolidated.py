@@ -0,0 +1,186 @@
+"""
+Benchmark startup time and memory of the combined app against the separate ones.
+
+Before moodly_app, serving both the web pages and the React app's API meant two deployments:
+moodly:app and moodly_api:app, each with its own gunicorn master and workers. This boots
+that pair and the single moodly_app:app with the same gunicorn profile (gunicorn.conf.py,
+--workers each) and reports, per setup:
+
+  startup   seconds from launch until every health endpoint answers
+  first     latency of the first real request per app (cold code paths, schema check)
+  RSS/PSS   resident and proportional set size summed over all processes after warm-up
+            (PSS splits pages shared by forked workers, so it is the fairer total)
+
+Usage: python scripts/bench_consolidated.py [--workers N] [--runs N] [--users N] [--entries N]
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import PASSWORD, free_port, seed_database
+from generate_dataset import create_schema
+
+# Deployment -> [(app module, health path, login + first request)]
+SETUPS = {
+    'separate (moodly + moodly_api)': [
+        ('moodly', '/health', ('/login', 'form', '/api/mood_data')),
+        ('moodly_api', '/api/health', ('/api/auth/login', 'json', '/api/moods')),
+    ],
+    'combined (moodly_app)': [
+        ('moodly_app', '/api/health', ('/api/auth/login', 'json', '/api/moods')),
+    ],
+}
+
+
+def children(pid):
+    """pid and all of its descendants"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    parents.setdefault(int(f.read().rsplit(')', 1)[1].split()[1]), []).append(int(entry))
+            except OSError:
+                continue
+    found, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        found.append(current)
+        queue.extend(parents.get(current, ()))
+    return found
+
+
+def memory_kb(pid):
+    """(RSS, PSS) in kB for one process; PSS falls back to RSS without smaps_rollup"""
+    rss = pss = None
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    rss = int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = pss = int(line.split()[1])
+    return rss or 0, pss or rss or 0
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        response.read()
+        return response
+    finally:
+        connection.close()
+
+
+def login_and_fetch(port, login):
+    login_path, style, first_path = login
+    if style == 'json':
+        body = json.dumps({'username': 'bench0', 'password': PASSWORD})
+        content_type = 'application/json'
+    else:
+        body = f'username=bench0&password={PASSWORD}'
+        content_type = 'application/x-www-form-urlencoded'
+    response = request(port, 'POST', login_path, body, {'Content-Type': content_type})
+    cookie = '; '.join(header.split(';', 1)[0] for header in response.headers.get_all('Set-Cookie') or ())
+    start = time.perf_counter()
+    response = request(port, 'GET', first_path, headers={'Cookie': cookie})
+    elapsed = time.perf_counter() - start
+    if response.status != 200:
+        raise SystemExit(f"GET {first_path} returned {response.status}")
+    return elapsed
+
+
+def run_setup(apps, workdir, workers):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+               HOST='127.0.0.1', WEB_CONCURRENCY=str(workers), STORAGE_BACKEND='local', LOG_LEVEL='WARNING')
+    # Empty rather than unset, so moodly's load_dotenv() does not bring a key back from .env
+    env['OPENAI_API_KEY'] = ''
+    processes = []
+    try:
+        start = time.perf_counter()
+        for module, health, _ in apps:
+            port = free_port()
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), f'{module}:app'],
+                cwd=workdir, env=dict(env, PORT=str(port)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes.append((process, port, health))
+        pending = list(processes)
+        while pending:
+            if time.perf_counter() - start > 60:
+                raise SystemExit("servers did not start")
+            for item in list(pending):
+                process, port, health = item
+                if process.poll() is not None:
+                    raise SystemExit(f"server exited with {process.returncode}")
+                try:
+                    if request(port, 'GET', health).status == 200:
+                        pending.remove(item)
+                except OSError:
+                    pass
+            time.sleep(0.01)
+        startup = time.perf_counter() - start
+
+        first = sum(login_and_fetch(port, login) for (_, port, _), (_, _, login) in zip(processes, apps))
+        # Let every worker finish booting (post_worker_init) before measuring memory
+        time.sleep(1.0)
+        rss = pss = count = 0
+        for process, _, _ in processes:
+            for pid in children(process.pid):
+                process_rss, process_pss = memory_kb(pid)
+                rss += process_rss
+                pss += process_pss
+                count += 1
+        return {'startup': startup, 'first': first, 'rss': rss / 1024, 'pss': pss / 1024, 'processes': count}
+    finally:
+        for process, _, _ in processes:
+            process.terminate()
+        for process, _, _ in processes:
+            process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers per deployment')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--entries', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Consolidation benchmark: {args.workers} gunicorn workers per deployment, median of {args.runs} runs")
+    print("-" * 100)
+    for name, apps in SETUPS.items():
+        results = []
+        for _ in range(args.runs):
+            workdir = tempfile.mkdtemp(prefix='moodly-consolidated-bench-')
+            try:
+                db_path = os.path.join(workdir, 'moodly.db')
+                create_schema('web', db_path)
+                seed_database('api', db_path, args.users, args.entries, args.seed)
+                results.append(run_setup(apps, workdir, args.workers))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+        median = {key: statistics.median(result[key] for result in results) for key in results[0]}
+        print(f"  {name:<32} startup {median['startup']:>6.2f} s  first request {median['first'] * 1000:>7.1f} ms  "
+              f"{median['processes']:>3.0f} processes  RSS {median['rss']:>7.1f} MB  PSS {median['pss']:>7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
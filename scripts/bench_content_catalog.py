@@ -0,0 +1,96 @@
+"""
+Benchmark per-request allocation of the static content catalogs.
+
+"before" rebuilds each section the way the route functions used to: a nested dict/list
+literal (with url_for calls inline) evaluated on every request. "after" is the lookup
+into the preloaded moodly_content catalog.
+
+Usage: python scripts/bench_content_catalog.py [iterations]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (section, resolves $url links)
+SECTIONS = (
+    ('journal_templates', False),
+    ('wellness_tips', False),
+    ('wellness_categories', False),
+    ('wellness_tools', True),
+    ('breathing_exercises', False),
+    ('meditations', False),
+    ('coping_strategies', True),
+)
+
+
+def literal_source(value):
+    """Python source for a catalog value, with $url links as url_for() calls"""
+    if isinstance(value, dict):
+        target = value.get('$url')
+        if target is not None and len(value) == 1:
+            args = ''.join(f", {key}={item!r}" for key, item in target.get('values', {}).items())
+            return f"url_for({target['endpoint']!r}{args})"
+        return '{' + ', '.join(f"{key!r}: {literal_source(item)}" for key, item in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(literal_source(item) for item in value) + ']'
+    return repr(value)
+
+
+def allocated(func):
+    """Bytes allocated by one call whose result is kept alive"""
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    del result
+    return peak - start
+
+
+def per_call_us(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    os.environ.setdefault('STORAGE_BACKEND', 'local')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from flask import request, url_for
+    import moodly
+    from moodly_content import catalog
+
+    print(f"Content catalog benchmark ({iterations} calls per case)")
+    print(f"{'section':<22} {'before B':>10} {'after B':>8} {'before us':>10} {'after us':>9}")
+    print("-" * 63)
+    totals = [0, 0]
+    with moodly.app.test_request_context('/'):
+        for name, linked in SECTIONS:
+            namespace = {'url_for': url_for}
+            exec(f"def build():\n    return {literal_source(catalog.get(name))}\n", namespace)
+            before = namespace['build']
+            if linked:
+                after = lambda name=name: catalog.linked(name, url_for, request.script_root)
+            else:
+                after = lambda name=name: catalog.get(name)
+            after()
+
+            tracemalloc.start()
+            before_bytes, after_bytes = allocated(before), allocated(after)
+            tracemalloc.stop()
+            totals[0] += before_bytes
+            totals[1] += after_bytes
+            print(f"{name:<22} {before_bytes:>10,} {after_bytes:>8,} "
+                  f"{per_call_us(before, iterations):>10.1f} {per_call_us(after, iterations):>9.2f}")
+    print("-" * 63)
+    print(f"{'total per request set':<22} {totals[0]:>10,} {totals[1]:>8,}")
+
+
+if __name__ == '__main__':
+    main()
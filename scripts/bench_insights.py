@@ -0,0 +1,152 @@
+"""
+Benchmark the offline insight rules (moodly_insights) against the if-chain get_fallback_insight they replaced.
+
+Checks first that both produce the same text for --check random entries (notes drawn from a
+vocabulary including every keyword, in mixed case). Then reports microseconds per entry for
+notes of each --lengths (in words), with no keywords and with 2% of words keywords, through
+  legacy    the old function: an if-chain per score and notes.lower() once per keyword
+  text      moodly_insights.insight_text, what get_fallback_insight now returns
+over --batch entries each, and entries per second through insight_text.
+
+Usage: python scripts/bench_insights.py [--lengths 10,100,2000] [--batch N] [--check N] [--seed N]
+"""
+import argparse
+import os
+import platform
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import moodly_insights
+
+FILLER = ('today', 'i', 'went', 'to', 'the', 'park', 'and', 'then', 'had', 'lunch', 'with', 'my', 'friend',
+          'it', 'was', 'fine', 'think', 'work', 'is', 'busy', 'though', 'tired', 'call', 'mom', 'later')
+KEYWORDS = [word for words, _ in moodly_insights.KEYWORDS for word in words]
+
+
+def legacy_fallback_insight(mood_data):
+    """get_fallback_insight before moodly_insights: if-chains and a lower() per keyword"""
+    mood_score = mood_data.get('mood_score', 5)
+    energy_level = mood_data.get('energy_level', 5)
+    anxiety_level = mood_data.get('anxiety_level', 5)
+    sleep_quality = mood_data.get('sleep_quality', 5)
+    notes = mood_data.get('notes', '')
+    
+    # Analyze patterns and provide appropriate insights
+    insights = []
+    suggestions = []
+    encouragement = []
+    
+    # Mood analysis
+    if mood_score >= 8:
+        insights.append("You're experiencing a positive mood today")
+        encouragement.append("Keep nurturing this positive energy!")
+    elif mood_score >= 6:
+        insights.append("Your mood is in a stable, balanced range")
+        suggestions.append("Consider what's working well for you and try to maintain these positive habits")
+    elif mood_score >= 4:
+        insights.append("Your mood seems a bit low today")
+        suggestions.append("Try gentle activities like a short walk, listening to music, or connecting with a friend")
+    else:
+        insights.append("You're going through a challenging time")
+        suggestions.append("Be gentle with yourself and consider reaching out for support if needed")
+    
+    # Energy analysis
+    if energy_level <= 3:
+        suggestions.append("Low energy detected - prioritize rest and gentle self-care activities")
+    elif energy_level >= 8:
+        insights.append("Your energy levels are high")
+        
+    # Anxiety analysis
+    if anxiety_level >= 7:
+        suggestions.append("High anxiety noted - try deep breathing exercises or mindfulness techniques")
+    elif anxiety_level <= 3:
+        insights.append("Your anxiety levels appear manageable today")
+        
+    # Sleep analysis
+    if sleep_quality <= 3:
+        suggestions.append("Poor sleep quality can impact mood - consider establishing a calming bedtime routine")
+    elif sleep_quality >= 8:
+        insights.append("Good sleep quality is supporting your overall well-being")
+    
+    # Notes analysis
+    if notes and any(word in notes.lower() for word in ['stress', 'worried', 'anxious', 'overwhelmed']):
+        suggestions.append("Consider breaking down overwhelming tasks into smaller, manageable steps")
+    elif notes and any(word in notes.lower() for word in ['happy', 'good', 'great', 'excited', 'grateful']):
+        encouragement.append("It's wonderful to see positive moments in your day!")
+    
+    # Default encouragement
+    if not encouragement:
+        encouragement = [
+            "Remember that tracking your mood is a valuable step in understanding yourself better",
+            "Every day is a new opportunity for growth and self-compassion",
+            "You're taking positive steps by monitoring your mental health"
+        ]
+    
+    # Combine insights
+    result = ". ".join(insights[:2])
+    if suggestions:
+        result += ". " + suggestions[0]
+    result += ". " + encouragement[0] + "."
+    
+    return result
+
+
+def random_entry(rng, words, keyword_rate=0.02):
+    vocabulary = []
+    for _ in range(words):
+        word = rng.choice(KEYWORDS) if rng.random() < keyword_rate else rng.choice(FILLER)
+        vocabulary.append(word.upper() if rng.random() < 0.1 else word)
+    return {
+        'mood_score': rng.randint(1, 10),
+        'energy_level': rng.randint(1, 10),
+        'anxiety_level': rng.randint(1, 10),
+        'sleep_quality': rng.randint(1, 10),
+        'notes': ' '.join(vocabulary),
+    }
+
+
+def per_entry(function, entries, runs=3):
+    """Best of `runs` passes, in seconds per entry; the first pass also warms the rule cache"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(entries)
+        best = min(best, time.perf_counter() - start)
+    return best / len(entries)
+
+
+def each(function):
+    return lambda entries: [function(entry) for entry in entries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lengths', default='10,100,2000', help='comma-separated note lengths in words')
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--check', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    entries = [random_entry(rng, rng.choice((0, 1, 5, 30))) for _ in range(args.check)]
+    mismatches = sum(legacy_fallback_insight(entry) != moodly_insights.insight_text(entry) for entry in entries)
+    print(f"Insight rules benchmark ({os.cpu_count()} CPUs, Python {platform.python_version()})")
+    print(f"  {args.check} random entries, {mismatches} texts differ from the legacy function")
+    print("-" * 100)
+    for words in [int(length) for length in args.lengths.split(',')]:
+        for keyword_rate in (0, 0.02):
+            entries = [random_entry(rng, words, keyword_rate) for _ in range(args.batch)]
+            legacy = per_entry(each(legacy_fallback_insight), entries)
+            text = per_entry(each(moodly_insights.insight_text), entries)
+            print(f"  {words:>5} words {keyword_rate:>4.0%} keywords  legacy {legacy * 1e6:>7.1f} us  "
+                  f"text {text * 1e6:>7.1f} us ({1 / text:>8.0f} entries/s)")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Load test for the Flask backends.
+
+Seeds a synthetic moodly.db (users x entries, via generate_dataset.py) in a scratch directory, then drives
+moodly_api.py and moodly.py endpoints either in-process through the WSGI test client
+or against a real gunicorn server, and reports req/s and latency percentiles.
+
+Usage: python scripts/bench_load.py [--target api|web|all] [--users N] [--entries N]
+                                    [--requests N] [--auth-requests N] [--concurrency N] [--gunicorn --workers N]
+                                    [--json PATH] [--compare BASELINE.json] [--max-regression PCT]
+Exits non-zero when --compare finds a scenario whose p50 regressed by more than PCT percent.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_dataset import SQLiteWriter, generate
+
+PASSWORD = 'benchpass'
+
+# Minimal stand-ins used in-process when the repo's templates folder is not present
+WEB_TEMPLATES = {
+    'auth/login.html': "<form method=post><input name=username><input name=password></form>",
+    'dashboard.html': "<h1>{{ user.username }}</h1><ul>{% for m in recent_moods %}<li>{{ m }}</li>{% endfor %}</ul>",
+    'mood_tracker.html': "<h1>{{ user.username }}</h1>{{ stats }}{{ weekly_trends }}{{ mood_distribution }}"
+                         "<ul>{% for m in recent_moods %}<li>{{ m }}</li>{% endfor %}</ul>",
+}
+
+
+def seed_database(schema, db_path, users, entries, seed):
+    """Fill db_path with generate_dataset histories for users bench0..benchN ending today"""
+    writer = SQLiteWriter(db_path)
+    today = datetime.combine(date.today(), datetime.min.time()) + timedelta(days=1)
+    generate(writer, schema, users, entries, days=90, seed=seed, prefix='bench', password=PASSWORD, end=today)
+    writer.close()
+
+
+def seed_api(users, entries, seed):
+    """Create and fill moodly_api's schema in the current directory"""
+    import moodly_api
+    moodly_api.init_database()
+    seed_database('api', moodly_api.DATABASE, users, entries, seed)
+    return moodly_api.app
+
+
+def seed_web(users, entries, seed):
+    """Create and fill moodly.py's schema in the current directory"""
+    import moodly
+    moodly.init_db()
+    seed_database('web', moodly.DATABASE_PATH, users, entries, seed)
+
+    from jinja2 import ChoiceLoader, DictLoader
+    app = moodly.app
+    app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, DictLoader(WEB_TEMPLATES)])
+    return app
+
+
+def api_scenarios():
+    counter = iter(range(10 ** 9))
+
+    def register():
+        n = next(counter)
+        return 'POST', '/api/auth/register', {'json': {'username': f'new{n}', 'email': f'new{n}@example.com',
+                                                       'password': PASSWORD}}
+
+    return [
+        ('POST /api/auth/register', register, (201,), True),
+        ('POST /api/auth/login', lambda: ('POST', '/api/auth/login', {'json': {'username': 'bench0', 'password': PASSWORD}}), (200,), True),
+        ('POST /api/moods', lambda: ('POST', '/api/moods', {'json': {
+            'mood_score': 7, 'energy_level': 6, 'anxiety_level': 3, 'sleep_quality': 8, 'notes': 'Feeling good today'}}), (201,), False),
+        ('GET /api/analytics', lambda: ('GET', '/api/analytics', {}), (200,), False),
+    ]
+
+
+def web_scenarios():
+    return [
+        ('POST /login', lambda: ('POST', '/login', {'data': {'username': 'bench0', 'password': PASSWORD}}), (302,), True),
+        ('GET /dashboard', lambda: ('GET', '/dashboard', {}), (200,), False),
+        ('GET /mood_tracker', lambda: ('GET', '/mood_tracker', {}), (200,), False),
+    ]
+
+
+def api_login(client, i):
+    client.request('POST', '/api/auth/login', json={'username': f'bench{i}', 'password': PASSWORD})
+
+
+def web_login(client, i):
+    client.request('POST', '/login', data={'username': f'bench{i}', 'password': PASSWORD})
+
+
+class WsgiClient:
+    """Flask test client with its own cookie jar (one logged-in user)"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, data=None):
+        return self.client.open(path, method=method, json=json, data=data).status_code
+
+
+class HttpClient:
+    """urllib client with its own cookie jar, for a real server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+                                                  NoRedirect())
+
+    def request(self, method, path, json=None, data=None):
+        headers = {}
+        body = None
+        if json is not None:
+            body = _json_bytes(json)
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _json_bytes(payload):
+    return json.dumps(payload).encode()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(clients, build_request, expected, requests, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        client = clients[worker_id % len(clients)]
+        local = []
+        bad = 0
+        for _ in range(worker_id, requests, concurrency):
+            method, path, kwargs = build_request()
+            start = time.perf_counter()
+            status = client.request(method, path, **kwargs)
+            local.append(time.perf_counter() - start)
+            if status not in expected:
+                bad += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += bad
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(module, workdir, workers):
+    if not shutil.which('gunicorn'):
+        raise SystemExit("gunicorn is not installed (pip install -r requirements.txt)")
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    process = subprocess.Popen(
+        ['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', '--chdir', workdir, f'{module}:app'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit(f"gunicorn for {module} did not start")
+
+
+def run_target(target, args, workdir):
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    seed, module, scenarios, login = {
+        'api': (seed_api, 'moodly_api', api_scenarios, api_login),
+        'web': (seed_web, 'moodly', web_scenarios, web_login),
+    }[target]
+
+    seed_start = time.perf_counter()
+    app = seed(args.users, args.entries, args.seed)
+    seed_s = time.perf_counter() - seed_start
+    print(f"\n[{target}] seeded {args.users} users x {args.entries} entries in {seed_s:.2f} s")
+
+    process = None
+    try:
+        if args.gunicorn:
+            process, base_url = start_gunicorn(module, workdir, args.workers)
+            make_client = lambda: HttpClient(base_url)
+        else:
+            make_client = lambda: WsgiClient(app)
+
+        clients = []
+        for i in range(min(args.users, max(args.concurrency, 1) * 4)):
+            client = make_client()
+            login(client, i)
+            clients.append(client)
+
+        results = {}
+        for name, build_request, expected, hashes_password in scenarios():
+            # Password hashing is deliberately slow, so auth scenarios get their own request count
+            requests = args.auth_requests if hashes_password else args.requests
+            run_scenario(clients, build_request, expected, min(args.warmup, requests), args.concurrency)
+            stats = run_scenario(clients, build_request, expected, requests, args.concurrency)
+            results[f'{target} {name}'] = stats
+            print(f"  {name:<28} {stats['rps']:>9.1f} req/s  p50 {stats['p50_ms']:>8.2f} ms  "
+                  f"p90 {stats['p90_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  errors {stats['errors']}")
+        return results
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        os.chdir(ROOT)
+
+
+def compare(results, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f"\nCompared with {baseline_path}:")
+    failures = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if not before or not before['p50_ms']:
+            continue
+        change = (stats['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+        print(f"  {name:<34} p50 {before['p50_ms']:>8.2f} -> {stats['p50_ms']:>8.2f} ms ({change:+.1f}%)  "
+              f"rps {before['rps']:>9.1f} -> {stats['rps']:>9.1f}")
+        if change > max_regression:
+            failures.append(f"{name}: p50 regressed {change:.1f}% (allowed {max_regression}%)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', choices=('api', 'web', 'all'), default='all')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--entries', type=int, default=200, help='mood entries per user')
+    parser.add_argument('--requests', type=int, default=500, help='timed requests per scenario')
+    parser.add_argument('--auth-requests', type=int, default=50, help='timed requests for register/login')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--gunicorn', action='store_true', help='benchmark a real gunicorn server instead of the test client')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--openai', action='store_true', help='keep OPENAI_API_KEY (default: fallback insights only)')
+    parser.add_argument('--json', dest='json_path', default=None, help='write results to this file')
+    parser.add_argument('--compare', default=None, help='baseline JSON from an earlier run')
+    parser.add_argument('--max-regression', type=float, default=20.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodly-load-')
+    os.environ.setdefault('STORAGE_BACKEND', 'local')
+    os.environ.setdefault('LOCAL_STORAGE_ROOT', os.path.join(workdir, 'uploads'))
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if not args.openai:
+        os.environ.pop('OPENAI_API_KEY', None)
+
+    targets = ('api', 'web') if args.target == 'all' else (args.target,)
+    mode = f'gunicorn -w {args.workers}' if args.gunicorn else 'WSGI test client'
+    print(f"Load benchmark ({mode}, {args.requests} requests per scenario, concurrency {args.concurrency})")
+    print("-" * 100)
+
+    results = {}
+    try:
+        for target in targets:
+            results.update(run_target(target, args, os.path.join(workdir, target)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'mode': mode,
+            'users': args.users,
+            'entries_per_user': args.entries,
+            'requests': args.requests,
+            'auth_requests': args.auth_requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = compare(results, args.compare, args.max_regression) if args.compare else []
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark daily mood aggregation: DATE(created_at) in UTC vs the stored, indexed local_date.
+
+Seeds a synthetic web-schema database with long histories and times the weekly-trend
+query from /mood_tracker and a full-history daily series, each the old way (a function
+per row, with and without a (user_id, created_at) index) and on (user_id, local_date).
+Also times the local_date backfill migration over the whole table.
+
+Usage: python scripts/bench_local_date.py [users] [entries-per-user] [iterations]
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_dataset import SQLiteWriter, create_schema, generate
+
+import moodly_timezones
+
+# name: (old SQL, new SQL, days back bound as the new query's second parameter)
+QUERIES = {
+    'weekly trend': (
+        '''SELECT DATE(created_at) as date, AVG(CAST(mood_score AS FLOAT)), COUNT(*) FROM mood_entries
+           WHERE user_id = ? AND created_at >= date('now', '-7 days')
+           GROUP BY DATE(created_at) ORDER BY date DESC''',
+        '''SELECT local_date as date, AVG(CAST(mood_score AS FLOAT)), COUNT(*) FROM mood_entries
+           WHERE user_id = ? AND local_date >= ?
+           GROUP BY local_date ORDER BY local_date DESC''',
+        7,
+    ),
+    'full history daily': (
+        '''SELECT DATE(created_at) as date, AVG(CAST(mood_score AS FLOAT)) FROM mood_entries
+           WHERE user_id = ? GROUP BY DATE(created_at) ORDER BY date''',
+        '''SELECT local_date as date, AVG(CAST(mood_score AS FLOAT)) FROM mood_entries
+           WHERE user_id = ? GROUP BY local_date ORDER BY local_date''',
+        None,
+    ),
+}
+
+
+def per_query_ms(conn, sql, params_for, users, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for user_id in users:
+            conn.execute(sql, params_for(user_id)).fetchall()
+    return (time.perf_counter() - start) / (iterations * len(users)) * 1000
+
+
+def plan(conn, sql, params):
+    return '; '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    workdir = tempfile.mkdtemp(prefix='moodly-localdate-bench-')
+    db_path = os.path.join(workdir, 'moodly.db')
+
+    try:
+        create_schema('web', db_path)
+        writer = SQLiteWriter(db_path)
+        end = datetime.combine(date.today(), datetime.min.time()) + timedelta(days=1)
+        generate(writer, 'web', users=users, entries_per_user=entries, days=entries // 3 or 1,
+                 prefix='bench', end=end)
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+        total = conn.execute('SELECT COUNT(*) FROM mood_entries').fetchone()[0]
+        print(f"Local date benchmark ({len(user_ids)} users, {total} entries, {iterations} iterations)")
+
+        conn.execute('UPDATE mood_entries SET local_date = NULL')
+        conn.commit()
+        start = time.perf_counter()
+        moodly_timezones.backfill(conn)
+        elapsed = time.perf_counter() - start
+        print(f"Backfill migration: {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)")
+        old_params = lambda user_id: (user_id,)
+
+        for name, (old_sql, new_sql, days) in QUERIES.items():
+            if days is None:
+                new_params = old_params
+            else:
+                new_params = lambda user_id, days=days: (user_id, moodly_timezones.local_today(None, days))
+            print("-" * 80)
+            print(name)
+            for index in ('user_id', '(user_id, created_at)'):
+                if index != 'user_id':
+                    conn.execute('CREATE INDEX IF NOT EXISTS bench_user_created ON mood_entries (user_id, created_at)')
+                    conn.execute('ANALYZE')
+                ms = per_query_ms(conn, old_sql, old_params, user_ids, iterations)
+                print(f"  {'DATE(created_at), ' + index + ' index':<46} {ms:>8.3f} ms  "
+                      f"[{plan(conn, old_sql, (user_ids[0],))}]")
+            conn.execute('DROP INDEX IF EXISTS bench_user_created')
+            new_ms = per_query_ms(conn, new_sql, new_params, user_ids, iterations)
+            print(f"  {'local_date, (user_id, local_date) index':<46} {new_ms:>8.3f} ms  "
+                  f"[{plan(conn, new_sql, new_params(user_ids[0]))}]")
+            old_rows = conn.execute(old_sql, (user_ids[0],)).fetchall()
+            new_rows = conn.execute(new_sql, new_params(user_ids[0])).fetchall()
+            print(f"  results {'match' if old_rows == new_rows else 'differ'} for UTC users")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark the caller-side cost of logging in request handlers.
+
+Compares print(), a plain StreamHandler and the queue-based moodly_logging setup,
+writing to a sink that simulates a slow stdout (e.g. a pipe to a busy log collector).
+
+Usage: python scripts/bench_logging.py [iterations] [sink_delay_us]
+"""
+import io
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodly_logging import JsonFormatter, SamplingFilter, configure_logging
+
+
+class SlowSink(io.TextIOBase):
+    """A text stream whose writes take `delay` seconds, like a blocked stdout"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        self.lines += text.count('\n')
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def timed(label, func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {elapsed / iterations * 1e6:>9.2f} us/call")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1e6
+    print(f"Logging overhead per call ({iterations} calls, sink write delay {delay * 1e6:.0f} us)")
+    print("-" * 64)
+
+    sink = SlowSink(delay)
+    timed('print() to slow stdout', lambda i: print(f"✅ Profile picture uploaded for user {i}", file=sink), iterations)
+
+    direct = logging.getLogger('bench.direct')
+    direct.propagate = False
+    handler = logging.StreamHandler(SlowSink(delay))
+    handler.setFormatter(JsonFormatter())
+    direct.addHandler(handler)
+    direct.setLevel(logging.INFO)
+    timed('StreamHandler + JSON (blocking)', lambda i: direct.info("Profile picture uploaded", extra={'user_id': i}), iterations)
+
+    queued_sink = SlowSink(delay)
+    listener = configure_logging(level='INFO', json_format=True, stream=queued_sink)
+    queued = logging.getLogger('moodly')
+    for queue_filter in queued.handlers[0].filters:
+        if isinstance(queue_filter, SamplingFilter):
+            queue_filter.rate_limit = 0
+    timed('QueueHandler + JSON (moodly_logging)', lambda i: queued.info("Profile picture uploaded", extra={'user_id': i}), iterations)
+
+    for queue_filter in queued.handlers[0].filters:
+        if isinstance(queue_filter, SamplingFilter):
+            queue_filter.rate_limit = 20
+            queue_filter.burst = 20
+    timed('QueueHandler, rate-limited hot message', lambda i: queued.info("Storage enabled: %s", True), iterations)
+
+    for queue_filter in queued.handlers[0].filters:
+        if isinstance(queue_filter, SamplingFilter):
+            queue_filter.rate_limit = 0
+            queue_filter.sample_rate = 0.01
+    timed('QueueHandler, 1% sampled INFO', lambda i: queued.info("Storage enabled: %s", True), iterations)
+
+    drain_start = time.perf_counter()
+    listener.stop()
+    print(f"\nBackground drain of queued records: {time.perf_counter() - drain_start:.2f} s "
+          f"({queued_sink.lines} lines written off the request thread)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark chart queries and storage: mood_entries rows vs the compact mood_series store.
+
+Seeds a synthetic web-schema database, builds mood_series, then times the three chart
+reads (/analytics' last-30 list and aggregate, /api/mood_data's 30-day daily averages)
+against mood_entries with the app's (user_id, local_date) index, the same plus a covering
+(user_id, created_at, mood_score) index, and the series. Results are checked for equality.
+
+Usage: python scripts/bench_mood_series.py [users] [entries-per-user] [iterations]
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_dataset import SQLiteWriter, create_schema, generate
+
+import moodly_series
+from moodly_timezones import local_today
+
+RECENT_SQL = '''
+    SELECT mood_score, local_date as date FROM mood_entries
+    WHERE user_id = ? ORDER BY created_at DESC LIMIT 30
+'''
+STATS_SQL = '''
+    SELECT AVG(mood_score), MAX(mood_score), MIN(mood_score), COUNT(*) FROM mood_entries WHERE user_id = ?
+'''
+DAILY_SQL = '''
+    SELECT local_date as date, AVG(CAST(mood_score AS FLOAT)) as avg_score FROM mood_entries
+    WHERE user_id = ? AND local_date >= ?
+    GROUP BY local_date ORDER BY local_date
+'''
+
+
+def sql_reads(conn, user_id):
+    return (conn.execute(RECENT_SQL, (user_id,)).fetchall(),
+            conn.execute(STATS_SQL, (user_id,)).fetchone(),
+            conn.execute(DAILY_SQL, (user_id, local_today(None, 30))).fetchall())
+
+
+def series_reads(conn, user_id):
+    return (moodly_series.recent(conn, user_id, 30),
+            moodly_series.stats(conn, user_id),
+            moodly_series.daily_averages(conn, user_id, 30))
+
+
+def per_user_ms(func, conn, users, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for user_id in users:
+            func(conn, user_id)
+    return (time.perf_counter() - start) / (iterations * len(users)) * 1000
+
+
+def same(a, b):
+    recent_a, stats_a, daily_a = a
+    recent_b, stats_b, daily_b = b
+    return (list(recent_a) == list(recent_b) and abs(stats_a[0] - stats_b[0]) < 1e-9
+            and tuple(stats_a[1:]) == tuple(stats_b[1:])
+            and [(day, round(score, 6)) for day, score in daily_a] == [(day, round(score, 6)) for day, score in daily_b])
+
+
+def table_bytes(conn, name):
+    try:
+        return conn.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (name,)).fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return None
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    workdir = tempfile.mkdtemp(prefix='moodly-series-bench-')
+    db_path = os.path.join(workdir, 'moodly.db')
+
+    try:
+        create_schema('web', db_path)
+        writer = SQLiteWriter(db_path)
+        end = datetime.combine(date.today(), datetime.min.time()) + timedelta(days=1)
+        generate(writer, 'web', users=users, entries_per_user=entries, days=entries // 3 or 1,
+                 prefix='bench', end=end)
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        moodly_series.create_table(conn.cursor())
+        start = time.perf_counter()
+        months = moodly_series.rebuild(conn)
+        build = time.perf_counter() - start
+        user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+        total = conn.execute('SELECT COUNT(*) FROM mood_entries').fetchone()[0]
+
+        print(f"Mood series benchmark ({len(user_ids)} users, {total} entries, {iterations} iterations)")
+        print(f"Built {months} user-months in {build * 1000:.0f} ms")
+        print("-" * 60)
+        rows = per_user_ms(sql_reads, conn, user_ids, iterations)
+        conn.execute('CREATE INDEX bench_mood_user_time ON mood_entries (user_id, created_at, mood_score)')
+        conn.execute('ANALYZE')
+        indexed = per_user_ms(sql_reads, conn, user_ids, iterations)
+        series = per_user_ms(series_reads, conn, user_ids, iterations)
+        print(f"  {'local_date index':<22} {rows:>8.3f} ms/user")
+        print(f"  {'covering index':<22} {indexed:>8.3f} ms/user")
+        print(f"  {'mood_series':<22} {series:>8.3f} ms/user  ({rows / series:.1f}x rows, {indexed / series:.1f}x covering)")
+
+        mismatched = [user_id for user_id in user_ids if not same(sql_reads(conn, user_id), series_reads(conn, user_id))]
+        print(f"  results {'match' if not mismatched else f'DIFFER for users {mismatched[:5]}'}")
+
+        print("-" * 60)
+        blob_bytes = conn.execute('SELECT SUM(LENGTH(data)) FROM mood_series').fetchone()[0] or 0
+        print(f"  {'series blobs':<22} {blob_bytes / 1024:>10.1f} KiB  {blob_bytes / total:>6.2f} B/entry")
+        for label, name in (('mood_series pages', 'mood_series'), ('covering index pages', 'bench_mood_user_time'),
+                            ('mood_entries pages', 'mood_entries')):
+            size = table_bytes(conn, name)
+            if size is None:
+                print("  (dbstat not compiled into this SQLite; page sizes unavailable)")
+                break
+            print(f"  {label:<22} {size / 1024:>10.1f} KiB  {size / total:>6.2f} B/entry")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
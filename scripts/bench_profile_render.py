@@ -0,0 +1,93 @@
+"""
+Microbenchmark for the profile page render path.
+
+Compares rendering /profile with the avatar URL stored at upload time against
+building a Cloudinary URL on every render, and measures the memoized URL builder.
+
+Usage: python scripts/bench_profile_render.py [iterations]
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Minimal profile template used when the repo's templates folder is not present
+PROFILE_TEMPLATE = """<html><body>
+<h1>{{ user.username }}</h1>
+{% if user.profile_picture_url %}<img src="{{ user.profile_picture_url }}" alt="avatar">{% endif %}
+<p>{{ user.bio or '' }}</p>
+</body></html>"""
+
+
+def timed(label, func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {iterations / elapsed:>10.0f} ops/s  {elapsed / iterations * 1e6:>8.1f} us/op")
+    return elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workdir = tempfile.mkdtemp(prefix='moodly-bench-')
+    os.chdir(workdir)
+    os.environ.setdefault('STORAGE_BACKEND', 'local')
+    os.environ.setdefault('LOCAL_STORAGE_ROOT', os.path.join(workdir, 'uploads'))
+
+    try:
+        import cloudinary
+        from jinja2 import ChoiceLoader, DictLoader
+        import moodly
+        from cloudinary_storage import build_profile_picture_url
+
+        moodly.init_db()
+        app = moodly.app
+        app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, DictLoader({'profile.html': PROFILE_TEMPLATE})])
+
+        conn = sqlite3.connect(moodly.DATABASE_PATH)
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT INTO users (username, email, password_hash, bio, avatar_url) VALUES (?, ?, ?, ?, ?)',
+            ('bench', 'bench@example.com', 'x', 'Benchmark user',
+             '/static/uploads/profiles/ab/cd/' + 'ab' * 32 + '.jpg')
+        )
+        user_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+
+        print(f"Profile render benchmark ({iterations} iterations)")
+        print("-" * 78)
+        timed('GET /profile (stored avatar_url)', lambda: client.get('/profile'), iterations)
+
+        cloudinary.config(cloud_name='bench', api_key='bench', api_secret='bench', secure=True)
+
+        def build_uncached():
+            cloudinary.CloudinaryImage(f"moodly/profiles/profile_{user_id}").build_url(
+                width=500, height=500, crop="fill", quality="auto:good", fetch_format="auto", secure=True
+            )
+
+        def profile_with_build_url():
+            build_uncached()
+            client.get('/profile')
+
+        timed('GET /profile + build_url per render (before)', profile_with_build_url, iterations)
+        timed('CloudinaryImage.build_url (uncached)', build_uncached, iterations)
+        timed('build_profile_picture_url (memoized)',
+              lambda: build_profile_picture_url(f"moodly/profiles/profile_{user_id}", 500, 500), iterations)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark AI prompts with recent history (moodly_prompts): tokens against the budget, and build cost.
+
+Generates --users users with scripts/generate_dataset.py ending today, then for each user
+builds the insight prompt for a new entry (moodly_api.mood_insight_messages) three ways:
+
+  entry     the entry alone, as before history was added
+  raw       the entry plus every entry of the last PROMPT_HISTORY_DAYS pasted in, one per line
+  budgeted  the entry plus the history summary, within --budget tokens
+
+and reports prompt tokens (p50, p99, max; counted with moodly_prompts.count_tokens) and the
+time to build the budgeted prompt from an empty cache (miss), from the cache with no new
+entries (hit), and after logging one more entry (update: one row read, summary rebuilt).
+
+With --server, also posts --posts moods through the API to scripts/fake_openai.py and
+prints the prompt token histograms the app exported, the API's reported count included.
+
+Usage: python scripts/bench_prompts.py [--users N] [--entries-per-user N] [--budget N] [--server] [--posts N]
+"""
+import argparse
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from bench_load import percentile
+from bench_shards import INSERT_MOOD
+
+ENTRY = {'mood_score': 4, 'energy_level': 3, 'anxiety_level': 7, 'sleep_quality': 4,
+         'notes': 'Couldn\'t focus at work. Too many deadlines, but dinner with friends helped.'}
+FAKE_PORT = 8097
+
+
+def message_tokens(messages):
+    import moodly_prompts
+    return sum(moodly_prompts.count_tokens(message['content']) + moodly_prompts.MESSAGE_TOKENS
+               for message in messages)
+
+
+def raw_messages(conn, user_id):
+    """The entry with the whole window pasted in: what adding history naively costs"""
+    import moodly_api
+    import moodly_prompts
+    rows = conn.execute(moodly_prompts.HISTORY_QUERY, moodly_prompts.History().query_args(user_id)).fetchall()
+    messages = moodly_api.mood_insight_messages(ENTRY)
+    messages[1]['content'] += '\n\nTheir recent entries:\n' + '\n'.join(
+        f"{day}: mood {mood}, energy {energy}, anxiety {anxiety}, sleep {sleep}. {note or ''}"
+        for _, day, mood, energy, anxiety, sleep, _, _, note in reversed(rows))
+    return messages
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def report(label, values, unit=''):
+    values = sorted(values)
+    print(f"  {label:<16} p50 {percentile(values, 50):>8.1f}{unit}  p99 {percentile(values, 99):>8.1f}{unit}  "
+          f"max {percentile(values, 100):>8.1f}{unit}")
+
+
+def measure(path, args):
+    import moodly_api
+    import moodly_prompts
+
+    moodly_prompts._histories.clear()
+    conn = sqlite3.connect(path)
+    user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+    tokens = {'entry': [], 'raw': [], 'budgeted': []}
+    seconds = {'miss': [], 'hit': [], 'update': []}
+
+    def build(user_id):
+        history = moodly_prompts.recent_history(user_id, conn)
+        return moodly_api.mood_insight_messages(ENTRY, history)
+
+    now = datetime.now(timezone.utc)
+    for user_id in user_ids:
+        tokens['entry'].append(message_tokens(moodly_api.mood_insight_messages(ENTRY)))
+        tokens['raw'].append(message_tokens(raw_messages(conn, user_id)))
+        seconds['miss'].append(timed(build, user_id))
+        tokens['budgeted'].append(message_tokens(build(user_id)))
+        seconds['hit'].append(timed(build, user_id))
+        conn.execute(INSERT_MOOD, (user_id, 6, 5, 4, 6, 'Slept well, calmer today', None,
+                                   now.strftime('%Y-%m-%d %H:%M:%S'), now.strftime('%Y-%m-%d')))
+        conn.commit()
+        seconds['update'].append(timed(build, user_id))
+    conn.close()
+
+    print(f"Prompt tokens per insight, {len(user_ids)} users, last {moodly_prompts.HISTORY_DAYS} days "
+          f"(budget {moodly_prompts.PROMPT_TOKEN_BUDGET}, "
+          f"{'tiktoken ' + moodly_prompts.TOKENIZER if moodly_prompts._get_encoding() else 'offline estimate'})")
+    for label, values in tokens.items():
+        report(label, values)
+    print(f"Time to build the budgeted prompt (Python {platform.python_version()}, SQLite {sqlite3.sqlite_version})")
+    for label, values in seconds.items():
+        report(label, [value * 1e6 for value in values], ' us')
+    over = sum(value > moodly_prompts.PROMPT_TOKEN_BUDGET for value in tokens['budgeted'])
+    assert not over, f"{over} prompts over budget"
+
+
+def through_server(path, args):
+    """Post moods through the API to the fake OpenAI and show the exported prompt token histograms"""
+    fake = subprocess.Popen([sys.executable, os.path.join(ROOT, 'scripts', 'fake_openai.py'),
+                             '--port', str(FAKE_PORT), '--latency', '0.01'], stdout=subprocess.DEVNULL)
+    try:
+        time.sleep(1)
+        import moodly_api
+        import moodly_db
+        conn = sqlite3.connect(path)
+        username = conn.execute('SELECT username FROM users ORDER BY id LIMIT 1').fetchone()[0]
+        conn.close()
+        client = moodly_api.create_app().test_client()
+        response = client.post('/api/auth/login', json={'username': username, 'password': 'moodly123'})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        for index in range(args.posts):
+            response = client.post('/api/moods', json=dict(ENTRY, mood_score=index % 10 + 1))
+            assert response.status_code == 201, response.get_data(as_text=True)
+        exported = {}
+        for line in client.get('/metrics').get_data(as_text=True).splitlines():
+            if line.startswith(('moodly_ai_prompt_tokens_sum', 'moodly_ai_prompt_tokens_count',
+                                'moodly_prompt_history_total')):
+                name, value = line.rsplit(' ', 1)
+                exported[name] = float(value)
+        print(f"Through the API to scripts/fake_openai.py ({args.posts} moods by {username}, "
+              f"{moodly_db.DATABASE_PATH}), mean prompt tokens per call:")
+        for part in ('total', 'history', 'reported'):
+            label = '{part="%s"}' % part
+            count = exported.get('moodly_ai_prompt_tokens_count' + label)
+            if count:
+                print(f"  {part:<16} {exported['moodly_ai_prompt_tokens_sum' + label] / count:>8.1f}")
+        lookups = [(name.split('"')[1], value) for name, value in exported.items()
+                   if name.startswith('moodly_prompt_history_total')]
+        print("  history lookups  " + ', '.join(f"{result} {value:.0f}" for result, value in lookups))
+    finally:
+        fake.terminate()
+        fake.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--entries-per-user', type=int, default=120)
+    parser.add_argument('--days', type=int, default=60, help='days of history generated')
+    parser.add_argument('--budget', type=int, default=None, help='PROMPT_TOKEN_BUDGET (default 600)')
+    parser.add_argument('--server', action='store_true', help='also post moods through the API to a fake OpenAI')
+    parser.add_argument('--posts', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodly-prompt-bench-')
+    try:
+        path = os.path.join(workdir, 'moodly.db')
+        subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'generate_dataset.py'), '--db', path,
+                        '--users', str(args.users), '--entries-per-user', str(args.entries_per_user),
+                        '--days', str(args.days), '--end', datetime.now(timezone.utc).strftime('%Y-%m-%d')],
+                       check=True, stdout=subprocess.DEVNULL)
+        if args.server:
+            os.environ['OPENAI_API_KEY'] = 'fake'
+            os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{FAKE_PORT}/v1'
+        import moodly_db
+        import moodly_prompts
+        moodly_db.DATABASE_PATH = path
+        if args.budget:
+            moodly_prompts.PROMPT_TOKEN_BUDGET = args.budget
+        moodly_db.init_schema(backfill=True)
+        # First, so the app's histograms only hold its own calls
+        if args.server:
+            through_server(path, args)
+        measure(path, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
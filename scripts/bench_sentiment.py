@@ -0,0 +1,116 @@
+"""
+Benchmark offline text sentiment scoring (moodly_sentiment) and its backfill over a generated dataset.
+
+Generates --users users with scripts/generate_dataset.py (mood notes and journal entries drawn
+from low, middle and high mood phrases), checks score_batch gives exactly score()'s results on
+every text, then reports:
+
+  per text   microseconds per mood note and per journal entry through score(), one text at a
+             time as the apps do on write, and score_batch(), as the backfill does
+  backfill   rows per second scoring the whole database in --batch transactions, then
+             rescoring it all with NumPy and with the pure Python fallback
+  signal     Pearson's r between text_sentiment and mood_score over all entries, and the
+             emotions found: how much the notes say about the score they came with
+
+Usage: python scripts/bench_sentiment.py [--users N] [--entries-per-user N] [--batch N]
+"""
+import argparse
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import moodly_sentiment
+
+SIGNAL = '''SELECT COUNT(*), SUM(text_sentiment), SUM(mood_score), SUM(text_sentiment * text_sentiment),
+                   SUM(mood_score * mood_score), SUM(text_sentiment * mood_score)
+            FROM mood_entries WHERE text_sentiment IS NOT NULL'''
+
+
+def per_text(texts):
+    """Microseconds per text through score() and score_batch()"""
+    start = time.perf_counter()
+    for text in texts:
+        moodly_sentiment.score(text)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    moodly_sentiment.score_batch(texts)
+    batch = time.perf_counter() - start
+    return single / len(texts) * 1e6, batch / len(texts) * 1e6
+
+
+def timed_backfill(path, batch, recompute):
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    rows = moodly_sentiment.backfill(conn, batch=batch, recompute=recompute)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return rows, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--entries-per-user', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=2000, help='rows per backfill transaction')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodly-sentiment-bench-')
+    try:
+        path = os.path.join(workdir, 'moodly.db')
+        subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'generate_dataset.py'), '--db', path,
+                        '--users', str(args.users), '--entries-per-user', str(args.entries_per_user)],
+                       check=True, stdout=subprocess.DEVNULL)
+        conn = sqlite3.connect(path)
+        notes = [row[0] for row in conn.execute('SELECT notes FROM mood_entries')]
+        journals = ['\n'.join(row) for row in conn.execute('SELECT title, content FROM journal_entries')]
+        conn.close()
+
+        numpy = moodly_sentiment._numpy()
+        mismatches = sum(single != batch for texts in (notes, journals)
+                         for single, batch in zip(map(moodly_sentiment.score, texts),
+                                                  moodly_sentiment.score_batch(texts)))
+        print(f"Sentiment benchmark: {len(notes)} mood entries, {len(journals)} journal entries "
+              f"({os.cpu_count()} CPUs, Python {platform.python_version()}, SQLite {sqlite3.sqlite_version}, "
+              f"NumPy {numpy.__version__ if numpy is not None else 'missing'})")
+        print(f"  score_batch mismatches against score(): {mismatches}")
+        print("-" * 100)
+        for label, texts in (('mood notes', notes), ('journals', journals)):
+            words = sum(len(text.split()) for text in texts) / len(texts)
+            single, batch = per_text(texts)
+            print(f"  {label:<11} {words:>5.1f} words  score() {single:>6.1f} us  score_batch() {batch:>6.1f} us")
+
+        rows, elapsed = timed_backfill(path, args.batch, recompute=False)
+        print(f"  backfill    {rows} rows in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s)")
+        # Like for like: both rescore every row of the now warm database
+        for label, module in (('recompute', numpy), ('no NumPy', False)):
+            moodly_sentiment._np = module
+            try:
+                rows, elapsed = timed_backfill(path, args.batch, recompute=True)
+            finally:
+                moodly_sentiment._np = numpy
+            print(f"  {label:<11} {rows} rows in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s)")
+
+        conn = sqlite3.connect(path)
+        n, sum_x, sum_y, sum_xx, sum_yy, sum_xy = conn.execute(SIGNAL).fetchone()
+        r = (n * sum_xy - sum_x * sum_y) / ((n * sum_xx - sum_x * sum_x) * (n * sum_yy - sum_y * sum_y)) ** 0.5
+        emotions = conn.execute('SELECT text_emotion, COUNT(*) FROM mood_entries WHERE text_sentiment IS NOT NULL '
+                                'GROUP BY text_emotion ORDER BY COUNT(*) DESC').fetchall()
+        conn.close()
+        print(f"  signal      r = {r:.3f} between text_sentiment and mood_score over {n} entries with notes; "
+              + ', '.join(f"{emotion} {count}" for emotion, count in emotions))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
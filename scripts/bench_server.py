@@ -0,0 +1,186 @@
+"""
+Benchmark the production server profile against Flask's development server.
+
+Seeds moodly_api's (or moodly.py's) schema, then serves the same app two ways: app.run
+(werkzeug, threaded) and gunicorn with gunicorn.conf.py, and runs the same read/write
+workload against each with persistent (keep-alive) HTTP connections.
+
+Usage: python scripts/bench_server.py [--target api|web] [--users N] [--entries N]
+                                      [--requests N] [--concurrency N] [--workers N]
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from http.cookies import SimpleCookie
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import PASSWORD, WEB_TEMPLATES, free_port, run_scenario, seed_database
+from generate_dataset import create_schema
+
+SCENARIOS = {
+    'api': [
+        ('GET /api/analytics', lambda: ('GET', '/api/analytics', {}), (200,)),
+        ('GET /api/moods', lambda: ('GET', '/api/moods', {}), (200,)),
+        ('POST /api/moods', lambda: ('POST', '/api/moods', {'json': {
+            'mood_score': 7, 'energy_level': 6, 'anxiety_level': 3, 'sleep_quality': 8, 'notes': 'bench'}}), (201,)),
+    ],
+    'web': [
+        ('GET /api/mood_data', lambda: ('GET', '/api/mood_data', {}), (200,)),
+        ('GET /api/dashboard', lambda: ('GET', '/api/dashboard', {}), (200,)),
+        ('GET /mood_tracker', lambda: ('GET', '/mood_tracker', {}), (200,)),
+    ],
+}
+
+# App module, login request, and for web the stand-in templates to install before serving
+TARGETS = {
+    'api': ('moodly_api', ('POST', '/api/auth/login', {'json': {'username': 'bench0', 'password': PASSWORD}})),
+    'web': ('moodly', ('POST', '/login', {'data': {'username': 'bench0', 'password': PASSWORD}})),
+}
+
+# Loads the target app with the same stand-in templates bench_load uses in-process
+SERVE_WEB = '''
+from jinja2 import ChoiceLoader, DictLoader
+import moodly
+moodly.app.jinja_env.loader = ChoiceLoader([moodly.app.jinja_env.loader, DictLoader({templates!r})])
+app = moodly.app
+'''
+
+
+class KeepAliveClient:
+    """One persistent HTTP/1.1 connection with a session cookie; reconnects when the server closes"""
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, json=None, data=None):
+        headers = {}
+        body = None
+        if json is not None:
+            body = _dumps(json)
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            from urllib.parse import urlencode
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{key}={morsel.value}' for key, morsel in self.cookies.items())
+        for attempt in (1, 2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest):
+                self.connection.close()
+                if attempt == 2:
+                    return 0
+        for header in response.headers.get_all('Set-Cookie') or ():
+            self.cookies.load(header)
+        if response.will_close:
+            self.connection.close()
+        return response.status
+
+
+def _dumps(payload):
+    return json.dumps(payload)
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("server did not start")
+
+
+def start_server(mode, target, workdir, workers):
+    module = TARGETS[target][0]
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+               PORT=str(port), HOST='127.0.0.1', WEB_CONCURRENCY=str(workers))
+    app_module = module
+    if target == 'web':
+        # Wrap moodly so both servers render the stand-in templates
+        with open(os.path.join(workdir, 'bench_web_app.py'), 'w') as f:
+            f.write(SERVE_WEB.format(templates=WEB_TEMPLATES))
+        app_module = 'bench_web_app'
+    if mode == 'app.run':
+        command = [sys.executable, '-c', f"import {app_module} as m; m.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), f'{app_module}:app']
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port, process)
+    return process, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', choices=('api', 'web'), default='api')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--entries', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=1000, help='timed requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=0, help='gunicorn workers (default: auto)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault('STORAGE_BACKEND', 'local')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.pop('OPENAI_API_KEY', None)
+    from moodly_server import worker_count
+    workers = args.workers or worker_count()
+    login = TARGETS[args.target][1]
+
+    print(f"Server benchmark: {args.target}, {args.requests} requests per scenario, concurrency {args.concurrency}, "
+          f"gunicorn {workers} workers x {os.environ.get('GUNICORN_THREADS', '4')} threads")
+    print("-" * 96)
+    for mode in ('app.run', 'gunicorn'):
+        workdir = tempfile.mkdtemp(prefix='moodly-server-bench-')
+        process = None
+        cwd = os.getcwd()
+        try:
+            os.chdir(workdir)
+            db_path = os.path.join(workdir, 'moodly.db')
+            create_schema('api' if args.target == 'api' else 'web', db_path)
+            seed_database(args.target, db_path, args.users, args.entries, args.seed)
+            process, port = start_server(mode, args.target, workdir, workers)
+            clients = []
+            for i in range(args.concurrency):
+                client = KeepAliveClient(port)
+                method, path, kwargs = login
+                client.request(method, path, **kwargs)
+                clients.append(client)
+            print(mode)
+            for name, build_request, expected in SCENARIOS[args.target]:
+                run_scenario(clients, build_request, expected, 50, args.concurrency)
+                stats = run_scenario(clients, build_request, expected, args.requests, args.concurrency)
+                print(f"  {name:<24} {stats['rps']:>9.1f} req/s  p50 {stats['p50_ms']:>8.2f} ms  "
+                      f"p90 {stats['p90_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  errors {stats['errors']}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark concurrent mood writes against one SQLite file and against 1, 4 and 16 shards.
+
+Each run gets a fresh directory with --users users, then --workers processes (standing in
+for gunicorn workers) log moods for random users for --seconds: the API's insert plus the
+data_version bump, committed one entry at a time through moodly_db.connect(user_id=...).
+SQLite lets one writer at a time into a file, so with one file the workers queue on its
+lock; with shards, writes for users on different shards commit in parallel.
+
+Reports, per layout: committed writes/s, latency percentiles and writes that gave up on a
+locked database (sqlite3's 5 s busy timeout).
+
+Usage: python scripts/bench_shards.py [--shards 1,4,16] [--workers N] [--users N] [--seconds S]
+"""
+import argparse
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import moodly_db
+from moodly_metrics import connect as db_connect
+from moodly_shards import ShardMap
+
+from bench_load import percentile
+
+# Any valid hash: nobody logs in, and hashing 1000 passwords would dominate the setup
+PASSWORD_HASH = 'bench:' + '0' * 64
+
+INSERT_MOOD = '''
+    INSERT INTO mood_entries (user_id, mood_score, energy_level, anxiety_level, sleep_quality, notes,
+                              ai_insights, created_at, local_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def configure(workdir, shard_count):
+    """Point moodly_db at a fresh database (sharded when shard_count) before the workers fork"""
+    moodly_db.DATABASE_PATH = os.path.join(workdir, 'moodly.db')
+    moodly_db.shards = ShardMap(moodly_db.DATABASE_PATH, shard_count, connect=db_connect) if shard_count else None
+    moodly_db.init_schema()
+
+
+def write_moods(start_at, stop_at, user_ids, seed, results):
+    rng = random.Random(seed)
+    latencies, locked = [], 0
+    while time.monotonic() < start_at:
+        time.sleep(0.001)
+    while time.monotonic() < stop_at:
+        user_id = rng.choice(user_ids)
+        now = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            conn = moodly_db.connect(user_id=user_id)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(INSERT_MOOD, (user_id, rng.randint(1, 10), rng.randint(1, 10), rng.randint(1, 10),
+                                             rng.randint(1, 10), 'bench', 'Keep going!',
+                                             now.strftime('%Y-%m-%d %H:%M:%S'), now.strftime('%Y-%m-%d')))
+                moodly_db.bump_data_version(cursor, user_id)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, locked))
+
+
+def run(shard_count, args):
+    workdir = tempfile.mkdtemp(prefix='moodly-shard-bench-')
+    try:
+        configure(workdir, shard_count)
+        user_ids = [moodly_db.create_user(f'bench{i}', f'bench{i}@example.com', PASSWORD_HASH)
+                    for i in range(args.users)]
+
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        start_at = time.monotonic() + 0.5
+        stop_at = start_at + args.seconds
+        workers = [context.Process(target=write_moods, args=(start_at, stop_at, user_ids, seed, results))
+                   for seed in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        latencies, locked = [], 0
+        for _ in workers:
+            worker_latencies, worker_locked = results.get()
+            latencies.extend(worker_latencies)
+            locked += worker_locked
+        for worker in workers:
+            worker.join()
+
+        written = sum(count for rows in moodly_db.fan_out('SELECT COUNT(*) FROM mood_entries') for (count,) in rows)
+        assert written == len(latencies), (written, len(latencies))
+        latencies.sort()
+        return {
+            'writes': len(latencies) / args.seconds,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'locked': locked,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shards', default='1,4,16', help='comma-separated shard counts (0: one unsharded file)')
+    parser.add_argument('--workers', type=int, default=8, help='writer processes')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    counts = [0] + [int(count) for count in args.shards.split(',') if int(count) > 0]
+    print(f"Shard write benchmark: {args.workers} writer processes, {args.users} users, {args.seconds}s per layout "
+          f"({os.cpu_count()} CPUs, Python {platform.python_version()}, SQLite {sqlite3.sqlite_version})")
+    print("-" * 100)
+    for shard_count in counts:
+        result = run(shard_count, args)
+        name = f'{shard_count} shard{"s" if shard_count > 1 else ""}' if shard_count else 'unsharded'
+        print(f"  {name:<11} {result['writes']:>8.1f} writes/s  p50 {result['p50'] * 1000:>8.2f} ms  "
+              f"p95 {result['p95'] * 1000:>8.2f} ms  p99 {result['p99'] * 1000:>8.2f} ms  "
+              f"{result['locked']} gave up on a locked database")
+
+
+if __name__ == '__main__':
+    main()
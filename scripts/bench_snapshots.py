@@ -0,0 +1,139 @@
+"""
+Benchmark snapshot shipping and cold-start restore of a SQLite database (see moodly_snapshots).
+
+Generates a database of about --mb megabytes with scripts/generate_dataset.py, then, with a
+local directory as the snapshot store:
+
+  base      ships the whole file, gzip-compressed at each of --levels
+  deltas    logs --writes moods --deltas times, shipping the changed pages after each batch
+  restore   deletes the database, as a cold start on a fresh instance would, and times
+            moodly_db.init_schema() restoring it: streaming decompress of the base, the deltas
+            laid over it, quick_check, then the schema check
+
+and checks the restored database holds exactly the rows written.
+
+Usage: python scripts/bench_snapshots.py [--mb N] [--levels 1,6] [--deltas N] [--writes N]
+"""
+import argparse
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import moodly_db
+import moodly_snapshots
+
+from bench_shards import INSERT_MOOD
+
+# generate_dataset.py writes about this many bytes per mood entry (with journals and goals)
+BYTES_PER_ENTRY = 120
+ENTRIES_PER_USER = 300
+
+CONTENT_CHECK = 'SELECT COUNT(*), SUM(mood_score), MAX(id) FROM mood_entries'
+
+
+def content(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(CONTENT_CHECK).fetchone()
+    finally:
+        conn.close()
+
+
+def write_moods(path, count):
+    conn = sqlite3.connect(path)
+    user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY RANDOM() LIMIT 100')]
+    now = datetime.now(timezone.utc)
+    conn.executemany(INSERT_MOOD, [(user_ids[i % len(user_ids)], 7, 6, 3, 8, 'snapshot', 'Keep going!',
+                                    now.strftime('%Y-%m-%d %H:%M:%S'), now.strftime('%Y-%m-%d'))
+                                   for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def run(level, source, workdir, args):
+    path = os.path.join(workdir, 'moodly.db')
+    store_dir = os.path.join(workdir, f'store-{level}')
+    shutil.copyfile(source, path)
+    moodly_db.DATABASE_PATH = path
+    moodly_snapshots.STORE = store_dir
+    moodly_snapshots.COMPRESSION_LEVEL = level
+    store = moodly_snapshots.get_snapshot_store()
+
+    start = time.perf_counter()
+    kind, base = moodly_snapshots.ship(path, store)
+    base_seconds = time.perf_counter() - start
+    assert kind == 'base', kind
+
+    delta_sizes, delta_seconds = [], []
+    for _ in range(args.deltas):
+        write_moods(path, args.writes)
+        start = time.perf_counter()
+        kind, size = moodly_snapshots.ship(path, store)
+        delta_seconds.append(time.perf_counter() - start)
+        assert kind == 'delta', kind
+        delta_sizes.append(size)
+    expected = content(path)
+
+    # A new instance: nothing on local disk but the code
+    for name in os.listdir(workdir):
+        if name.startswith('moodly.db'):
+            os.remove(os.path.join(workdir, name))
+    start = time.perf_counter()
+    moodly_db.init_schema()
+    restore_seconds = time.perf_counter() - start
+    restored = content(path)
+    assert restored == expected, (restored, expected)
+    return {
+        'size': os.path.getsize(path),
+        'base': base,
+        'base_seconds': base_seconds,
+        'delta': sum(delta_sizes) / len(delta_sizes) if delta_sizes else 0,
+        'delta_seconds': sum(delta_seconds) / len(delta_seconds) if delta_seconds else 0,
+        'restore_seconds': restore_seconds,
+        'rows': restored[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mb', type=int, default=100, help='approximate database size to generate')
+    parser.add_argument('--levels', default='1,6', help='comma-separated gzip levels to compare')
+    parser.add_argument('--deltas', type=int, default=5)
+    parser.add_argument('--writes', type=int, default=1000, help='moods logged before each delta')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodly-snapshot-bench-')
+    try:
+        source = os.path.join(workdir, 'source.db')
+        users = max(1, args.mb * 1024 * 1024 // (BYTES_PER_ENTRY * ENTRIES_PER_USER))
+        subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'generate_dataset.py'), '--db', source,
+                        '--users', str(users), '--entries-per-user', str(ENTRIES_PER_USER)],
+                       check=True, stdout=subprocess.DEVNULL)
+        print(f"Snapshot benchmark: {os.path.getsize(source) / 1024 / 1024:.1f} MB database, {args.deltas} deltas "
+              f"of {args.writes} moods ({os.cpu_count()} CPUs, Python {platform.python_version()}, "
+              f"SQLite {sqlite3.sqlite_version})")
+        print("-" * 100)
+        for level in [int(level) for level in args.levels.split(',')]:
+            result = run(level, source, workdir, args)
+            mb = result['size'] / 1024 / 1024
+            print(f"  gzip -{level}  base {result['base'] / 1024 / 1024:>6.1f} MB in {result['base_seconds']:>5.2f} s  "
+                  f"delta {result['delta'] / 1024:>7.1f} KB in {result['delta_seconds'] * 1000:>6.0f} ms  "
+                  f"cold-start restore {result['restore_seconds']:>5.2f} s ({mb / result['restore_seconds']:>5.0f} MB/s, "
+                  f"{result['rows']} mood entries)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
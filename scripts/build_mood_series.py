@@ -0,0 +1,39 @@
+"""
+Build (or rebuild) the compact mood_series store from mood_entries.
+
+Run once before setting MOOD_SERIES=true, and again whenever mood entries were
+written with it off. Rebuilding is idempotent.
+
+Usage: python scripts/build_mood_series.py [--db PATH] [--user ID]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import moodly_series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='moodly.db')
+    parser.add_argument('--user', type=int, help='only rebuild this user id')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    moodly_series.create_table(conn.cursor())
+    months = moodly_series.rebuild(conn, args.user)
+    blob_bytes, entries = conn.execute('SELECT COALESCE(SUM(LENGTH(data)), 0), COALESCE(SUM(count), 0) '
+                                       'FROM mood_series').fetchone()
+    conn.close()
+    print(f"Wrote {months} user-months in {time.perf_counter() - start:.2f}s: "
+          f"{entries} entries in {blob_bytes / 1024:.1f} KiB ({blob_bytes / max(entries, 1):.2f} B/entry)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Check read-replica routing with two local SQLite databases standing in for a primary and its replica.
+
+A background thread copies the primary into the replica with the SQLite backup API every
+--sync-interval seconds (a stand-in for Litestream/LiteFS or streaming replication) and can be
+paused to make the replica fall behind. Against moodly_app in-process it checks that:
+
+  routing         logged-in GET requests read from the replica once it is current
+  read-your-writes  right after a write, the writer's own reads see it (pinned to the primary)
+  lag fallback    once the replica is further behind than DATABASE_REPLICA_MAX_LAG, reads go to the primary
+  recovery        when replication catches up, the replica is back in rotation
+  health          a broken replica is taken out of rotation without failing any request
+
+then reports GET /api/analytics latency with concurrent mood writes, primary only vs with the replica.
+
+Usage: python scripts/check_replicas.py [--users N] [--entries N] [--sync-interval S] [--max-lag S]
+                                        [--seconds S] [--readers N]
+Exits non-zero when a check fails.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import PASSWORD, percentile, seed_database
+
+MOOD = {'mood_score': 7, 'energy_level': 6, 'anxiety_level': 3, 'sleep_quality': 8, 'notes': 'Feeling good today'}
+
+
+class Replicator(threading.Thread):
+    """Copies the primary into the replica every `interval` seconds while not paused"""
+
+    def __init__(self, primary, replica, interval):
+        super().__init__(daemon=True)
+        self.primary, self.replica, self.interval = primary, replica, interval
+        self.running = threading.Event()
+        self.running.set()
+        self.stopped = threading.Event()
+
+    def sync(self):
+        source = sqlite3.connect(self.primary, timeout=10)
+        target = sqlite3.connect(self.replica, timeout=10)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if self.running.is_set():
+                try:
+                    self.sync()
+                except sqlite3.Error:
+                    pass
+
+
+def routed(metrics, target):
+    counters, _ = metrics.collect()
+    return sum(value for (name, labels), value in counters.items()
+               if name == 'moodly_db_read_routing_total' and dict(labels)['target'] == target)
+
+
+def login(app):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': 'bench0', 'password': PASSWORD})
+    assert response.status_code == 200, response.status_code
+    return client
+
+
+def latest_mood(client):
+    """id of the newest mood entry the client can see"""
+    response = client.get('/api/moods')
+    assert response.status_code == 200, response.status_code
+    return max(mood['id'] for mood in response.get_json()['moods'])
+
+
+def contention(app, seconds, readers):
+    """GET /api/analytics latencies (and failures) from `readers` threads while one thread logs moods"""
+    stop = time.perf_counter() + seconds
+    latencies, failures, writes = [], [0], [0]
+
+    def read():
+        client = login(app)
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            status = client.get('/api/analytics').status_code
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures[0] += 1
+
+    def write():
+        # A second session of another user, so the readers are never pinned to the primary
+        client = app.test_client()
+        client.post('/api/auth/login', json={'username': 'bench1', 'password': PASSWORD})
+        while time.perf_counter() < stop:
+            client.post('/api/moods', json=MOOD)
+            writes[0] += 1
+
+    threads = [threading.Thread(target=read) for _ in range(readers)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return latencies, failures[0], writes[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--entries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sync-interval', type=float, default=0.1, help='seconds between replica copies')
+    parser.add_argument('--max-lag', type=float, default=1.0)
+    parser.add_argument('--check-interval', type=float, default=0.25)
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each contention run')
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodly-replica-check-')
+    primary = os.path.join(workdir, 'moodly.db')
+    replica = os.path.join(workdir, 'replica.db')
+    os.chdir(workdir)
+    # Read when moodly_db and moodly_replicas are imported; empty OPENAI_API_KEY so .env does not bring one back
+    os.environ.update(DATABASE_REPLICA_URLS=replica, DATABASE_REPLICA_MAX_LAG=str(args.max_lag),
+                      DATABASE_REPLICA_CHECK_INTERVAL=str(args.check_interval),
+                      OPENAI_API_KEY='', STORAGE_BACKEND='local', LOG_LEVEL='WARNING')
+    replicator = None
+    try:
+        import moodly_api
+        import moodly_app
+        import moodly_db
+        from moodly_metrics import metrics
+        from moodly_replicas import PIN_SECONDS, ReplicaRouter
+
+        moodly_api.init_database()
+        seed_database('api', primary, args.users, args.entries, args.seed)
+        app = moodly_app.app
+        router = moodly_db.router
+
+        replicator = Replicator(primary, replica, args.sync_interval)
+        replicator.sync()
+        replicator.start()
+
+        def settle():
+            # Two checks: the first stamps a heartbeat, the second sees it replicated
+            for _ in range(2):
+                time.sleep(args.sync_interval * 3)
+                router.check(force=True)
+
+        results = []
+
+        def check(name, passed, detail):
+            results.append(passed)
+            print(f"  {'PASS' if passed else 'FAIL'}  {name:<17} {detail}")
+
+        print(f"Replica check: primary {primary}, replica {replica}")
+        print(f"  max lag {args.max_lag}s, health check every {args.check_interval}s, "
+              f"pin {PIN_SECONDS:.2f}s, sync every {args.sync_interval}s")
+        print("-" * 100)
+
+        settle()
+        writer, other = login(app), login(app)
+        before = routed(metrics, 'replica')
+        other.get('/api/analytics')
+        check('routing', routed(metrics, 'replica') > before, f"status {router.status()}")
+
+        replicator.running.clear()
+        time.sleep(args.sync_interval * 3)
+        previous = latest_mood(writer)
+        assert writer.post('/api/moods', json=MOOD).status_code == 201
+        written = latest_mood(writer)
+        check('read-your-writes', written > previous, f"writer sees entry {written} straight after logging it")
+
+        stale = latest_mood(other)
+        time.sleep(args.max_lag + args.check_interval * 2)
+        router.check(force=True)
+        fresh = latest_mood(other)
+        check('lag fallback', stale < written and fresh == written,
+              f"other session saw entry {stale} on the lagging replica, then {fresh} "
+              f"({router.status()[0]['error']})")
+
+        replicator.running.set()
+        settle()
+        before = routed(metrics, 'replica')
+        recovered = latest_mood(other)
+        check('recovery', routed(metrics, 'replica') > before and recovered == written,
+              f"entry {recovered} read from the replica again")
+
+        replicator.running.clear()
+        time.sleep(args.sync_interval * 3)
+        with open(replica, 'wb') as f:
+            f.write(b'not a database' * 1024)
+        router.check(force=True)
+        served = latest_mood(other)
+        check('health', served == written and not router.status()[0]['healthy'],
+              f"entry {served} read from the primary; replica status {router.status()[0]}")
+        os.remove(replica)
+        replicator.running.set()
+        settle()
+
+        print("-" * 100)
+        print(f"GET /api/analytics, {args.readers} readers + 1 writer for {args.seconds}s each")
+        for name, candidate in (('primary only', ReplicaRouter(primary, [])), ('with replica', router)):
+            moodly_db.router = candidate
+            latencies, failures, writes = contention(app, args.seconds, args.readers)
+            print(f"  {name:<14} {len(latencies) / args.seconds:>7.1f} reads/s  p50 {percentile(latencies, 50) * 1000:>7.1f} ms  "
+                  f"p95 {percentile(latencies, 95) * 1000:>7.1f} ms  p99 {percentile(latencies, 99) * 1000:>7.1f} ms  "
+                  f"{failures} failed  {writes / args.seconds:>6.1f} writes/s")
+        moodly_db.router = router
+        if not all(results):
+            sys.exit(1)
+    finally:
+        if replicator is not None:
+            replicator.stopped.set()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
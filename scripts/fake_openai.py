@@ -0,0 +1,102 @@
+"""
+A stand-in for the OpenAI chat completions API with a fixed response delay.
+
+Answers every POST .../chat/completions with a canned chat.completion after --latency
+seconds, so servers can be load tested against realistic AI round trips without a key
+or network access. Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:PORT/v1.
+Its usage.prompt_tokens is the usual rule of thumb for English, a token per 4 characters.
+
+Usage: python scripts/fake_openai.py [--port N] [--latency SECONDS]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+INSIGHT = ("It sounds like today had its ups and downs. Your energy is holding up well; "
+           "a short walk and an early night could help keep that going.")
+
+
+def prompt_tokens(messages):
+    return sum(len(str(message.get('content', ''))) // 4 + 4 for message in messages)
+
+
+def completion_body(model, prompt_tokens=120):
+    return json.dumps({
+        'id': 'chatcmpl-fake',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': INSIGHT}}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': 40, 'total_tokens': prompt_tokens + 40},
+    }).encode()
+
+
+async def read_request(reader):
+    """Return (method, path, body) or None when the client has gone"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    method, path, _ = lines[0].split(' ', 2)
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value.strip())
+    body = await reader.readexactly(length) if length else b''
+    return method, path, body
+
+
+def make_handler(latency):
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    method, path, body = await read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if method == 'POST' and path.endswith('/chat/completions'):
+                    await asyncio.sleep(latency)
+                    try:
+                        request = json.loads(body)
+                    except ValueError:
+                        request = {}
+                    status, payload = '200 OK', completion_body(request.get('model', 'gpt-3.5-turbo'),
+                                                                prompt_tokens(request.get('messages', [])))
+                else:
+                    status, payload = '404 Not Found', b'{"error": {"message": "not found"}}'
+                writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                             f'Content-Length: {len(payload)}\r\n\r\n'.encode() + payload)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def start(port, latency, host='127.0.0.1'):
+    """Start the server in the running loop; returns the asyncio Server"""
+    return await asyncio.start_server(make_handler(latency), host, port, backlog=4096)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--latency', type=float, default=2.0, help='seconds before each completion is returned')
+    args = parser.parse_args()
+
+    async def run():
+        server = await start(args.port, args.latency, args.host)
+        print(f"Fake OpenAI on http://{args.host}:{args.port}/v1 ({args.latency}s per completion)")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
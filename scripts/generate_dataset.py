@@ -0,0 +1,455 @@
+"""
+Synthetic dataset generator for mood, journal and goal histories.
+
+Each user gets stable traits (baseline mood, volatility, chronotype, engagement) and a
+day-to-day latent mood state. Entries follow a diurnal rhythm (morning and evening peaks)
+and a weekly one (heavier Mondays, lighter weekends); energy and sleep move with mood
+and anxiety moves against it. Output is deterministic for a given --seed, and each user
+is seeded on their own, so the first N users are identical across runs of any size.
+
+Rows are written in large batched transactions with executemany (SQLite) or COPY
+(PostgreSQL via --postgres / DATABASE_URL). Both apps now share moodly_db's SQLite schema;
+--schema picks whose columns are filled: api (moodly_api.py's levels, journal and goals)
+or web (moodly.py's descriptions and local dates; its PostgreSQL schema has no journal table).
+
+Usage: python scripts/generate_dataset.py [--db PATH | --postgres URL] [--schema api|web]
+                                          [--users N] [--entries-per-user N] [--days N] [--end DATE]
+                                          [--seed N] [--batch N] [--jobs N] [--prefix NAME]
+"""
+import argparse
+import csv
+import hashlib
+import io
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLUMNS = {
+    'api': {
+        'mood_entries': ('user_id', 'mood_score', 'energy_level', 'anxiety_level', 'sleep_quality',
+                         'notes', 'created_at'),
+        'journal_entries': ('user_id', 'title', 'content', 'tags', 'is_favorite', 'created_at', 'updated_at'),
+        'goals': ('user_id', 'title', 'description', 'category', 'priority', 'target_date',
+                  'is_completed', 'progress', 'created_at', 'updated_at'),
+    },
+    'web': {
+        'mood_entries': ('user_id', 'mood_score', 'mood_description', 'entry_text', 'tags', 'created_at',
+                         'local_date'),
+        'goals': ('user_id', 'title', 'description', 'target_date', 'completed', 'created_at'),
+    },
+}
+
+# Mood shift by weekday (Monday first) and by hour of day
+WEEKDAY_EFFECT = (-0.4, -0.2, -0.1, 0.0, 0.3, 0.6, 0.4)
+# Logging peaks: (share, mean hour, std dev)
+DIURNAL_PEAKS = ((0.45, 8.5, 1.5), (0.15, 13.0, 1.5), (0.40, 21.5, 1.5))
+
+LOW_PHRASES = (
+    "Feeling drained", "Couldn't focus at work", "Slept badly again", "Everything feels heavy",
+    "Argued with a friend", "Too many deadlines", "Skipped lunch", "Felt lonely this evening",
+    "Worried about money", "Head full of noise",
+)
+MID_PHRASES = (
+    "An ordinary day", "Got through my to-do list", "Went for a short walk", "Bit tired but okay",
+    "Cooked dinner at home", "Quiet evening", "Work was fine", "Caught up with emails",
+    "Read a few chapters", "Nothing special happened",
+)
+HIGH_PHRASES = (
+    "Great run this morning", "Had a lovely call with family", "Feeling grateful", "Finished a big project",
+    "Laughed a lot today", "Slept really well", "Sunny and calm", "Met friends for coffee",
+    "Proud of myself", "Lots of energy today",
+)
+JOURNAL_TITLES = (
+    "Morning pages", "Evening reflection", "Gratitude list", "Work thoughts", "Weekend recap",
+    "Things on my mind", "Small wins", "Letter to myself", "Therapy notes", "Sleep diary",
+)
+JOURNAL_SENTENCES = (
+    "I noticed my mood shifted after lunch.", "Breathing exercises helped a little.",
+    "I want to be kinder to myself this week.", "Today I felt more present than usual.",
+    "The meeting went better than I expected.", "I kept thinking about what she said.",
+    "Going outside made a real difference.", "I am trying to sleep before midnight.",
+    "Three things I am grateful for: coffee, sunlight and my dog.", "I felt anxious on the train again.",
+    "Writing this down makes it feel smaller.", "I should call my parents more often.",
+    "My energy dipped in the afternoon.", "I said no to something and it felt good.",
+    "Tomorrow I will start with the hardest task.", "I cried a bit and then felt lighter.",
+)
+TAGS = ('work', 'family', 'sleep', 'exercise', 'friends', 'health', 'study', 'weather', 'food', 'money')
+GOALS = {
+    'mindfulness': ("Meditate 10 minutes daily", "Practice mindful breathing"),
+    'fitness': ("Walk 8,000 steps a day", "Run a 5k"),
+    'sleep': ("In bed by 11pm", "No screens after 10pm"),
+    'social': ("Call a friend every week", "Join a local club"),
+    'work': ("Take proper lunch breaks", "Finish work by 6pm"),
+    'self-care': ("Journal three times a week", "Read before bed"),
+}
+PRIORITIES = ('low', 'medium', 'high')
+
+
+def clip(value, low=1, high=10):
+    return low if value < low else high if value > high else int(round(value))
+
+
+def poisson(rng, lam):
+    """Poisson sample (Knuth); lam is small here"""
+    threshold = math.exp(-lam)
+    k = 0
+    p = rng.random()
+    while p > threshold:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def api_password_hash(password):
+    """The old API format ("salt:sha256(password + salt)"), still accepted by moodly_auth and cheap to seed"""
+    salt = hashlib.sha256(b'moodly-synthetic').hexdigest()[:32]
+    return f"{salt}:{hashlib.sha256((password + salt).encode()).hexdigest()}"
+
+
+def web_mood_description(mood, energy, anxiety, rng):
+    """Map scores to one of moodly.get_mood_options() keys"""
+    if anxiety >= 8:
+        return 'anxious' if rng.random() < 0.6 else 'stressed'
+    if mood >= 8:
+        return 'excited' if energy >= 7 else 'happy'
+    if mood >= 6:
+        return 'calm' if rng.random() < 0.6 else 'happy'
+    if mood >= 4:
+        return 'confused' if rng.random() < 0.3 else 'calm'
+    return 'angry' if rng.random() < 0.25 else 'sad'
+
+
+class Generator:
+    """Deterministic per-user histories ending at `end` and spanning `days` days"""
+
+    def __init__(self, seed=42, days=365, entries_per_user=365, end=None):
+        self.seed = seed
+        self.days = days
+        self.entries_per_user = entries_per_user
+        self.end = end or datetime(2025, 1, 1)
+        self.start = self.end - timedelta(days=days)
+
+    def user_rng(self, index):
+        return random.Random(f'{self.seed}:{index}')
+
+    def traits(self, rng):
+        return {
+            'base': rng.gauss(6.0, 1.1),
+            'volatility': rng.uniform(0.5, 1.5),
+            'sleep_base': rng.gauss(6.0, 1.2),
+            'anxiety_base': rng.gauss(4.5, 1.3),
+            'chronotype': rng.gauss(0.0, 1.0),
+            # Engagement varies a lot between users; mean multiplier is 1
+            'engagement': rng.lognormvariate(-0.125, 0.5),
+            'writer': rng.random(),
+        }
+
+    def entry_hour(self, rng, chronotype):
+        pick = rng.random()
+        for share, mean, spread in DIURNAL_PEAKS:
+            pick -= share
+            if pick <= 0:
+                break
+        return (rng.gauss(mean, spread) + chronotype) % 24
+
+    def notes(self, rng, mood, writer):
+        if rng.random() > 0.4 + 0.5 * writer:
+            return ''
+        bank = LOW_PHRASES if mood <= 4 else HIGH_PHRASES if mood >= 7 else MID_PHRASES
+        count = max(1, int(rng.lognormvariate(0.3, 0.7)))
+        return '. '.join(rng.choice(bank) for _ in range(count)) + '.'
+
+    def moods(self, rng, traits):
+        """Yield mood entries as dicts, oldest first"""
+        rate = self.entries_per_user / self.days * traits['engagement']
+        state = 0.0
+        for day in range(self.days):
+            date = self.start + timedelta(days=day)
+            # Latent mood drifts day to day (AR(1)), sleep follows it
+            state = 0.7 * state + rng.gauss(0.0, traits['volatility'])
+            sleep = clip(traits['sleep_base'] + 0.6 * state + rng.gauss(0.0, 1.2))
+            weekday = date.weekday()
+            hours = sorted(self.entry_hour(rng, traits['chronotype']) for _ in range(poisson(rng, rate)))
+            for hour in hours:
+                diurnal = -0.4 if hour < 7 else 0.2 if 12 <= hour < 18 else -0.2 if hour >= 23 else 0.0
+                mood = clip(traits['base'] + state + WEEKDAY_EFFECT[weekday] + diurnal
+                            + 0.25 * (sleep - 6) + rng.gauss(0.0, 0.7))
+                energy = clip(5 + 0.5 * (mood - 5.5) + 0.35 * (sleep - 5.5) + (0.5 if 9 <= hour < 14 else -0.3)
+                              + rng.gauss(0.0, 1.2))
+                anxiety = clip(traits['anxiety_base'] - 0.55 * (mood - 5.5) + (0.4 if weekday < 5 else -0.5)
+                               + rng.gauss(0.0, 1.3))
+                yield {
+                    'mood_score': mood,
+                    'energy_level': energy,
+                    'anxiety_level': anxiety,
+                    'sleep_quality': sleep,
+                    'notes': self.notes(rng, mood, traits['writer']),
+                    'created_at': (date + timedelta(hours=hour)).isoformat(sep=' ', timespec='seconds'),
+                }
+
+    def journals(self, rng, traits):
+        count = poisson(rng, self.days / 7 * traits['writer'] * traits['engagement'])
+        for _ in range(count):
+            created = self.start + timedelta(seconds=rng.random() * self.days * 86400)
+            # Mostly a few sentences, occasionally a long entry
+            sentences = max(1, int(rng.lognormvariate(1.4, 0.8)))
+            created_at = created.strftime('%Y-%m-%d %H:%M:%S')
+            yield {
+                'title': rng.choice(JOURNAL_TITLES),
+                'content': ' '.join(rng.choice(JOURNAL_SENTENCES) for _ in range(sentences)),
+                'tags': ','.join(rng.sample(TAGS, rng.randint(0, 3))),
+                'is_favorite': rng.random() < 0.1,
+                'created_at': created_at,
+                'updated_at': created_at,
+            }
+
+    def goals(self, rng):
+        for _ in range(rng.randint(1, 6)):
+            category = rng.choice(tuple(GOALS))
+            created = self.start + timedelta(seconds=rng.random() * self.days * 86400)
+            progress = rng.choice((0, 10, 25, 50, 75, 100))
+            created_at = created.strftime('%Y-%m-%d %H:%M:%S')
+            yield {
+                'title': rng.choice(GOALS[category]),
+                'description': f"Personal {category} goal",
+                'category': category,
+                'priority': rng.choice(PRIORITIES),
+                'target_date': (created + timedelta(days=rng.randint(7, 90))).strftime('%Y-%m-%d'),
+                'is_completed': progress == 100,
+                'completed': progress == 100,
+                'progress': progress,
+                'created_at': created_at,
+                'updated_at': created_at,
+            }
+
+
+class SQLiteWriter:
+    """Batched executemany inserts, one transaction per batch, with durability relaxed during the load"""
+
+    placeholder = '?'
+
+    def __init__(self, path, batch=50000):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('PRAGMA journal_mode = MEMORY')
+        self.conn.execute('PRAGMA cache_size = -200000')
+        self.batch = batch
+
+    def max_user_id(self):
+        return self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0]
+
+    def user_ids_after(self, user_id):
+        return [row[0] for row in self.conn.execute('SELECT id FROM users WHERE id > ? ORDER BY id', (user_id,))]
+
+    def write(self, table, columns, rows):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        self.conn.execute('BEGIN')
+        self.conn.executemany(sql, rows)
+        self.conn.execute('COMMIT')
+
+    def close(self):
+        self.conn.execute('PRAGMA synchronous = FULL')
+        self.conn.execute('PRAGMA journal_mode = DELETE')
+        self.conn.execute('ANALYZE')
+        self.conn.close()
+
+
+class PostgresWriter:
+    """COPY ... FROM STDIN in CSV, one transaction per batch"""
+
+    def __init__(self, connection, batch=50000):
+        self.conn = connection
+        self.batch = batch
+
+    def max_user_id(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users')
+            return cursor.fetchone()[0]
+
+    def user_ids_after(self, user_id):
+        with self.conn.cursor() as cursor:
+            cursor.execute('SELECT id FROM users WHERE id > %s ORDER BY id', (user_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def write(self, table, columns, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with self.conn.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        self.conn.commit()
+
+    def close(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.conn.commit()
+        self.conn.close()
+
+
+def user_records(generator, schema, index, user_id):
+    """All rows for one user as {table: [tuple, ...]} in `schema`'s column order"""
+    columns = COLUMNS[schema]
+    rng = generator.user_rng(index)
+    traits = generator.traits(rng)
+    records = {'mood_entries': generator.moods(rng, traits), 'goals': generator.goals(rng)}
+    if 'journal_entries' in columns:
+        records['journal_entries'] = generator.journals(rng, traits)
+
+    output = {}
+    for table, rows in records.items():
+        table_columns = columns[table]
+        out = output[table] = []
+        for row in rows:
+            row['user_id'] = user_id
+            if schema == 'web' and table == 'mood_entries':
+                row['mood_description'] = web_mood_description(row['mood_score'], row['energy_level'],
+                                                               row['anxiety_level'], rng)
+                row['entry_text'] = row['notes']
+                row['tags'] = ','.join(rng.sample(TAGS, rng.randint(0, 2)))
+                # Generated users have no timezone set, so their local day is the UTC day
+                row['local_date'] = row['created_at'][:10]
+            out.append(tuple(row[column] for column in table_columns))
+    return output
+
+
+_worker_generator = None
+
+
+def _init_worker(seed, days, entries_per_user, end):
+    global _worker_generator
+    _worker_generator = Generator(seed=seed, days=days, entries_per_user=entries_per_user, end=end)
+
+
+def _worker_records(task):
+    schema, index, user_id = task
+    return user_records(_worker_generator, schema, index, user_id)
+
+
+def generate(writer, schema='api', users=1000, entries_per_user=365, days=365, seed=42,
+             prefix='user', password='moodly123', end=None, jobs=1, progress=None):
+    """Write `users` synthetic users with their histories; returns row counts per table.
+
+    With jobs > 1 rows are generated in worker processes; since every user has their
+    own seed the output is the same as a single-process run.
+    """
+    generator = Generator(seed=seed, days=days, entries_per_user=entries_per_user, end=end)
+    if schema == 'api':
+        password_hash = api_password_hash(password)
+    else:
+        from werkzeug.security import generate_password_hash
+        password_hash = generate_password_hash(password)
+
+    first_id = writer.max_user_id()
+    created_at = generator.start.strftime('%Y-%m-%d %H:%M:%S')
+    writer.write('users', ('username', 'email', 'password_hash', 'created_at'), (
+        (f'{prefix}{i}', f'{prefix}{i}@example.com', password_hash, created_at) for i in range(users)
+    ))
+    user_ids = writer.user_ids_after(first_id)
+
+    columns = COLUMNS[schema]
+    counts = dict.fromkeys(('users',) + tuple(columns), 0)
+    counts['users'] = len(user_ids)
+    buffers = {table: [] for table in columns}
+
+    def flush(table):
+        if buffers[table]:
+            writer.write(table, columns[table], buffers[table])
+            counts[table] += len(buffers[table])
+            buffers[table] = []
+
+    tasks = [(schema, index, user_id) for index, user_id in enumerate(user_ids)]
+    pool = None
+    if jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs, _init_worker, (seed, days, entries_per_user, generator.end))
+        results = pool.imap(_worker_records, tasks, chunksize=16)
+    else:
+        results = (user_records(generator, *task) for task in tasks)
+
+    try:
+        for done, records in enumerate(results, 1):
+            for table, rows in records.items():
+                buffers[table].extend(rows)
+                if len(buffers[table]) >= writer.batch:
+                    flush(table)
+            if progress and done % progress == 0:
+                print(f"  {done}/{len(user_ids)} users, {counts['mood_entries'] + len(buffers['mood_entries'])} mood entries")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    for table in columns:
+        flush(table)
+    return counts
+
+
+def create_schema(schema, db_path=None):
+    """Create the app's own tables, so the DDL stays in one place"""
+    import moodly_db
+    if db_path is None:
+        import moodly
+        moodly.DATABASE_TYPE = 'postgresql'
+        moodly.DATABASE_CONFIG = moodly_db.get_database_url()
+        moodly.init_db()
+        return
+
+    # The web pages and the API share one SQLite schema
+    conn = moodly_db.connect(os.path.abspath(db_path))
+    moodly_db.create_schema(conn)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='moodly_synthetic.db', help='SQLite file to create or extend')
+    parser.add_argument('--postgres', default=None, help='PostgreSQL URL (moodly.py schema); COPY is used')
+    parser.add_argument('--schema', choices=('api', 'web'), default='api')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--entries-per-user', type=int, default=365, help='average; actual counts vary per user')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--end', default='2025-01-01', help='histories end on this date (YYYY-MM-DD)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch', type=int, default=50000, help='rows per transaction')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='generator processes')
+    parser.add_argument('--prefix', default='user', help='usernames are <prefix><n>')
+    parser.add_argument('--password', default='moodly123', help='password shared by all synthetic users')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if args.postgres:
+        if args.schema != 'web':
+            parser.error('--postgres only supports the moodly.py schema (--schema web)')
+        os.environ['DATABASE_URL'] = args.postgres
+        create_schema('web')
+        import psycopg2
+        writer = PostgresWriter(psycopg2.connect(args.postgres), batch=args.batch)
+        target = args.postgres.rsplit('@', 1)[-1]
+    else:
+        create_schema(args.schema, args.db)
+        writer = SQLiteWriter(args.db, batch=args.batch)
+        target = args.db
+
+    print(f"Generating {args.users} users x ~{args.entries_per_user} entries over {args.days} days "
+          f"(schema {args.schema}, seed {args.seed}) into {target}")
+    start = time.perf_counter()
+    counts = generate(writer, args.schema, args.users, args.entries_per_user, args.days, args.seed,
+                      args.prefix, args.password, end=datetime.strptime(args.end, '%Y-%m-%d'), jobs=args.jobs, progress=max(1, args.users // 10))
+    writer.close()
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts.values())
+    for table, count in counts.items():
+        print(f"  {table:<16} {count:>12,}")
+    print(f"Wrote {total:,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
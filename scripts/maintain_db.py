@@ -0,0 +1,152 @@
+"""
+Run database maintenance jobs now: online backup, compaction, archival of old entries, or report sizes.
+
+Jobs are the ones the app schedules with MAINTENANCE_ENABLED=true (see moodly_maintenance),
+run here on demand, e.g. from cron. `stats` prints size, free pages and last runs per file.
+`convert` moves databases from before incremental auto-vacuum over with a full VACUUM that
+blocks writers while it runs: a one-time deploy step, which compact then keeps bounded.
+
+With --measure, `backup` and `compact` instead run against a throwaway copy of the database
+while a thread keeps logging moods into it, and report how long the job took and the
+writers' latency during it next to an idle baseline: the cost of running maintenance live.
+
+Usage: python scripts/maintain_db.py {backup,compact,archive,convert,stats,all} [--days N] [--pages N]
+                                             [--measure] [--seconds S]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import moodly_db
+import moodly_maintenance
+
+from bench_load import percentile
+from bench_shards import INSERT_MOOD
+
+
+def print_stats():
+    for path in moodly_db.database_files():
+        if not os.path.exists(path):
+            print(f"  {os.path.basename(path):<28} missing")
+            continue
+        size, free_ratio = moodly_maintenance.file_stats(path)
+        print(f"  {os.path.basename(path):<28} {size / 1024 / 1024:>8.1f} MB  {free_ratio:>6.1%} free pages")
+    for job, finished_at in moodly_maintenance._last_successes():
+        print(f"  last {job:<23} {datetime.fromtimestamp(finished_at, timezone.utc):%Y-%m-%d %H:%M:%S} UTC")
+
+
+def write_moods(path, stop, latencies):
+    conn = sqlite3.connect(path, timeout=30)
+    user_id = conn.execute('SELECT MIN(id) FROM users').fetchone()[0]
+    while not stop.is_set():
+        now = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        conn.execute(INSERT_MOOD, (user_id, 7, 6, 3, 8, 'maintenance', 'Keep going!',
+                                   now.strftime('%Y-%m-%d %H:%M:%S'), now.strftime('%Y-%m-%d')))
+        conn.commit()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.002)
+    conn.close()
+
+
+def measure(job, args):
+    """Writer latency while `job` runs on a copy of the database, against an idle second"""
+    workdir = tempfile.mkdtemp(prefix='moodly-maintenance-')
+    try:
+        path = os.path.join(workdir, 'moodly.db')
+        moodly_maintenance.backup(moodly_db.DATABASE_PATH, directory=workdir, keep=1)
+        os.replace(next(os.path.join(workdir, name) for name in os.listdir(workdir) if name.endswith('.db')), path)
+        if job == 'compact':
+            # Give it something to hand back: a copy is already compact
+            conn = sqlite3.connect(path)
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            conn.execute('DELETE FROM mood_entries WHERE id <= (SELECT MAX(id) / 2 FROM mood_entries)')
+            conn.commit()
+            conn.close()
+
+        results = {}
+        for phase in ('idle', job):
+            stop, latencies = threading.Event(), []
+            writer = threading.Thread(target=write_moods, args=(path, stop, latencies))
+            writer.start()
+            start = time.perf_counter()
+            if phase == 'idle':
+                time.sleep(args.seconds)
+                detail = ''
+            elif job == 'backup':
+                moodly_maintenance.backup(path, directory=os.path.join(workdir, 'backups'), pages=args.pages)
+                detail = f"{os.path.getsize(path) / 1024 / 1024:.1f} MB copied"
+            else:
+                detail = f"{moodly_maintenance.compact(path, pages=args.pages)} pages freed"
+            elapsed = time.perf_counter() - start
+            stop.set()
+            writer.join()
+            latencies.sort()
+            results[phase] = (elapsed, latencies, detail)
+
+        print(f"Writer latency during {job} ({args.pages or 'default'} pages per step), "
+              f"SQLite {sqlite3.sqlite_version}")
+        for phase, (elapsed, latencies, detail) in results.items():
+            print(f"  {phase:<8} {elapsed:>6.2f} s  {len(latencies):>6} writes  p50 {percentile(latencies, 50) * 1000:>7.2f} ms  "
+                  f"p99 {percentile(latencies, 99) * 1000:>7.2f} ms  max {percentile(latencies, 100) * 1000:>7.2f} ms  {detail}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('job', choices=('backup', 'compact', 'archive', 'convert', 'stats', 'all'))
+    parser.add_argument('--days', type=int, default=moodly_maintenance.RETENTION_DAYS,
+                        help='archive entries older than this (default RETENTION_DAYS)')
+    parser.add_argument('--pages', type=int, default=None,
+                        help='pages per backup step / per incremental vacuum')
+    parser.add_argument('--measure', action='store_true', help='measure writer latency on a copy instead')
+    parser.add_argument('--seconds', type=float, default=2.0, help='idle baseline for --measure')
+    args = parser.parse_args()
+
+    if args.measure:
+        if args.job not in ('backup', 'compact'):
+            parser.error('--measure works with backup or compact')
+        measure(args.job, args)
+        return
+
+    if args.job == 'convert':
+        for path in moodly_db.database_files():
+            start = time.perf_counter()
+            if moodly_maintenance.convert(path):
+                print(f"Converted {path} to incremental auto-vacuum in {time.perf_counter() - start:.2f} s")
+            else:
+                print(f"{path} is already on incremental auto-vacuum")
+    if args.job in ('backup', 'all'):
+        for path in moodly_db.database_files():
+            start = time.perf_counter()
+            target = moodly_maintenance.backup(path, pages=args.pages)
+            print(f"Backed up {path} to {target} in {time.perf_counter() - start:.2f} s")
+    if args.job in ('archive', 'all'):
+        if args.days <= 0:
+            print("Nothing archived: set --days or RETENTION_DAYS")
+        for path in moodly_db.databases():
+            for table, rows in moodly_maintenance.archive(path, days=args.days).items():
+                print(f"Archived {rows} {table} rows from {path} to {moodly_maintenance.ARCHIVE_DIR}")
+    # After archival, so the pages it freed go back to the filesystem
+    if args.job in ('compact', 'all'):
+        for path in moodly_db.database_files():
+            print(f"Compacted {path}: {moodly_maintenance.compact(path, pages=args.pages)} pages freed")
+    print("Databases:")
+    print_stats()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Move users to the shard they hash to, and report how users are spread over the shards.
+
+With DATABASE_SHARDS=N the main database (moodly.db) only holds the user directory and each
+user's rows live in moodly-shardNN.db (see moodly_shards). This script creates the directory
+and N shards, then moves
+  - users still in the main database's own tables (from before sharding) to their shard
+  - users whose shard is not the one they hash to with N shards (after N changed)
+and prints users, mood entries and file size per shard, counted by fan-out over the shards.
+
+Workers cache each user's shard: stop the app while moving users, or restart it afterwards.
+
+Usage: python scripts/rebalance_shards.py [--db moodly.db] [--shards N] [--status] [--dry-run]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import moodly_db
+from moodly_shards import MAIN_SHARD, ShardMap, placement
+
+
+def legacy_users(db_path):
+    """Ids of users still in the main database's own users table"""
+    conn = sqlite3.connect(db_path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone():
+            return []
+        return [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+    finally:
+        conn.close()
+
+
+def plan(shard_map, db_path):
+    """[(user_id, source file, target shard)] for every user not on their hashed shard"""
+    moves = [(user_id, db_path, placement(user_id, shard_map.count)) for user_id in legacy_users(db_path)]
+    conn = sqlite3.connect(db_path)
+    try:
+        for user_id, shard in conn.execute('SELECT user_id, shard FROM user_directory ORDER BY user_id'):
+            if shard == MAIN_SHARD:
+                # Listed above, from the main database's own users table
+                continue
+            target = placement(user_id, shard_map.count)
+            if shard != target:
+                moves.append((user_id, shard_map.path(shard), target))
+    finally:
+        conn.close()
+    return moves
+
+
+def print_status(shard_map):
+    paths = [path for path in shard_map.paths if os.path.exists(path)]
+    # Shards left over from a larger N, until they are emptied and deleted
+    shard = shard_map.count
+    while os.path.exists(shard_map.path(shard)):
+        paths.append(shard_map.path(shard))
+        shard += 1
+    counts = moodly_db.fan_out('SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM mood_entries)',
+                               paths=paths)
+    total_users = total_entries = 0
+    for path, rows in zip(paths, counts):
+        users, entries = rows[0]
+        total_users += users
+        total_entries += entries
+        print(f"  {os.path.basename(path):<28} {users:>8} users  {entries:>10} mood entries  "
+              f"{os.path.getsize(path) / 1024 / 1024:>8.1f} MB")
+    print(f"  {'total':<28} {total_users:>8} users  {total_entries:>10} mood entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default=moodly_db.DATABASE_PATH, help='main database (the shard directory)')
+    parser.add_argument('--shards', type=int, default=moodly_db.SHARD_COUNT or None,
+                        help='shard count to balance for (default DATABASE_SHARDS)')
+    parser.add_argument('--status', action='store_true', help='only report the current spread')
+    parser.add_argument('--dry-run', action='store_true', help='list the moves without making them')
+    args = parser.parse_args()
+    if not args.shards:
+        parser.error('set --shards or DATABASE_SHARDS')
+
+    shard_map = ShardMap(args.db, args.shards)
+    shard_map.create_directory()
+    if not args.status:
+        for shard, path in enumerate(shard_map.paths):
+            conn = sqlite3.connect(path)
+            moodly_db.create_schema(conn)
+            shard_map.reserve_ids(conn, shard)
+            conn.close()
+
+        moves = plan(shard_map, args.db)
+        print(f"{len(moves)} users to move for {args.shards} shards")
+        start = time.perf_counter()
+        rows = 0
+        for i, (user_id, source, target) in enumerate(moves, 1):
+            if args.dry_run:
+                print(f"  user {user_id}: {os.path.basename(source)} -> {os.path.basename(shard_map.path(target))}")
+                continue
+            rows += shard_map.move(user_id, source, target)
+            if i % 1000 == 0:
+                print(f"  {i}/{len(moves)} users moved")
+        if moves and not args.dry_run:
+            print(f"Moved {len(moves)} users ({rows} rows) in {time.perf_counter() - start:.1f} s")
+
+    print(f"Shards of {args.db}:")
+    print_status(shard_map)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Storage Backend Interface for Moodly App
+Common interface shared by the Cloudinary and local disk profile picture stores
+"""
+import os
+from io import BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ('cloudinary', 'local')
+
+
+class StorageBackend:
+    """Base class for profile picture storage backends"""
+
+    name = 'base'
+    display_name = 'Base'
+
+    def is_enabled(self):
+        """Check if the backend can accept uploads"""
+        raise NotImplementedError
+
+    def upload_profile_picture(self, file_data, user_id, file_extension):
+        """Store a profile picture and return a result dict with 'success', 'public_url', 'avatar_url'
+        and 'version', which identifies this upload and is kept with the user"""
+        raise NotImplementedError
+
+    def get_profile_picture_url(self, user_id, width=500, height=500, version=None):
+        """Get the public URL of a user's profile picture variant, for the upload `version` if given, or None"""
+        raise NotImplementedError
+
+    def delete_profile_picture(self, user_id):
+        """Delete a user's profile picture"""
+        raise NotImplementedError
+
+    def get_storage_stats(self):
+        """Get storage usage statistics"""
+        return None
+
+    def _read_file_data(self, file_data):
+        """Return raw bytes from either bytes or a file-like upload"""
+        if isinstance(file_data, bytes):
+            return file_data
+        file_data.seek(0)
+        return file_data.read()
+
+    def _resize_image(self, file_data, max_size=1000):
+        """Normalize an image to an RGB JPEG no larger than max_size pixels"""
+        try:
+            from PIL import Image
+
+            image = Image.open(BytesIO(file_data))
+            logger.debug("📏 Original size: %s, mode: %s", image.size, image.mode)
+
+            # Convert to RGB if needed
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            # Resize if too large
+            if max(image.size) > max_size:
+                image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+                logger.debug("📐 Resized to: %s", image.size)
+
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=90, optimize=True)
+            return output.getvalue()
+
+        except Exception as e:
+            logger.error("❌ Image resize error: %s", e)
+            return file_data
+
+
+def get_storage_backend(name=None):
+    """Create the storage backend selected by STORAGE_BACKEND (cloudinary or local)"""
+    name = (name or os.environ.get('STORAGE_BACKEND', 'cloudinary')).strip().lower()
+    if name not in STORAGE_BACKENDS:
+        logger.warning("⚠️ Unknown STORAGE_BACKEND '%s', falling back to cloudinary", name)
+        name = 'cloudinary'
+
+    if name == 'local':
+        from local_storage import LocalStorage
+        return LocalStorage()
+
+    from cloudinary_storage import cloudinary_storage
+    return cloudinary_storage
@@ -0,0 +1,99 @@
+"""
+Async API (moodly_asgi): the natively served routes behave like moodly_api's
+"""
+import json
+import asyncio
+
+import pytest
+
+import moodly_api
+import moodly_asgi
+import moodly_sentiment
+
+ORIGIN = moodly_api.CORS_ORIGINS[0]
+
+
+class Client:
+    """Drives the ASGI app in-process, keeping the session cookie"""
+
+    def __init__(self):
+        self.cookie = None
+
+    async def lifespan(self, event):
+        messages = [{'type': f'lifespan.{event}'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        task = asyncio.ensure_future(moodly_asgi.app({'type': 'lifespan'}, receive, send))
+        while not sent:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return sent[0]['type']
+
+    async def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        headers = [(b'origin', ORIGIN.encode()), (b'content-type', b'application/json')]
+        if self.cookie:
+            headers.append((b'cookie', self.cookie))
+        headers.append((b'content-length', str(len(payload)).encode()))
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': headers,
+                 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234)}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        await moodly_asgi.app(scope, receive, send)
+        response_headers = dict(sent[0]['headers'])
+        if b'set-cookie' in response_headers:
+            self.cookie = response_headers[b'set-cookie'].split(b';')[0]
+        return sent[0]['status'], response_headers, json.loads(sent[1]['body'])
+
+
+@pytest.fixture
+def fresh_database(tmp_path, monkeypatch):
+    """An empty working directory, so moodly.db does not exist until the app creates it"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(moodly_api, '_schema_checked', False)
+    monkeypatch.setattr(moodly_asgi, 'db', moodly_asgi.ConnectionPool(moodly_asgi.moodly_db.DATABASE_PATH, 2))
+    yield tmp_path
+    asyncio.run(moodly_asgi.db.close())
+
+
+def test_native_routes_on_fresh_database(fresh_database):
+    async def scenario():
+        client = Client()
+        assert await client.lifespan('startup') == 'lifespan.startup.complete'
+        assert (fresh_database / 'moodly.db').exists()
+
+        credentials = {'username': 'async', 'password': 'secret123'}
+        status, _, _ = await client.request('POST', '/api/auth/register', dict(credentials, email='a@example.com'))
+        assert status == 201
+        status, _, _ = await client.request('POST', '/api/auth/login', credentials)
+        assert status == 200
+
+        status, headers, body = await client.request('POST', '/api/moods', {'mood_score': 7, 'notes': 'calm, rested'})
+        assert status == 201, body
+        assert headers[b'access-control-allow-origin'] == ORIGIN.encode()
+        assert headers[b'access-control-allow-credentials'] == b'true'
+
+        status, headers, body = await client.request('GET', '/api/analytics')
+        assert status == 200, body
+        assert headers[b'access-control-allow-origin'] == ORIGIN.encode()
+        # The same body as the Flask view's
+        with moodly_api.app.test_request_context():
+            conn = moodly_api.get_db_connection()
+            expected = moodly_sentiment.mood_summary(conn, 1)
+            conn.close()
+        assert body['text_sentiment'] == expected
+        assert body['text_sentiment']['emotions'] == {'calm': 1}
+
+    asyncio.run(scenario())
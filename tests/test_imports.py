@@ -0,0 +1,49 @@
+"""
+Importing the app modules has no side effects: no output, network, files, or heavy clients
+"""
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import os, socket, sys
+
+def refuse(*args, **kwargs):
+    raise AssertionError('network access on import')
+
+socket.socket.connect = refuse
+socket.create_connection = refuse
+socket.getaddrinfo = refuse
+before = sorted(os.listdir('.'))
+
+import {module}
+
+assert sorted(os.listdir('.')) == before, sorted(os.listdir('.'))
+for heavy in ('openai', 'psycopg2'):
+    assert heavy not in sys.modules, heavy
+'''
+
+
+def run(code, tmp_path, **env):
+    environment = dict(os.environ, PYTHONPATH=ROOT, **env)
+    return subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=environment,
+                          capture_output=True, text=True, timeout=120)
+
+
+@pytest.mark.parametrize('module', ['moodly', 'cloudinary_storage'])
+def test_import_has_no_side_effects(module, tmp_path):
+    result = run(PROBE.format(module=module), tmp_path, FLASK_SECRET_KEY='test')
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ''
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_missing_secret_key_fails_loudly(tmp_path):
+    # Empty rather than unset, so load_dotenv() does not bring one back from .env
+    result = run('import moodly', tmp_path, FLASK_SECRET_KEY='', FLASK_DEBUG='')
+    assert result.returncode != 0
+    assert 'FLASK_SECRET_KEY is not set' in result.stderr
@@ -0,0 +1,62 @@
+"""
+Database maintenance (moodly_maintenance): backups and compaction
+"""
+import os
+import sqlite3
+
+import pytest
+
+import moodly_maintenance
+
+
+def make_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE notes (body TEXT)')
+    conn.execute("INSERT INTO notes VALUES ('kept')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_backup_keeps_the_newest(tmp_path, monkeypatch):
+    database = make_database(str(tmp_path / 'moodly.db'))
+    directory = str(tmp_path / 'backups')
+    stamps = iter(['20260101T000000Z', '20260102T000000Z', '20260103T000000Z'])
+    monkeypatch.setattr(moodly_maintenance, '_stamp', lambda: next(stamps))
+
+    for _ in range(3):
+        target = moodly_maintenance.backup(database, directory=directory, keep=2)
+    assert sorted(os.listdir(directory)) == ['moodly-20260102T000000Z.db', 'moodly-20260103T000000Z.db']
+    assert os.path.exists(target)
+
+    # Keeping none would prune the copy just written
+    with pytest.raises(ValueError):
+        moodly_maintenance.backup(database, directory=directory, keep=0)
+    assert len(os.listdir(directory)) == 2
+
+
+def test_compact_never_runs_a_full_vacuum(tmp_path):
+    # Created before incremental auto-vacuum, with free pages to give back
+    database = make_database(str(tmp_path / 'moodly.db'))
+    conn = sqlite3.connect(database)
+    conn.executemany('INSERT INTO notes VALUES (?)', [('x' * 1000,)] * 200)
+    conn.commit()
+    conn.execute('DELETE FROM notes')
+    conn.commit()
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    conn.close()
+    assert free > 0
+
+    # The scheduled job stays bounded: it leaves the conversion to a deploy step
+    assert moodly_maintenance.compact(database) == 0
+    conn = sqlite3.connect(database)
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+    # Short of the page ANALYZE took for its statistics, the free pages are all still there
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] >= free - 1
+    conn.close()
+
+    assert moodly_maintenance.convert(database)
+    assert not moodly_maintenance.convert(database)
+    conn = sqlite3.connect(database)
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    conn.close()
@@ -0,0 +1,51 @@
+"""
+SQL budgets of the JSON routes (query_budgets.json), enforced by pytest_query_budget on every request below
+"""
+import pytest
+
+import moodly_querylog
+import pytest_query_budget
+
+MOOD = {'mood_score': 6, 'energy_level': 5, 'anxiety_level': 3, 'sleep_quality': 7,
+        'notes': 'Slept well, a good day with friends'}
+
+
+def test_api_writes_and_reads(client, query_logs, request):
+    assert client.post('/api/moods', json=MOOD).status_code == 201
+    assert client.get('/api/moods').status_code == 200
+    assert client.post('/api/journal', json={'title': 'Today', 'content': 'Calmer than yesterday'}).status_code == 201
+    assert client.get('/api/journal').status_code == 200
+    assert client.post('/api/goals', json={'title': 'Walk', 'description': 'Every evening'}).status_code == 201
+    assert client.get('/api/goals').status_code == 200
+    assert client.get('/api/analytics').status_code == 200
+    assert client.get('/api/auth/me').status_code == 200
+
+    # Every request was seen, and every one of them had a budget to meet
+    endpoints = {log.endpoint for log in query_logs}
+    assert endpoints == {'moods.handle_moods', 'journal.handle_journal', 'goals.handle_goals',
+                         'analytics.get_analytics', 'auth.get_user_info'}
+    assert endpoints <= set(request.config._query_budgets)
+
+
+def test_page_json_routes(client):
+    assert client.get('/health').status_code == 200
+    assert client.post('/api/moods', json=MOOD).status_code == 201
+    response = client.get('/api/dashboard')
+    assert response.status_code == 200
+    assert len(response.get_json()['recent_moods']) == 1
+    assert client.get('/api/mood_data').get_json()[0]['score'] == MOOD['mood_score']
+
+
+@pytest.mark.query_budget(1, endpoint='auth.get_user_info')
+def test_marker_overrides_file(client, query_logs):
+    assert client.get('/api/auth/me').status_code == 200
+    assert [len(log) for log in query_logs] == [1]
+
+
+def test_over_budget_fails(request):
+    log = moodly_querylog.QueryLog('auth.get_user_info')
+    for _ in range(2):
+        log.add('SELECT * FROM users WHERE id = ?', (1,), 0.0)
+    failures = pytest_query_budget._check(request.node, [log])
+    assert len(failures) == 1
+    assert failures[0].startswith('auth.get_user_info: 2 queries (budget 1)')
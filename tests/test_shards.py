@@ -0,0 +1,62 @@
+"""
+Sharded databases (moodly_shards): moodly.db from before sharding keeps being migrated
+"""
+import sqlite3
+
+from flask import Flask, session
+
+import moodly_db
+from moodly_metrics import connect as db_connect
+from moodly_shards import MAIN_SHARD, ShardMap
+
+# users and mood_entries as the first releases created them
+LEGACY_SCHEMA = '''
+    CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                        email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE mood_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                               mood_score INTEGER NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    INSERT INTO users (username, email, password_hash) VALUES ('legacy', 'legacy@example.com', 'x');
+'''
+
+
+def columns(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    finally:
+        conn.close()
+
+
+def test_legacy_database_migrated_while_sharded_user_signed_in(tmp_path, monkeypatch):
+    main = str(tmp_path / 'moodly.db')
+    conn = sqlite3.connect(main)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+    shards = ShardMap(main, 2, connect=db_connect)
+    monkeypatch.setattr(moodly_db, 'DATABASE_PATH', main)
+    monkeypatch.setattr(moodly_db, 'shards', shards)
+
+    # The shards exist and a user has signed up into one of them
+    shards.create_directory()
+    for path in shards.paths:
+        conn = db_connect(path)
+        moodly_db.create_schema(conn)
+        conn.close()
+    sharded_id = moodly_db.create_user('sharded', 'sharded@example.com', 'x')
+    assert shards.shard_of(1) == MAIN_SHARD
+    assert shards.shard_of(sharded_id) != MAIN_SHARD
+    assert 'energy_level' not in columns(main, 'mood_entries')
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    with app.test_request_context('/api/moods'):
+        session['user_id'] = sharded_id
+        moodly_db.init_schema()
+
+    assert {'energy_level', 'local_date', 'text_sentiment'} <= columns(main, 'mood_entries')
+    # The legacy user's writes land in moodly.db with the columns the API inserts
+    conn = moodly_db.connect(user_id=1)
+    conn.execute('INSERT INTO mood_entries (user_id, mood_score, energy_level) VALUES (1, 5, 4)')
+    conn.commit()
+    conn.close()
@@ -0,0 +1,84 @@
+"""
+Database snapshots (moodly_snapshots): shipped within the request that wrote, restored on cold start
+"""
+import io
+import sqlite3
+import threading
+
+from flask import Flask
+
+import moodly_snapshots
+
+
+def test_request_ships_before_responding(tmp_path, monkeypatch):
+    database = str(tmp_path / 'moodly.db')
+    store_dir = str(tmp_path / 'store')
+    monkeypatch.setattr(moodly_snapshots, 'STORE', store_dir)
+    monkeypatch.setattr(moodly_snapshots, 'SNAPSHOT_INTERVAL', 0)
+    monkeypatch.setattr(moodly_snapshots, '_next_ship', 0)
+
+    app = Flask(__name__)
+    moodly_snapshots.init_snapshots(app, lambda: [database])
+
+    @app.route('/write')
+    def write():
+        conn = sqlite3.connect(database)
+        conn.execute('CREATE TABLE IF NOT EXISTS notes (body TEXT)')
+        conn.execute("INSERT INTO notes VALUES ('kept')")
+        conn.commit()
+        conn.close()
+        return 'ok'
+
+    threads = threading.active_count()
+    assert app.test_client().get('/write').status_code == 200
+    # Shipped by the request itself, not by a thread a serverless runtime would freeze
+    assert threading.active_count() == threads
+    store = moodly_snapshots.get_snapshot_store()
+    assert moodly_snapshots.latest_generation(store, 'moodly') is not None
+
+    # A cold start gets the row back
+    restored = str(tmp_path / 'cold' / 'moodly.db')
+    (tmp_path / 'cold').mkdir()
+    assert moodly_snapshots.restore(restored, store) is not None
+    conn = sqlite3.connect(restored)
+    assert conn.execute('SELECT body FROM notes').fetchall() == [('kept',)]
+    conn.close()
+
+
+def test_cloudinary_store_keys(monkeypatch):
+    """Keys map to private raw public ids under SNAPSHOT_PREFIX (the SDK calls answered in memory)"""
+    import cloudinary.api
+    import cloudinary.uploader
+    import cloudinary.utils
+    import urllib.request
+
+    objects = {}
+    calls = []
+
+    def upload(source, public_id, **options):
+        calls.append(options)
+        objects[public_id] = source.read()
+
+    def resources(prefix, next_cursor=None, **options):
+        return {'resources': [{'public_id': key} for key in objects if key.startswith(prefix)]}
+
+    monkeypatch.setenv('CLOUDINARY_CLOUD_NAME', 'demo')
+    monkeypatch.setenv('CLOUDINARY_API_KEY', 'key')
+    monkeypatch.setenv('CLOUDINARY_API_SECRET', 'secret')
+    monkeypatch.setattr(cloudinary.uploader, 'upload', upload)
+    monkeypatch.setattr(cloudinary.uploader, 'destroy', lambda public_id, **options: objects.pop(public_id))
+    monkeypatch.setattr(cloudinary.api, 'resources', resources)
+    monkeypatch.setattr(cloudinary.utils, 'private_download_url', lambda public_id, format, **options: public_id)
+    monkeypatch.setattr(urllib.request, 'urlopen', lambda url, timeout: io.BytesIO(objects[url]))
+
+    store = moodly_snapshots.CloudinarySnapshotStore(prefix='snapshots')
+    store.put('moodly/g1/base.gz', io.BytesIO(b'base'))
+    store.put('moodly/g1/delta-000001.gz', io.BytesIO(b'delta'))
+    assert calls[0]['resource_type'] == 'raw' and calls[0]['type'] == 'private'
+    assert sorted(objects) == ['snapshots/moodly/g1/base.gz', 'snapshots/moodly/g1/delta-000001.gz']
+    assert store.list('moodly/') == ['moodly/g1/base.gz', 'moodly/g1/delta-000001.gz']
+    assert moodly_snapshots.latest_generation(store, 'moodly') == ('g1', 1)
+    with store.get('moodly/g1/base.gz') as f:
+        assert f.read() == b'base'
+    store.delete('moodly/g1/delta-000001.gz')
+    assert store.list('moodly/') == ['moodly/g1/base.gz']
@@ -0,0 +1,99 @@
+"""
+Profile picture stores (cloudinary_storage, local_storage): variant URLs follow the stored upload version
+"""
+import io
+import os
+import threading
+
+from PIL import Image
+
+import cloudinary_storage
+from local_storage import LocalStorage
+
+
+def image(color):
+    output = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(output, format='PNG')
+    return output.getvalue()
+
+
+def test_cloudinary_variants_change_with_the_version(monkeypatch):
+    monkeypatch.setenv('CLOUDINARY_CLOUD_NAME', 'demo')
+    monkeypatch.setenv('CLOUDINARY_API_KEY', 'key')
+    monkeypatch.setenv('CLOUDINARY_API_SECRET', 'secret')
+    storage = cloudinary_storage.CloudinaryStorage()
+
+    first = storage.get_profile_picture_url(7, 100, 100, version=1700000000)
+    second = storage.get_profile_picture_url(7, 100, 100, version=1700000500)
+    assert '/v1700000000/' in first and '/v1700000500/' in second
+    # Memoized per version: asking again for the first upload gives its URL, not the latest
+    assert storage.get_profile_picture_url(7, 100, 100, version=1700000000) == first
+
+
+def test_local_variants_follow_the_stored_version(tmp_path):
+    storage = LocalStorage(root=str(tmp_path), base_url='/uploads')
+    red = storage.upload_profile_picture(image('red'), 1, 'png')
+    blue = storage.upload_profile_picture(image('blue'), 1, 'png')
+    assert red['version'] != blue['version']
+
+    assert storage.get_profile_picture_url(1, version=red['version']) == red['avatar_url']
+    assert storage.get_profile_picture_url(1, version=blue['version']) == blue['avatar_url']
+    # Without a stored version, the current picture
+    assert storage.get_profile_picture_url(1) == blue['avatar_url']
+
+
+def blobs(storage):
+    return sorted(name for _, _, names in os.walk(storage.objects_dir) for name in names if not name.endswith('.refs'))
+
+
+def test_local_blobs_are_reference_counted(tmp_path):
+    storage = LocalStorage(root=str(tmp_path))
+    shared = storage.upload_profile_picture(image('red'), 1, 'png')
+    storage.upload_profile_picture(image('red'), 2, 'png')
+    assert len(blobs(storage)) == 1
+
+    # Replacing a picture releases the old blob only once its last user has moved on
+    storage.upload_profile_picture(image('blue'), 1, 'png')
+    assert len(blobs(storage)) == 2
+    assert storage.delete_profile_picture(2)['success']
+    assert blobs(storage) == [storage.get_profile_picture_url(1).rsplit('/', 1)[1]]
+    assert storage.resolve(shared['storage_id']) is not None  # a valid name, even once removed
+
+    assert storage.delete_profile_picture(1)['success']
+    assert blobs(storage) == []
+
+
+def test_local_raw_fallback_keeps_the_image_type(tmp_path, monkeypatch):
+    storage = LocalStorage(root=str(tmp_path))
+    # As when Pillow cannot re-encode the upload
+    monkeypatch.setattr(storage, '_resize_image', lambda data: data)
+    result = storage.upload_profile_picture(image('green'), 1, 'png')
+    assert result['success'] and result['storage_id'].endswith('.png')
+    directory, name = storage.resolve(result['storage_id'])
+    with open(os.path.join(directory, name), 'rb') as f:
+        assert f.read() == image('green')
+
+    assert not storage.upload_profile_picture(b'<svg/>', 1, 'png')['success']
+
+
+def test_local_concurrent_upload_and_delete_keep_shared_blobs(tmp_path):
+    storage = LocalStorage(root=str(tmp_path))
+    data = image('red')
+    kept = storage.upload_profile_picture(data, 0, 'png')
+    results = []
+
+    def churn(user_id):
+        for _ in range(20):
+            results.append(storage.upload_profile_picture(data, user_id, 'png')['success'])
+            results.append(storage.delete_profile_picture(user_id)['success'])
+
+    threads = [threading.Thread(target=churn, args=(user_id,)) for user_id in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results)
+    # User 0 references the blob throughout, so it is never removed
+    assert blobs(storage) == [kept['version']]
+    assert storage.delete_profile_picture(0)['success']
+    assert blobs(storage) == []
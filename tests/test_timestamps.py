@@ -0,0 +1,20 @@
+"""
+Timestamps: entries are stored in UTC and the API answers with the stored value
+"""
+import re
+
+UTC_TIMESTAMP = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
+
+def test_created_at_is_the_stored_utc_value(client):
+    mood = client.post('/api/moods', json={'mood_score': 5, 'notes': 'fine'}).get_json()['mood']
+    entry = client.post('/api/journal', json={'title': 'Today', 'content': 'Fine'}).get_json()['entry']
+    goal = client.post('/api/goals', json={'title': 'Walk'}).get_json()['goal']
+
+    assert UTC_TIMESTAMP.match(mood['created_at'])
+    assert client.get('/api/moods').get_json()['moods'][0]['created_at'] == mood['created_at']
+    assert client.get('/api/journal').get_json()['entries'][0]['created_at'] == entry['created_at']
+    assert client.get('/api/goals').get_json()['goals'][0]['created_at'] == goal['created_at']
+
+    recent = client.get('/api/analytics').get_json()['recent_moods']
+    assert [row['created_at'] for row in recent] == [mood['created_at']]